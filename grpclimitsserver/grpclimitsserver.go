@@ -3,51 +3,189 @@ package main
 import (
 	"context"
 	"flag"
+	"fmt"
+	"io"
 	"log"
 	"net"
+	"runtime"
+	"strings"
+	"sync"
+	"sync/atomic"
 	"time"
 
 	"github.com/evanj/grpclimits/errrequest"
 	"github.com/evanj/grpclimits/helloworld"
 	"google.golang.org/grpc"
 	"google.golang.org/grpc/codes"
+	"google.golang.org/grpc/metadata"
 	"google.golang.org/grpc/status"
 )
 
+// trailing metadata key for load reports, using the ORCA text format; see python/loadreport.py
+const loadReportKey = "endpoint-load-metrics"
+
+// cpuSampleInterval is the minimum time to measure CPU utilization over.
+const cpuSampleInterval = time.Second
+
 type server struct {
 	helloworld.UnimplementedGreeterServer
 	responseSleep time.Duration
+	reportLoad    bool
+	inFlight      atomic.Int64
+	// nil if reportLoad is false, or the platform does not support it
+	cpuSampler *cpuSampler
+}
+
+func newServer(responseSleep time.Duration, reportLoad bool) *server {
+	s := &server{responseSleep: responseSleep, reportLoad: reportLoad}
+	if reportLoad {
+		s.cpuSampler = newCPUSampler(cpuSampleInterval)
+	}
+	return s
+}
+
+// cpuSampler measures the CPU utilization of this process, as a fraction of GOMAXPROCS.
+type cpuSampler struct {
+	interval    time.Duration
+	mu          sync.Mutex
+	lastWall    time.Time
+	lastCPU     time.Duration
+	utilization float64
+	sampled     bool
+}
+
+// newCPUSampler returns a cpuSampler that measures over interval, or nil if this platform does not
+// report the CPU time of a process.
+func newCPUSampler(interval time.Duration) *cpuSampler {
+	cpu, ok := processCPUTime()
+	if !ok {
+		log.Printf("warning: process CPU time is not available: load reports will not include cpu_utilization")
+		return nil
+	}
+	return &cpuSampler{interval: interval, lastWall: time.Now(), lastCPU: cpu}
 }
 
-func newServer(responseSleep time.Duration) *server {
-	return &server{helloworld.UnimplementedGreeterServer{}, responseSleep}
+// Utilization returns the utilization over the last interval. It returns false until the first
+// interval has passed: reporting 0 would make a server that just started look idle. It also
+// returns false if c is nil.
+func (c *cpuSampler) Utilization() (float64, bool) {
+	if c == nil {
+		return 0, false
+	}
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	now := time.Now()
+	elapsed := now.Sub(c.lastWall)
+	if elapsed >= c.interval {
+		if cpu, ok := processCPUTime(); ok {
+			c.utilization = float64(cpu-c.lastCPU) / float64(elapsed) / float64(runtime.GOMAXPROCS(0))
+			c.sampled = true
+			c.lastWall = now
+			c.lastCPU = cpu
+		}
+	}
+	return c.utilization, c.sampled
+}
+
+func (s *server) loadReport() string {
+	utilization, ok := s.cpuSampler.Utilization()
+	if !ok {
+		return fmt.Sprintf("TEXT in_flight=%d", s.inFlight.Load())
+	}
+	return fmt.Sprintf("TEXT cpu_utilization=%g, in_flight=%d", utilization, s.inFlight.Load())
 }
 
 func (s *server) SayHello(ctx context.Context, request *helloworld.HelloRequest) (*helloworld.HelloReply, error) {
+	if s.reportLoad {
+		s.inFlight.Add(1)
+		defer s.inFlight.Add(-1)
+		defer func() {
+			err := grpc.SetTrailer(ctx, metadata.Pairs(loadReportKey, s.loadReport()))
+			if err != nil {
+				log.Printf("failed to set load report: %s", err)
+			}
+		}()
+	}
 	time.Sleep(s.responseSleep)
 
-	errMsg, err := errrequest.Generate(request.Name)
+	// set trailers: this also counts against the header lengths
+	// grpc.SetTrailer(ctx, metadata.Pairs("example-header", "long header value abcdefg"))
+
+	return nil, requestedError(request.Name)
+}
+
+// requestedError returns the error requested by an errrequest name.
+func requestedError(name string) error {
+	errMsg, err := errrequest.Generate(name)
 	if err != nil {
-		return nil, status.Errorf(codes.InvalidArgument, err.Error())
+		return status.Errorf(codes.InvalidArgument, err.Error())
 	}
 	log.Printf("returning error with len(message)=%d bytes", len(errMsg))
 
 	// add error details
 	// st, err := status.New(codes.FailedPrecondition, errMsg).WithDetails(&helloworld.HelloReply{Message: "reply"})
 	// if err != nil {
-	// 	return nil, status.Errorf(codes.Internal, "failed to add details: %w", err)
+	// 	return status.Errorf(codes.Internal, "failed to add details: %w", err)
 	// }
-	// return nil, st.Err()
+	// return st.Err()
 
-	// set trailers: this also counts against the header lengths
-	// grpc.SetTrailer(ctx, metadata.Pairs("example-header", "long header value abcdefg"))
+	return status.Errorf(codes.FailedPrecondition, errMsg)
+}
+
+// streamStatus returns the status a stream ends with: OK if name is empty, otherwise the error
+// requested by name.
+func streamStatus(name string) error {
+	if name == "" {
+		return nil
+	}
+	return requestedError(name)
+}
 
-	return nil, status.Errorf(codes.FailedPrecondition, errMsg)
+// sendReplies sends the replies requested by request. Negative counts and lengths are treated as
+// 0, as in the Python server.
+func sendReplies(request *helloworld.HelloRequest, send func(*helloworld.HelloReply) error) error {
+	replyLength := int(request.ReplyLength)
+	if replyLength < 0 {
+		// strings.Repeat panics with a negative count, which would crash the server
+		replyLength = 0
+	}
+	reply := &helloworld.HelloReply{Message: strings.Repeat("x", replyLength)}
+	for i := int32(0); i < request.ReplyCount; i++ {
+		if err := send(reply); err != nil {
+			return err
+		}
+	}
+	return nil
+}
+
+func (s *server) SayHelloStream(request *helloworld.HelloRequest, stream helloworld.Greeter_SayHelloStreamServer) error {
+	if err := sendReplies(request, stream.Send); err != nil {
+		return err
+	}
+	return streamStatus(request.Name)
+}
+
+func (s *server) SayHelloBidi(stream helloworld.Greeter_SayHelloBidiServer) error {
+	lastName := ""
+	for {
+		request, err := stream.Recv()
+		if err == io.EOF {
+			return streamStatus(lastName)
+		}
+		if err != nil {
+			return err
+		}
+		lastName = request.Name
+		if err := sendReplies(request, stream.Send); err != nil {
+			return err
+		}
+	}
 }
 
 func main() {
 	addr := flag.String("addr", "localhost:8001", "listening address")
 	responseSleep := flag.Duration("responseSleep", 0, "time to sleep before responding")
+	reportLoad := flag.Bool("reportLoad", false, "add load reports to the trailing metadata")
 	flag.Parse()
 
 	lis, err := net.Listen("tcp", *addr)
@@ -56,7 +194,7 @@ func main() {
 	}
 
 	s := grpc.NewServer()
-	helloworld.RegisterGreeterServer(s, newServer(*responseSleep))
+	helloworld.RegisterGreeterServer(s, newServer(*responseSleep, *reportLoad))
 
 	log.Printf("serving on %s ...", *addr)
 	if err := s.Serve(lis); err != nil {
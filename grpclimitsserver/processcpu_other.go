@@ -0,0 +1,10 @@
+//go:build !unix
+
+package main
+
+import "time"
+
+// processCPUTime returns false: getrusage is only available on Unix platforms.
+func processCPUTime() (time.Duration, bool) {
+	return 0, false
+}
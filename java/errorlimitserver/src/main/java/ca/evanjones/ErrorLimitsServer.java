@@ -11,10 +11,11 @@ import java.io.IOException;
 
 public class ErrorLimitsServer {
   public static void main(String[] args) throws IOException, InterruptedException {
-    final int PORT = 8001;
-    final Server grpcServer = ServerBuilder.forPort(PORT).addService(new GreeterImpl()).build();
+    // optional argument: the port to listen on
+    final int port = args.length > 0 ? Integer.parseInt(args[0]) : 8001;
+    final Server grpcServer = ServerBuilder.forPort(port).addService(new GreeterImpl()).build();
 
-    System.out.println("listening to requests on port " + PORT);
+    System.out.println("listening to requests on port " + port);
     grpcServer.start();
     grpcServer.awaitTermination();
   }
@@ -0,0 +1,106 @@
+import grpc
+import pythonmulticlient
+import queue
+import typing
+
+
+RequestType = typing.TypeVar("RequestType")
+
+# starts a call for a request on a stub, e.g.
+# lambda stub, request: stub.SayHello.future(request, timeout=5.0)
+StartBatchCall = typing.Callable[
+    [pythonmulticlient.StubType, RequestType], "grpc.Future[typing.Any]"
+]
+
+
+class BatchResult(typing.Generic[RequestType]):
+    """The outcome of one request in a batch. index is the position of request in the batch."""
+
+    def __init__(
+        self,
+        index: int,
+        request: RequestType,
+        response: typing.Any,
+        error: typing.Optional[BaseException],
+    ) -> None:
+        self.index = index
+        self.request = request
+        self.response = response
+        self.error = error
+
+    def result(self) -> typing.Any:
+        """Returns the response, or raises the error."""
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+def call_batch(
+    stub_getter: pythonmulticlient.StubGetter[pythonmulticlient.StubType],
+    requests: typing.Iterable[RequestType],
+    start_call: StartBatchCall[pythonmulticlient.StubType, RequestType],
+    max_in_flight: int = 100,
+    ordered: bool = False,
+) -> typing.Generator[BatchResult[RequestType], None, None]:
+    """Sends requests using start_call with a stub from stub_getter.get() for each request, so a
+    RoundRobinMultiStub spreads them across its ready channels. Yields a BatchResult for each
+    request in completion order, or in the order of requests if ordered is True. At most
+    max_in_flight requests are started and not yet yielded, so requests is consumed lazily and
+    results that wait for an earlier request when ordered are bounded. Failed calls are returned
+    as results with the error, and do not stop the batch. Closing the generator cancels the calls
+    in flight.
+    """
+
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be >= 1")
+
+    # futures put their index in this queue when they are done
+    done: "queue.SimpleQueue[int]" = queue.SimpleQueue()
+    # index: (request, future) for calls that were started and not yet yielded
+    pending: typing.Dict[int, typing.Tuple[RequestType, "grpc.Future[typing.Any]"]] = {}
+    # indexes of done calls, for ordered results
+    completed: typing.Set[int] = set()
+    request_iterator = iter(requests)
+    next_index = 0
+    next_yield = 0
+    exhausted = False
+
+    def start_next() -> bool:
+        nonlocal next_index
+        try:
+            request = next(request_iterator)
+        except StopIteration:
+            return False
+        index = next_index
+        next_index += 1
+        future = start_call(stub_getter.get(), request)
+        pending[index] = (request, future)
+        future.add_done_callback(lambda _: done.put(index))
+        return True
+
+    def pop_result(index: int) -> BatchResult[RequestType]:
+        request, future = pending.pop(index)
+        error = future.exception()
+        if error is not None:
+            return BatchResult(index, request, None, error)
+        return BatchResult(index, request, future.result(), None)
+
+    try:
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                exhausted = not start_next()
+            if len(pending) == 0:
+                return
+
+            index = done.get()
+            if not ordered:
+                yield pop_result(index)
+                continue
+            completed.add(index)
+            while next_yield in completed:
+                completed.remove(next_yield)
+                yield pop_result(next_yield)
+                next_yield += 1
+    finally:
+        for _, future in pending.values():
+            future.cancel()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+import argparse
+import concurrent.futures
+import grpc
+import helloworld_pb2
+import helloworld_pb2_grpc
+import json
+import loadgen
+import logging
+import platform
+import pythonmulticlient
+import socket
+import threading
+import time
+import typing
+
+
+class BenchmarkGreeter(helloworld_pb2_grpc.GreeterServicer):
+    def SayHello(
+        self, request: helloworld_pb2.HelloRequest, context: grpc.ServicerContext
+    ) -> helloworld_pb2.HelloReply:
+        return helloworld_pb2.HelloReply(message="message")
+
+
+class BenchmarkServer(object):
+    """One in-process gRPC server listening on many ports, so each port is a separate backend."""
+
+    def __init__(self, max_addrs: int, max_workers: int) -> None:
+        self.server = grpc.server(concurrent.futures.ThreadPoolExecutor(max_workers=max_workers))
+        helloworld_pb2_grpc.add_GreeterServicer_to_server(BenchmarkGreeter(), self.server)
+        self.addrs = []
+        for _ in range(max_addrs):
+            port = self.server.add_insecure_port("localhost:0")
+            self.addrs.append("localhost:" + str(port))
+        self.server.start()
+
+    def close(self) -> None:
+        self.server.stop(grace=0)
+
+
+def unused_addrs(count: int) -> typing.List[str]:
+    """Returns addresses that refuse connections, to simulate backends that are down."""
+
+    sockets = []
+    for _ in range(count):
+        s = socket.socket()
+        s.bind(("localhost", 0))
+        sockets.append(s)
+    addrs = ["localhost:" + str(s.getsockname()[1]) for s in sockets]
+    for s in sockets:
+        s.close()
+    return addrs
+
+
+def run_threads(threads: int, duration_s: float, op: typing.Callable[[], object]) -> int:
+    """Calls op from threads threads for duration_s. Returns the total number of calls."""
+
+    counts = [0] * threads
+    end = time.monotonic() + duration_s
+
+    def worker(index: int) -> None:
+        count = 0
+        while time.monotonic() < end:
+            op()
+            count += 1
+        counts[index] = count
+
+    thread_objects = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in thread_objects:
+        thread.start()
+    for thread in thread_objects:
+        thread.join()
+    return sum(counts)
+
+
+def benchmark_config(
+    server: BenchmarkServer,
+    num_addrs: int,
+    down_fraction: float,
+    watch_connectivity: bool,
+    picker_name: str,
+    thread_counts: typing.Sequence[int],
+    duration_s: float,
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Runs the selection and RPC benchmarks for one set of addresses."""
+
+    num_down = int(num_addrs * down_fraction)
+    addrs = server.addrs[: num_addrs - num_down] + unused_addrs(num_down)
+    multi_stub = pythonmulticlient.RoundRobinMultiStub(
+        addrs,
+        helloworld_pb2_grpc.GreeterStub,
+        watch_connectivity=watch_connectivity,
+        picker=pythonmulticlient.PICKERS[picker_name](),
+    )
+    config = {
+        "addrs": num_addrs,
+        "down": num_down,
+        "watch_connectivity": watch_connectivity,
+        "picker": picker_name,
+    }
+    results = []
+    try:
+        if not multi_stub.wait_ready(num_addrs - num_down, timeout_s=30.0):
+            raise Exception("timed out waiting for channels to connect: {}".format(config))
+
+        req = helloworld_pb2.HelloRequest(name="benchmark")
+
+        def send() -> grpc.StatusCode:
+            try:
+                multi_stub.get().SayHello(req)
+                return grpc.StatusCode.OK
+            except grpc.RpcError as e:
+                code: grpc.StatusCode = e.code()
+                return code
+
+        for threads in thread_counts:
+            selections = run_threads(threads, duration_s, multi_stub.get)
+            result = dict(config, benchmark="select", threads=threads)
+            result["ops_per_s"] = selections / duration_s
+            # thread time per call: includes time waiting for the lock
+            result["ns_per_op"] = duration_s * threads / selections * 1e9
+            results.append(result)
+            logging.info("%r", result)
+
+            load_result = loadgen.run(send, threads, duration_s)
+            result = dict(config, benchmark="rpc", threads=threads)
+            result.update(load_result.to_json_dict())
+            result["ops_per_s"] = result["qps"]
+            results.append(result)
+            logging.info(
+                "benchmark=rpc config=%r threads=%d qps=%f", config, threads, result["qps"]
+            )
+    finally:
+        multi_stub.close()
+    return results
+
+
+def result_key(result: typing.Dict[str, typing.Any]) -> typing.Tuple[typing.Any, ...]:
+    return (
+        result["benchmark"],
+        result["addrs"],
+        result["down"],
+        result["watch_connectivity"],
+        result["picker"],
+        result["threads"],
+    )
+
+
+def compare(
+    baseline: typing.Dict[str, typing.Any],
+    results: typing.List[typing.Dict[str, typing.Any]],
+    threshold: float,
+) -> int:
+    """Logs the change in ops_per_s for each result in baseline. Returns the regression count."""
+
+    baseline_by_key = {result_key(result): result for result in baseline["results"]}
+    regressions = 0
+    for result in results:
+        old = baseline_by_key.get(result_key(result))
+        if old is None or old["ops_per_s"] == 0:
+            continue
+        ratio = result["ops_per_s"] / old["ops_per_s"]
+        regressed = ratio < 1.0 - threshold
+        if regressed:
+            regressions += 1
+        logging.info(
+            "%s%r: ops_per_s=%.1f baseline=%.1f change=%+.1f%%",
+            "REGRESSION " if regressed else "",
+            result_key(result),
+            result["ops_per_s"],
+            old["ops_per_s"],
+            (ratio - 1.0) * 100.0,
+        )
+    return regressions
+
+
+def parse_ints(value: str) -> typing.List[int]:
+    return [int(part) for part in value.split(",")]
+
+
+def parse_floats(value: str) -> typing.List[float]:
+    return [float(part) for part in value.split(",")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark RoundRobinMultiStub selection and RPCs against in-process servers"
+    )
+    parser.add_argument(
+        "--addrs",
+        type=parse_ints,
+        default=[1, 10, 100, 1000],
+        help="comma-separated numbers of addresses to test",
+    )
+    parser.add_argument(
+        "--threads",
+        type=parse_ints,
+        default=[1, 4, 16, 64],
+        help="comma-separated numbers of calling threads to test",
+    )
+    parser.add_argument(
+        "--down_fractions",
+        type=parse_floats,
+        default=[0.0, 0.5],
+        help="comma-separated fractions of addresses that refuse connections",
+    )
+    parser.add_argument(
+        "--pickers",
+        type=lambda value: value.split(","),
+        default=["round_robin"],
+        help="comma-separated picker names: " + ",".join(sorted(pythonmulticlient.PICKERS)),
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=0.5,
+        help="seconds to run each benchmark",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="multichannel_benchmark.json",
+        help="file to write the JSON results",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default="",
+        help="JSON results from a previous run to compare against",
+    )
+    parser.add_argument(
+        "--regression_threshold",
+        type=float,
+        default=0.1,
+        help="fraction slower than the baseline to report as a regression",
+    )
+    args = parser.parse_args()
+
+    server = BenchmarkServer(max(args.addrs), max_workers=max(args.threads))
+    results: typing.List[typing.Dict[str, typing.Any]] = []
+    try:
+        for num_addrs in args.addrs:
+            for down_fraction in args.down_fractions:
+                if down_fraction > 0 and int(num_addrs * down_fraction) == 0:
+                    # identical to down_fraction=0
+                    continue
+                for watch_connectivity in (False, True):
+                    for picker_name in args.pickers:
+                        results += benchmark_config(
+                            server,
+                            num_addrs,
+                            down_fraction,
+                            watch_connectivity,
+                            picker_name,
+                            args.threads,
+                            args.duration,
+                        )
+    finally:
+        server.close()
+
+    output = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python_version": platform.python_version(),
+        "grpc_version": grpc.__version__,
+        "duration_s": args.duration,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2, sort_keys=True)
+        f.write("\n")
+    logging.info("wrote %d results to %s", len(results), args.output)
+
+    if args.baseline != "":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.regression_threshold)
+        logging.info("%d regressions compared to %s", regressions, args.baseline)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    main()
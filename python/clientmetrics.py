@@ -0,0 +1,218 @@
+import bisect
+import grpc
+import http.server
+import threading
+import typing
+
+
+# metric names
+PICKS = "grpc_multistub_picks_total"
+SKIPS = "grpc_multistub_skips_total"
+RANDOM_FALLBACKS = "grpc_multistub_random_fallbacks_total"
+CONNECT_SECONDS = "grpc_multistub_connect_seconds"
+RPCS = "grpc_multistub_rpcs_total"
+RPC_SECONDS = "grpc_multistub_rpc_seconds"
+
+_COUNTER = "counter"
+_HISTOGRAM = "histogram"
+
+# name: (type, label names, help)
+_METRICS = {
+    PICKS: (_COUNTER, ("addr",), "Channels returned by get() from the ready channels."),
+    SKIPS: (_COUNTER, ("addr", "state"), "Channels skipped by get() because they were not READY."),
+    RANDOM_FALLBACKS: (
+        _COUNTER,
+        ("addr",),
+        "Channels returned by get() at random because no channels were READY.",
+    ),
+    CONNECT_SECONDS: (
+        _HISTOGRAM,
+        ("addr",),
+        "Time from a channel being created or seen not READY until it is seen READY.",
+    ),
+    RPCS: (_COUNTER, ("addr", "code"), "Completed RPCs by status code."),
+    RPC_SECONDS: (_HISTOGRAM, ("addr",), "RPC latency."),
+}
+
+# histogram bucket upper bounds in seconds
+_BUCKETS_S = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+class _Histogram:
+    def __init__(self) -> None:
+        # the last count is for values larger than the last bucket
+        self.counts = [0] * (len(_BUCKETS_S) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(_BUCKETS_S, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: typing.Sequence[str], values: typing.Sequence[str]) -> str:
+    if len(names) == 0:
+        return ""
+    pairs = ['{}="{}"'.format(name, _escape(value)) for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metrics:
+    """Counts what RoundRobinMultiStub does for each address: which channels get() returns or
+    skips, how long channels take to connect, and the latency and status of RPCs. Thread-safe.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: typing.Dict[str, typing.Dict[typing.Tuple[str, ...], int]] = {}
+        self._histograms: typing.Dict[str, typing.Dict[typing.Tuple[str, ...], _Histogram]] = {}
+        for name, (metric_type, _, _) in _METRICS.items():
+            if metric_type == _COUNTER:
+                self._counters[name] = {}
+            else:
+                self._histograms[name] = {}
+        # monotonic time each channel was first seen not READY. Keyed by channel, since there
+        # can be many channels to one address
+        self._not_ready_since: typing.Dict[typing.Hashable, float] = {}
+
+    def _inc(self, name: str, labels: typing.Tuple[str, ...]) -> None:
+        with self._lock:
+            values = self._counters[name]
+            values[labels] = values.get(labels, 0) + 1
+
+    def _observe(self, name: str, labels: typing.Tuple[str, ...], value: float) -> None:
+        with self._lock:
+            values = self._histograms[name]
+            histogram = values.get(labels)
+            if histogram is None:
+                histogram = _Histogram()
+                values[labels] = histogram
+            histogram.observe(value)
+
+    def record_pick(self, addr: str) -> None:
+        self._inc(PICKS, (addr,))
+
+    def record_skip(self, addr: str, state: grpc.ChannelConnectivity) -> None:
+        self._inc(SKIPS, (addr, state.name))
+
+    def record_random_fallback(self, addr: str) -> None:
+        self._inc(RANDOM_FALLBACKS, (addr,))
+
+    def record_state(
+        self,
+        addr: str,
+        channel: typing.Hashable,
+        state: grpc.ChannelConnectivity,
+        now: float,
+    ) -> None:
+        """Records the connectivity state of channel to addr at monotonic time now. When the
+        channel becomes READY, this records the time since it was first seen not READY.
+        """
+        with self._lock:
+            if state is not grpc.ChannelConnectivity.READY:
+                self._not_ready_since.setdefault(channel, now)
+                return
+            since = self._not_ready_since.pop(channel, None)
+        if since is not None:
+            self._observe(CONNECT_SECONDS, (addr,), now - since)
+
+    def remove_channel(self, channel: typing.Hashable) -> None:
+        """Forgets the state of a channel that was removed."""
+        with self._lock:
+            self._not_ready_since.pop(channel, None)
+
+    def record_rpc(self, addr: str, code: grpc.StatusCode, latency_s: float) -> None:
+        self._inc(RPCS, (addr, code.name))
+        self._observe(RPC_SECONDS, (addr,), latency_s)
+
+    def counter(self, name: str, *labels: str) -> int:
+        """Returns the value of a counter."""
+        with self._lock:
+            return self._counters[name].get(labels, 0)
+
+    def histogram_count(self, name: str, *labels: str) -> int:
+        """Returns the number of values recorded in a histogram."""
+        with self._lock:
+            histogram = self._histograms[name].get(labels)
+            if histogram is None:
+                return 0
+            return histogram.count
+
+    def prometheus_text(self) -> str:
+        """Returns the metrics in the Prometheus text exposition format."""
+
+        lines = []
+        with self._lock:
+            for name, (metric_type, label_names, help_text) in _METRICS.items():
+                lines.append("# HELP {} {}".format(name, help_text))
+                lines.append("# TYPE {} {}".format(name, metric_type))
+                if metric_type == _COUNTER:
+                    for labels, value in sorted(self._counters[name].items()):
+                        lines.append(
+                            "{}{} {}".format(name, _format_labels(label_names, labels), value)
+                        )
+                    continue
+
+                bucket_names = tuple(label_names) + ("le",)
+                for labels, histogram in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(_BUCKETS_S + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        bucket_labels = labels + ("+Inf" if bound == float("inf") else repr(bound),)
+                        lines.append(
+                            "{}_bucket{} {}".format(
+                                name, _format_labels(bucket_names, bucket_labels), cumulative
+                            )
+                        )
+                    formatted = _format_labels(label_names, labels)
+                    lines.append("{}_sum{} {}".format(name, formatted, repr(histogram.sum)))
+                    lines.append("{}_count{} {}".format(name, formatted, histogram.count))
+        return "\n".join(lines) + "\n"
+
+
+def serve_prometheus(metrics: Metrics, addr: str, port: int) -> http.server.ThreadingHTTPServer:
+    """Serves metrics in the Prometheus text format at /metrics on addr:port from a background
+    thread. Call shutdown() on the returned server to stop it.
+    """
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: typing.Any) -> None:
+            # do not log every scrape to stderr
+            pass
+
+    server = http.server.ThreadingHTTPServer((addr, port), Handler)
+    thread = threading.Thread(target=server.serve_forever, name="serve_prometheus", daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+import argparse
+import grpc
+import helloworld_pb2
+import helloworld_pb2_grpc
+import itertools
+import logging
+import os
+import pythonclient
+import shlex
+import socket
+import subprocess
+import sys
+import time
+import typing
+import concurrent.futures
+
+
+_PYTHON_SERVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pythonserver.py")
+_REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# commands to start each kind of server; {port} is replaced with the port to listen on
+DEFAULT_SERVER_COMMANDS = {
+    "python": "{} {} --addr=localhost:{{port}} --logEvery=0".format(
+        shlex.quote(sys.executable), shlex.quote(_PYTHON_SERVER_PATH)
+    ),
+    # install with: go install ./grpclimitsserver
+    "go": "grpclimitsserver --addr=localhost:{port}",
+    # build with: (cd java/errorlimitserver && mvn package)
+    "java": "java -cp java/errorlimitserver/target/errorlimitsserver-1.0-SNAPSHOT.jar"
+    " ca.evanjones.ErrorLimitsServer {port}",
+}
+
+# seconds to wait for a server to start accepting connections
+_SERVER_START_TIMEOUT_S = 60.0
+# seconds to wait for a server to exit after SIGTERM before killing it
+_SERVER_STOP_TIMEOUT_S = 10.0
+
+
+class ProbeResult(object):
+    """The result of one request for an error of err_length bytes."""
+
+    def __init__(self, err_length: int, code: grpc.StatusCode, details: str) -> None:
+        self.err_length = err_length
+        self.code = code
+        self.details = details
+
+    def received(self) -> bool:
+        """Returns True if the client received the complete error from the server."""
+        return (
+            self.code == grpc.StatusCode.FAILED_PRECONDITION
+            and len(self.details) == self.err_length
+        )
+
+
+def find_boundary(
+    fails: typing.Callable[[int], typing.Optional[ProbeResult]],
+    max_err_length: int,
+    known_failure: typing.Optional[ProbeResult] = None,
+) -> typing.Optional[ProbeResult]:
+    """Binary searches for the shortest error length in [0, max_err_length] where fails returns
+    a result, assuming it also returns a result for every longer length. Returns that result, or
+    None if max_err_length does not fail. If known_failure is set, it is a failure at
+    max_err_length, which is not probed again.
+    """
+    failure = known_failure
+    if failure is None:
+        failure = fails(max_err_length)
+    if failure is None:
+        return None
+    zero = fails(0)
+    if zero is not None:
+        return zero
+
+    # invariant: low does not fail and high fails
+    low = 0
+    high = max_err_length
+    while high - low > 1:
+        middle = (low + high) // 2
+        result = fails(middle)
+        if result is None:
+            low = middle
+        else:
+            high = middle
+            failure = result
+    return failure
+
+
+class SweepConfig(object):
+    """One combination of server and client options to sweep."""
+
+    def __init__(
+        self, server: str, max_header_size: int, keepalive_time_s: float, lb_policy: str
+    ) -> None:
+        self.server = server
+        self.max_header_size = max_header_size
+        self.keepalive_time_s = keepalive_time_s
+        self.lb_policy = lb_policy
+
+    def grpc_options(self) -> typing.Tuple[typing.Tuple[str, typing.Any], ...]:
+        return pythonclient.grpc_options(
+            lb_policy=self.lb_policy,
+            keepalive_time_s=self.keepalive_time_s,
+            max_header_size=self.max_header_size,
+        )
+
+
+class SweepResult(object):
+    def __init__(
+        self,
+        config: SweepConfig,
+        first_failure: typing.Optional[ProbeResult],
+        always_failure: typing.Optional[ProbeResult],
+        probes: int,
+        elapsed_s: float,
+    ) -> None:
+        self.config = config
+        # the shortest error that failed at least once
+        self.first_failure = first_failure
+        # the shortest error that failed every attempt
+        self.always_failure = always_failure
+        self.probes = probes
+        self.elapsed_s = elapsed_s
+
+    def to_json_dict(self) -> typing.Dict[str, typing.Any]:
+        output: typing.Dict[str, typing.Any] = {
+            "server": self.config.server,
+            "max_header_size": self.config.max_header_size,
+            "keepalive_time_s": self.config.keepalive_time_s,
+            "lb_policy": self.config.lb_policy,
+            "probes": self.probes,
+            "elapsed_s": self.elapsed_s,
+        }
+        for name, failure in (("first", self.first_failure), ("always", self.always_failure)):
+            output[name + "_failing_err_length"] = None
+            if failure is not None:
+                output[name + "_failing_err_length"] = failure.err_length
+                output[name + "_code"] = failure.code.name
+                output[name + "_details"] = failure.details
+        return output
+
+
+def sweep_config(
+    addr: str, config: SweepConfig, max_err_length: int, attempts: int, timeout_s: float
+) -> SweepResult:
+    """Finds the shortest errors that fail for config, using one channel to addr. Each length
+    is tried up to attempts times: the C core rejects trailers over grpc.max_metadata_size at
+    random until a hard limit, so some lengths only fail some of the time.
+    """
+
+    start = time.monotonic()
+    probes = 0
+    with grpc.insecure_channel(addr, options=config.grpc_options()) as channel:
+        stub = helloworld_pb2_grpc.GreeterStub(channel)
+
+        def probe(err_length: int) -> ProbeResult:
+            nonlocal probes
+            probes += 1
+            request = helloworld_pb2.HelloRequest(name="errLength={}".format(err_length))
+            try:
+                # wait_for_ready: failures can close the connection; do not fail the next probe
+                stub.SayHello(request, timeout=timeout_s, wait_for_ready=True)
+                return ProbeResult(err_length, grpc.StatusCode.OK, "")
+            except grpc.RpcError as e:
+                # The raised RpcError will also be a Call
+                if not isinstance(e, grpc.Call):
+                    raise Exception("BUG: grpc.RpcError should be an instance of grpc.Call")
+                return ProbeResult(err_length, e.code(), e.details() or "")
+
+        def sometimes_fails(err_length: int) -> typing.Optional[ProbeResult]:
+            for _ in range(attempts):
+                result = probe(err_length)
+                if not result.received():
+                    return result
+            return None
+
+        def always_fails(err_length: int) -> typing.Optional[ProbeResult]:
+            for _ in range(attempts):
+                result = probe(err_length)
+                if result.received():
+                    return None
+            return result
+
+        # search below always_failure, so first_failure is not longer when results are random
+        always_failure = find_boundary(always_fails, max_err_length)
+        if always_failure is None:
+            first_failure = find_boundary(sometimes_fails, max_err_length)
+        else:
+            first_failure = find_boundary(
+                sometimes_fails, always_failure.err_length, always_failure
+            )
+    result = SweepResult(config, first_failure, always_failure, probes, time.monotonic() - start)
+    logging.info("%r", result.to_json_dict())
+    return result
+
+
+def run_sweep(
+    addrs: typing.Mapping[str, str],
+    configs: typing.Sequence[SweepConfig],
+    max_err_length: int,
+    attempts: int,
+    parallelism: int,
+    timeout_s: float,
+) -> typing.List[SweepResult]:
+    """Runs configs concurrently against the servers in addrs (server name: address). Returns
+    the results in the order of configs.
+    """
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=parallelism) as executor:
+        futures = [
+            executor.submit(
+                sweep_config, addrs[config.server], config, max_err_length, attempts, timeout_s
+            )
+            for config in configs
+        ]
+        return [future.result() for future in futures]
+
+
+def format_table(results: typing.Sequence[SweepResult]) -> str:
+    """Returns results formatted as an aligned text table."""
+
+    header = (
+        "server",
+        "max_header_size",
+        "keepalive_s",
+        "lb_policy",
+        "first_fail",
+        "always_fail",
+        "code",
+    )
+    rows = [header]
+    for result in results:
+        first_fail = "none"
+        always_fail = "none"
+        code = ""
+        if result.first_failure is not None:
+            first_fail = str(result.first_failure.err_length)
+            code = result.first_failure.code.name
+        if result.always_failure is not None:
+            always_fail = str(result.always_failure.err_length)
+        rows.append(
+            (
+                result.config.server,
+                str(result.config.max_header_size or "default"),
+                (
+                    "{:g}".format(result.config.keepalive_time_s)
+                    if result.config.keepalive_time_s > 0
+                    else "default"
+                ),
+                result.config.lb_policy or "default",
+                first_fail,
+                always_fail,
+                code,
+            )
+        )
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    lines = ["  ".join(value.ljust(width) for value, width in zip(row, widths)) for row in rows]
+    return "\n".join(line.rstrip() for line in lines) + "\n"
+
+
+def _unused_port() -> int:
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        port: int = s.getsockname()[1]
+        return port
+
+
+class ServerProcess(object):
+    """A server started from a command template, listening on an unused localhost port."""
+
+    def __init__(self, name: str, command_template: str) -> None:
+        self.name = name
+        port = _unused_port()
+        self.addr = "localhost:" + str(port)
+        command = shlex.split(command_template.format(port=port))
+        logging.info("starting server %s: %s", name, command)
+        self.process = subprocess.Popen(
+            command, cwd=_REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            self._wait_ready()
+        except Exception:
+            self.stop()
+            raise
+
+    def _wait_ready(self) -> None:
+        deadline = time.monotonic() + _SERVER_START_TIMEOUT_S
+        with grpc.insecure_channel(self.addr) as channel:
+            ready = grpc.channel_ready_future(channel)
+            while True:
+                try:
+                    ready.result(timeout=0.1)
+                    return
+                except grpc.FutureTimeoutError:
+                    pass
+                if self.process.poll() is not None:
+                    raise Exception(
+                        "server {} exited with code {}".format(self.name, self.process.returncode)
+                    )
+                if time.monotonic() > deadline:
+                    raise Exception("timed out waiting for server {} to start".format(self.name))
+
+    def stop(self) -> None:
+        if self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(_SERVER_STOP_TIMEOUT_S)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def _parse_list(value: str, parse: typing.Callable[[str], typing.Any]) -> typing.List[typing.Any]:
+    return [parse(part.strip()) for part in value.split(",")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Find the longest error each server and client configuration can return"
+    )
+    parser.add_argument(
+        "--servers",
+        type=str,
+        default="python",
+        help=(
+            "comma-separated servers: python, go, java, or NAME=HOST:PORT to use a running server"
+        ),
+    )
+    for name in DEFAULT_SERVER_COMMANDS:
+        parser.add_argument(
+            "--{}Command".format(name),
+            type=str,
+            default=DEFAULT_SERVER_COMMANDS[name],
+            help="command to start the {} server; {{port}} is the port".format(name),
+        )
+    parser.add_argument(
+        "--maxHeaderSizes",
+        type=str,
+        default="0,8192,16384",
+        help="comma-separated grpc.max_metadata_size values; 0 is the default",
+    )
+    parser.add_argument(
+        "--keepaliveTimes",
+        type=str,
+        default="0",
+        help="comma-separated keepalive times in seconds; 0 is the default",
+    )
+    parser.add_argument(
+        "--lbPolicies",
+        type=str,
+        default="",
+        help="comma-separated gRPC load balancer policies; empty is the default",
+    )
+    parser.add_argument(
+        "--maxErrLength",
+        type=int,
+        default=1 << 25,
+        help="longest error length to try",
+    )
+    parser.add_argument(
+        "--attempts",
+        type=int,
+        default=5,
+        help="number of requests for each error length: some lengths only fail some of the time",
+    )
+    parser.add_argument(
+        "--parallelism",
+        type=int,
+        default=8,
+        help="number of configurations to sweep at the same time",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=30.0,
+        help="seconds to wait for each request",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="",
+        help="file to write the JSON results; default: only print the table",
+    )
+    args = parser.parse_args()
+
+    servers = []
+    addrs = {}
+    for server in _parse_list(args.servers, str):
+        name, _, addr = server.partition("=")
+        if addr != "":
+            addrs[name] = addr
+        elif name in DEFAULT_SERVER_COMMANDS:
+            servers.append((name, getattr(args, name + "Command")))
+        else:
+            raise ValueError("unknown server: " + repr(server))
+
+    configs = [
+        SweepConfig(server, max_header_size, keepalive_time_s, lb_policy)
+        for server, max_header_size, keepalive_time_s, lb_policy in itertools.product(
+            [name for name, _ in servers] + list(addrs),
+            _parse_list(args.maxHeaderSizes, int),
+            _parse_list(args.keepaliveTimes, float),
+            _parse_list(args.lbPolicies, str),
+        )
+    ]
+
+    processes: typing.List[ServerProcess] = []
+    try:
+        for name, command in servers:
+            process = ServerProcess(name, command)
+            processes.append(process)
+            addrs[name] = process.addr
+
+        start = time.monotonic()
+        results = run_sweep(
+            addrs, configs, args.maxErrLength, args.attempts, args.parallelism, args.timeout
+        )
+        elapsed_s = time.monotonic() - start
+    finally:
+        for process in processes:
+            process.stop()
+
+    sys.stdout.write(format_table(results))
+    print("swept {} configurations in {:.1f} seconds".format(len(results), elapsed_s))
+    if args.output != "":
+        pythonclient.write_json(
+            {"results": [result.to_json_dict() for result in results]}, args.output
+        )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    main()
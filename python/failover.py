@@ -0,0 +1,218 @@
+import grpc
+import pythonmulticlient
+import queue
+import threading
+import time
+import typing
+
+
+# starts a call on a stub with a timeout in seconds, e.g.
+# lambda stub, timeout: stub.SayHello.future(request, timeout=timeout)
+StartCall = typing.Callable[
+    [pythonmulticlient.StubType, typing.Optional[float]], "grpc.Future[typing.Any]"
+]
+
+# number of recent latencies used to compute the hedging delay
+_LATENCY_WINDOW = 1000
+# recompute the hedging delay after this many new latencies
+_LATENCY_RECOMPUTE_EVERY = 100
+# do not hedge until there are this many latencies
+_LATENCY_MIN_SAMPLES = 20
+
+
+def is_retryable(error: grpc.RpcError) -> bool:
+    """Returns True if error should be retried on a different backend: UNAVAILABLE, or an
+    INTERNAL error caused by the connection resetting the stream (e.g. the response headers were
+    larger than the client's limit).
+    """
+    code = error.code()
+    if code == grpc.StatusCode.UNAVAILABLE:
+        return True
+    if code == grpc.StatusCode.INTERNAL:
+        details = error.details()
+        return details is not None and "RST_STREAM" in details
+    return False
+
+
+class RetryBudget:
+    """Limits retries and hedged requests to ratio of all requests, plus min_per_s, so a backend
+    outage does not multiply the load on the remaining backends. Each request deposits ratio
+    tokens, each retry withdraws one, and min_per_s tokens are added every second, up to
+    max_tokens. Thread-safe.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_s: float = 10.0, max_tokens: float = 100.0):
+        if ratio < 0 or min_per_s < 0 or max_tokens < 0:
+            raise ValueError("ratio, min_per_s, and max_tokens must be >= 0")
+        self._lock = threading.Lock()
+        self.ratio = ratio
+        self.min_per_s = min_per_s
+        self.max_tokens = max_tokens
+        self._tokens = min(min_per_s, max_tokens)
+        self._last_refill = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.max_tokens, self._tokens + (now - self._last_refill) * self.min_per_s
+        )
+        self._last_refill = now
+
+    def deposit(self) -> None:
+        """Records a request."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        """Returns True if a retry or hedged request is permitted."""
+        with self._lock:
+            self._refill()
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+
+class LatencyPercentile:
+    """Tracks a percentile of the last _LATENCY_WINDOW latencies. Thread-safe."""
+
+    def __init__(self, percentile: float) -> None:
+        if not 0 < percentile <= 100:
+            raise ValueError("percentile must be in (0, 100]: " + str(percentile))
+        self._lock = threading.Lock()
+        self.percentile = percentile
+        self._latencies: typing.List[float] = []
+        self._next_index = 0
+        self._since_recompute = 0
+        self._value_s: typing.Optional[float] = None
+
+    def record(self, latency_s: float) -> None:
+        with self._lock:
+            if len(self._latencies) < _LATENCY_WINDOW:
+                self._latencies.append(latency_s)
+            else:
+                self._latencies[self._next_index] = latency_s
+                self._next_index = (self._next_index + 1) % _LATENCY_WINDOW
+            self._since_recompute += 1
+            # sorting is too expensive to do on every call
+            if len(self._latencies) >= _LATENCY_MIN_SAMPLES and (
+                self._value_s is None or self._since_recompute >= _LATENCY_RECOMPUTE_EVERY
+            ):
+                latencies = sorted(self._latencies)
+                index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100.0))
+                self._value_s = latencies[index]
+                self._since_recompute = 0
+
+    def value_s(self) -> typing.Optional[float]:
+        """Returns the percentile, or None if there are not enough latencies."""
+        return self._value_s
+
+
+class FailoverCaller(typing.Generic[pythonmulticlient.StubType]):
+    """Sends calls using a RoundRobinMultiStub. Calls that fail with a retryable error are
+    retried on a different backend. If hedging is enabled, a second copy of a call is sent to a
+    different backend if the first does not finish within the hedge delay, and the first response
+    is used. Only use this for idempotent calls: a call may be executed more than once.
+
+    The hedge delay is hedge_delay_s if set, otherwise the hedge_percentile latency of recent
+    successful calls. Each call makes at most max_attempts attempts, and retries and hedges are
+    limited by budget, which may be shared by many callers.
+    """
+
+    def __init__(
+        self,
+        multi_stub: pythonmulticlient.RoundRobinMultiStub[pythonmulticlient.StubType],
+        max_attempts: int = 2,
+        hedge_delay_s: typing.Optional[float] = None,
+        hedge_percentile: typing.Optional[float] = None,
+        budget: typing.Optional[RetryBudget] = None,
+        retryable: typing.Callable[[grpc.RpcError], bool] = is_retryable,
+    ) -> None:
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be >= 1")
+        if hedge_delay_s is not None and hedge_percentile is not None:
+            raise ValueError("only one of hedge_delay_s and hedge_percentile can be set")
+        self.multi_stub = multi_stub
+        self.max_attempts = max_attempts
+        self.hedge_delay_s = hedge_delay_s
+        self.latencies: typing.Optional[LatencyPercentile] = None
+        if hedge_percentile is not None:
+            self.latencies = LatencyPercentile(hedge_percentile)
+        if budget is None:
+            budget = RetryBudget()
+        self.budget = budget
+        self.retryable = retryable
+
+    def _hedge_delay(self) -> typing.Optional[float]:
+        if self.hedge_delay_s is not None:
+            return self.hedge_delay_s
+        if self.latencies is not None:
+            return self.latencies.value_s()
+        return None
+
+    def call(
+        self,
+        start_call: StartCall[pythonmulticlient.StubType],
+        timeout: typing.Optional[float] = None,
+    ) -> typing.Any:
+        """Calls start_call with a stub and the remaining timeout for each attempt, and returns
+        the first successful response. Raises the last error if all attempts fail.
+        """
+
+        self.budget.deposit()
+        deadline = None
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+
+        # futures put themselves in this queue when they are done
+        done: "queue.SimpleQueue[grpc.Future[typing.Any]]" = queue.SimpleQueue()
+        tried: typing.List[pythonmulticlient.NamedChannel[pythonmulticlient.StubType]] = []
+        start_times: typing.Dict["grpc.Future[typing.Any]", float] = {}
+
+        def start_attempt() -> None:
+            named_channel = self.multi_stub.get_named(tried)
+            tried.append(named_channel)
+            remaining = None
+            if deadline is not None:
+                remaining = max(0.0, deadline - time.monotonic())
+            future = start_call(named_channel.stub, remaining)
+            start_times[future] = time.monotonic()
+            future.add_done_callback(done.put)
+
+        start_attempt()
+        hedge_delay = self._hedge_delay()
+        try:
+            while True:
+                wait_s = None
+                if hedge_delay is not None and len(tried) < self.max_attempts:
+                    wait_s = hedge_delay
+                try:
+                    future = done.get(timeout=wait_s)
+                except queue.Empty:
+                    # only hedge once: the next attempt waits for a response or error
+                    hedge_delay = None
+                    if self.budget.try_withdraw():
+                        start_attempt()
+                    continue
+
+                error = future.exception()
+                if error is None:
+                    if self.latencies is not None:
+                        self.latencies.record(time.monotonic() - start_times[future])
+                    return future.result()
+                del start_times[future]
+
+                if (
+                    isinstance(error, grpc.RpcError)
+                    and self.retryable(error)
+                    and len(tried) < self.max_attempts
+                    and self.budget.try_withdraw()
+                ):
+                    start_attempt()
+                elif len(start_times) == 0:
+                    # no attempts are still running
+                    raise error
+        finally:
+            for future in start_times:
+                future.cancel()
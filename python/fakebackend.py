@@ -0,0 +1,196 @@
+import grpc
+import helloworld_pb2
+import helloworld_pb2_grpc
+import loadreport
+import math
+import random
+import threading
+import time
+import typing
+import concurrent.futures
+
+
+# returns a latency in seconds, using the random number generator it is passed
+LatencyDistribution = typing.Callable[[random.Random], float]
+
+
+def constant_latency(latency_s: float) -> LatencyDistribution:
+    return lambda rng: latency_s
+
+
+def uniform_latency(min_s: float, max_s: float) -> LatencyDistribution:
+    return lambda rng: rng.uniform(min_s, max_s)
+
+
+def exponential_latency(mean_s: float) -> LatencyDistribution:
+    return lambda rng: rng.expovariate(1.0 / mean_s)
+
+
+def lognormal_latency(median_s: float, sigma: float) -> LatencyDistribution:
+    """Returns a distribution with a long tail, like many production services."""
+    mu = math.log(median_s)
+    return lambda rng: rng.lognormvariate(mu, sigma)
+
+
+def bimodal_latency(fast_s: float, slow_s: float, slow_fraction: float) -> LatencyDistribution:
+    """Returns slow_s for slow_fraction of calls and fast_s for the rest, like a cache miss or a
+    garbage collection pause.
+    """
+    return lambda rng: slow_s if rng.random() < slow_fraction else fast_s
+
+
+class Faults(object):
+    """The faults a FakeGreeter injects. Attributes can be changed while it serves requests."""
+
+    def __init__(
+        self,
+        latency: typing.Optional[LatencyDistribution] = None,
+        error_code: typing.Optional[grpc.StatusCode] = None,
+        error_rate: float = 1.0,
+        error_length: int = 0,
+        reset_rate: float = 0.0,
+        slow_start_s: float = 0.0,
+        slow_start_factor: float = 1.0,
+    ) -> None:
+        # if set: requests are delayed by a latency from this distribution
+        self.latency = latency
+        # if set: error_rate of requests fail with this code, and details of error_length bytes
+        self.error_code = error_code
+        self.error_rate = error_rate
+        self.error_length = error_length
+        # fraction of requests where the server resets the stream (the client sees CANCELLED)
+        self.reset_rate = reset_rate
+        # after the server starts, latency is slow_start_factor times longer, decreasing linearly
+        # to normal over slow_start_s, like a server warming its caches
+        self.slow_start_s = slow_start_s
+        self.slow_start_factor = slow_start_factor
+
+
+class FakeGreeter(helloworld_pb2_grpc.GreeterServicer):
+    """A Greeter that injects faults and counts requests. The random choices are made by a
+    random number generator seeded with seed, so a sequence of requests is reproducible.
+    """
+
+    def __init__(self, faults: typing.Optional[Faults] = None, seed: int = 0) -> None:
+        if faults is None:
+            faults = Faults()
+        self.faults = faults
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self.request_count = 0
+        # client addresses: one for each connection
+        self.peers: typing.Set[str] = set()
+        # if set: requests wait for this event before responding
+        self.gate: typing.Optional[threading.Event] = None
+        # if set: responses include this load report in the trailing metadata
+        self.load_report: typing.Optional[str] = None
+        # monotonic time the server started: used for slow start
+        self.started_at = time.monotonic()
+
+    def _latency_s(self) -> float:
+        """Returns the injected latency for one request. Must hold the lock."""
+        faults = self.faults
+        if faults.latency is None:
+            return 0.0
+        latency_s = faults.latency(self._rng)
+        if faults.slow_start_s > 0:
+            remaining = 1.0 - (time.monotonic() - self.started_at) / faults.slow_start_s
+            if remaining > 0:
+                latency_s *= 1.0 + (faults.slow_start_factor - 1.0) * remaining
+        return latency_s
+
+    def SayHello(
+        self, request: helloworld_pb2.HelloRequest, context: grpc.ServicerContext
+    ) -> helloworld_pb2.HelloReply:
+        faults = self.faults
+        with self._lock:
+            self.request_count += 1
+            self.peers.add(context.peer())
+            latency_s = self._latency_s()
+            reset = self._rng.random() < faults.reset_rate
+            fail = faults.error_code is not None and self._rng.random() < faults.error_rate
+
+        if self.gate is not None:
+            self.gate.wait()
+        if latency_s > 0:
+            time.sleep(latency_s)
+        if reset:
+            context.cancel()
+            return helloworld_pb2.HelloReply()
+        if self.load_report is not None:
+            context.set_trailing_metadata(((loadreport.LOAD_REPORT_KEY, self.load_report),))
+        if fail:
+            assert faults.error_code is not None
+            details = "x" * faults.error_length if faults.error_length > 0 else "error_code"
+            context.abort(faults.error_code, details)
+        return helloworld_pb2.HelloReply(message="message")
+
+
+class FakeBackend(object):
+    """An in-process gRPC server running a FakeGreeter on an ephemeral localhost port."""
+
+    def __init__(
+        self, faults: typing.Optional[Faults] = None, max_workers: int = 4, seed: int = 0
+    ) -> None:
+        self.greeter = FakeGreeter(faults, seed)
+        self.faults = self.greeter.faults
+        self.max_workers = max_workers
+        self.listen_port = 0
+        self._server: typing.Optional[grpc.Server] = None
+        self.start()
+
+    def addr(self) -> str:
+        return "localhost:" + str(self.listen_port)
+
+    def start(self) -> None:
+        """Starts the server on the same port as before, or an ephemeral port the first time."""
+        if self._server is not None:
+            raise ValueError("server is already running")
+        server = grpc.server(concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers))
+        helloworld_pb2_grpc.add_GreeterServicer_to_server(self.greeter, server)
+        port = server.add_insecure_port("localhost:" + str(self.listen_port))
+        if port == 0:
+            raise Exception("failed to listen on port {}".format(self.listen_port))
+        self.listen_port = port
+        self.greeter.started_at = time.monotonic()
+        server.start()
+        self._server = server
+
+    def stop(self) -> None:
+        """Stops the server, failing calls in flight. Connections are refused until start()."""
+        if self._server is not None:
+            self._server.stop(grace=0).wait()
+            self._server = None
+
+    def drop_connections(self) -> None:
+        """Closes all connections, as if the backend restarted. Clients can reconnect at once."""
+        self.stop()
+        self.start()
+
+    def close(self) -> None:
+        self.stop()
+
+
+class FakeCluster(object):
+    """Many FakeBackends, one for each Faults, each with its own seed."""
+
+    def __init__(
+        self, faults: typing.Sequence[Faults], max_workers: int = 4, seed: int = 0
+    ) -> None:
+        self.backends: typing.List[FakeBackend] = []
+        try:
+            for i, backend_faults in enumerate(faults):
+                self.backends.append(FakeBackend(backend_faults, max_workers, seed + i))
+        except Exception:
+            self.close()
+            raise
+
+    def addrs(self) -> typing.List[str]:
+        return [backend.addr() for backend in self.backends]
+
+    def request_counts(self) -> typing.List[int]:
+        return [backend.greeter.request_count for backend in self.backends]
+
+    def close(self) -> None:
+        for backend in self.backends:
+            backend.close()
@@ -5,10 +5,14 @@ from typing import ClassVar as _ClassVar, Optional as _Optional
 DESCRIPTOR: _descriptor.FileDescriptor
 
 class HelloRequest(_message.Message):
-    __slots__ = ["name"]
+    __slots__ = ["name", "reply_count", "reply_length"]
     NAME_FIELD_NUMBER: _ClassVar[int]
+    REPLY_COUNT_FIELD_NUMBER: _ClassVar[int]
+    REPLY_LENGTH_FIELD_NUMBER: _ClassVar[int]
     name: str
-    def __init__(self, name: _Optional[str] = ...) -> None: ...
+    reply_count: int
+    reply_length: int
+    def __init__(self, name: _Optional[str] = ..., reply_count: _Optional[int] = ..., reply_length: _Optional[int] = ...) -> None: ...
 
 class HelloReply(_message.Message):
     __slots__ = ["message"]
@@ -0,0 +1,195 @@
+import grpc
+import math
+import threading
+import time
+import typing
+
+
+class LatencyHistogram:
+    """Records latencies with bounded relative error, using log-linear buckets like HdrHistogram.
+    Values are recorded in microseconds. Each power of two range is split into
+    2**(_SUB_BUCKET_BITS-1) buckets, and reported values are the middle of a bucket, so they are
+    within 1% of the recorded values. This is not thread-safe: use one histogram per thread and
+    merge them.
+    """
+
+    _SUB_BUCKET_BITS = 7
+    _SUB_BUCKET_MASK = (1 << _SUB_BUCKET_BITS) - 1
+
+    def __init__(self) -> None:
+        self.counts: typing.Dict[int, int] = {}
+        self.total_count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    @staticmethod
+    def _index(value_us: int) -> int:
+        shift = max(0, value_us.bit_length() - LatencyHistogram._SUB_BUCKET_BITS)
+        return (shift << LatencyHistogram._SUB_BUCKET_BITS) + (value_us >> shift)
+
+    @staticmethod
+    def _bucket_value_us(index: int) -> float:
+        """Returns the middle of the range of values recorded in bucket index."""
+        shift = index >> LatencyHistogram._SUB_BUCKET_BITS
+        low = (index & LatencyHistogram._SUB_BUCKET_MASK) << shift
+        return low + ((1 << shift) - 1) / 2.0
+
+    def record(self, latency_s: float) -> None:
+        value_us = max(0, int(latency_s * 1e6))
+        index = LatencyHistogram._index(value_us)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total_count += 1
+        self.total_us += value_us
+        self.max_us = max(self.max_us, value_us)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total_count += other.total_count
+        self.total_us += other.total_us
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile_s(self, percentile: float) -> float:
+        """Returns the latency in seconds that percentile percent of values are less than or
+        equal to. Returns 0.0 if the histogram is empty.
+        """
+        if self.total_count == 0:
+            return 0.0
+        target = max(1, math.ceil(percentile / 100.0 * self.total_count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                value_us = min(LatencyHistogram._bucket_value_us(index), float(self.max_us))
+                return value_us / 1e6
+        return self.max_us / 1e6
+
+    def summary(self) -> typing.Dict[str, float]:
+        """Returns the count and latency percentiles in milliseconds, for JSON output."""
+        mean_ms = 0.0
+        if self.total_count > 0:
+            mean_ms = self.total_us / self.total_count / 1e3
+        return {
+            "count": self.total_count,
+            "mean_ms": mean_ms,
+            "p50_ms": self.percentile_s(50) * 1e3,
+            "p90_ms": self.percentile_s(90) * 1e3,
+            "p99_ms": self.percentile_s(99) * 1e3,
+            "p99.9_ms": self.percentile_s(99.9) * 1e3,
+            "max_ms": self.max_us / 1e3,
+        }
+
+
+class LoadResult:
+    """Latency histograms for each status code returned during a load test."""
+
+    def __init__(self) -> None:
+        self.by_code: typing.Dict[grpc.StatusCode, LatencyHistogram] = {}
+        self.duration_s = 0.0
+
+    def record(self, code: grpc.StatusCode, latency_s: float) -> None:
+        histogram = self.by_code.get(code)
+        if histogram is None:
+            histogram = LatencyHistogram()
+            self.by_code[code] = histogram
+        histogram.record(latency_s)
+
+    def merge(self, other: "LoadResult") -> None:
+        for code, histogram in other.by_code.items():
+            merged = self.by_code.get(code)
+            if merged is None:
+                merged = LatencyHistogram()
+                self.by_code[code] = merged
+            merged.merge(histogram)
+
+    def all_codes(self) -> LatencyHistogram:
+        """Returns a histogram with the latencies for all status codes."""
+        merged = LatencyHistogram()
+        for histogram in self.by_code.values():
+            merged.merge(histogram)
+        return merged
+
+    def to_json_dict(self) -> typing.Dict[str, typing.Any]:
+        all_codes = self.all_codes()
+        qps = 0.0
+        if self.duration_s > 0:
+            qps = all_codes.total_count / self.duration_s
+        return {
+            "duration_s": self.duration_s,
+            "requests": all_codes.total_count,
+            "qps": qps,
+            "all": all_codes.summary(),
+            "codes": {
+                code.name: histogram.summary()
+                for code, histogram in sorted(self.by_code.items(), key=lambda kv: kv[0].name)
+            },
+        }
+
+
+def run(
+    send: typing.Callable[[], grpc.StatusCode],
+    concurrency: int,
+    duration_s: float,
+    target_qps: float = 0.0,
+    max_requests: int = 0,
+) -> LoadResult:
+    """Calls send from concurrency threads, and records the latency of each call by status code.
+
+    If target_qps is 0, this is a closed loop test: each thread sends a new request as soon as
+    the previous one finishes. Otherwise, this is an open loop test: requests are scheduled every
+    1/target_qps seconds, and latency is measured from the scheduled time, so a server that falls
+    behind is not hidden by threads sending fewer requests (coordinated omission). Stops after
+    duration_s seconds, or after max_requests if it is > 0.
+    """
+    if concurrency <= 0:
+        raise ValueError("concurrency must be > 0")
+    if target_qps < 0:
+        raise ValueError("target_qps must be >= 0")
+
+    lock = threading.Lock()
+    next_request = 0
+    start = time.monotonic()
+    end = start + duration_s
+
+    def next_send_time() -> typing.Optional[float]:
+        """Returns the time to send the next request, or None if the test is over."""
+        nonlocal next_request
+        with lock:
+            if max_requests > 0 and next_request >= max_requests:
+                return None
+            if target_qps > 0:
+                send_time = start + next_request / target_qps
+            else:
+                send_time = time.monotonic()
+            if send_time >= end:
+                return None
+            next_request += 1
+            return send_time
+
+    thread_results = [LoadResult() for _ in range(concurrency)]
+
+    def worker(result: LoadResult) -> None:
+        while True:
+            send_time = next_send_time()
+            if send_time is None:
+                return
+            delay = send_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            code = send()
+            result.record(code, time.monotonic() - send_time)
+
+    threads = [
+        threading.Thread(target=worker, args=(result,), name="loadgen", daemon=True)
+        for result in thread_results
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    result = LoadResult()
+    for thread_result in thread_results:
+        result.merge(thread_result)
+    result.duration_s = time.monotonic() - start
+    return result
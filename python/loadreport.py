@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+import typing
+
+
+# trailing metadata key for load reports, using the text format of ORCA (Open Request Cost
+# Aggregation): https://github.com/envoyproxy/envoy/issues/6614
+LOAD_REPORT_KEY = "endpoint-load-metrics"
+_TEXT_PREFIX = "TEXT "
+
+# load report fields
+CPU_UTILIZATION = "cpu_utilization"
+IN_FLIGHT = "in_flight"
+QUEUE_DEPTH = "queue_depth"
+
+
+def format_load_report(report: typing.Mapping[str, float]) -> str:
+    """Returns report formatted as a LOAD_REPORT_KEY metadata value."""
+    return _TEXT_PREFIX + ", ".join("{}={:g}".format(k, v) for k, v in sorted(report.items()))
+
+
+def parse_load_report(value: typing.Union[str, bytes]) -> typing.Dict[str, float]:
+    """Returns the fields of a LOAD_REPORT_KEY metadata value. Ignores fields that are not
+    numbers, and raises ValueError if the value is not a load report.
+    """
+    if isinstance(value, bytes):
+        value = value.decode("utf-8")
+    if not value.startswith(_TEXT_PREFIX):
+        raise ValueError("invalid load report: " + repr(value))
+    report = {}
+    for field in value[len(_TEXT_PREFIX) :].split(","):
+        name, _, number = field.strip().partition("=")
+        try:
+            report[name] = float(number)
+        except ValueError:
+            pass
+    return report
+
+
+def find_load_report(
+    metadata: typing.Optional[typing.Iterable[typing.Any]],
+) -> typing.Optional[typing.Dict[str, float]]:
+    """Returns the load report in gRPC metadata, or None if there is no valid load report."""
+    if metadata is None:
+        return None
+    for key, value in metadata:
+        if key == LOAD_REPORT_KEY:
+            try:
+                return parse_load_report(value)
+            except ValueError:
+                return None
+    return None
+
+
+def _usable_cpus() -> int:
+    """Returns the number of CPUs this process can use."""
+    # sched_getaffinity only exists on some platforms, e.g. Linux
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class CPUSampler:
+    """Measures the CPU utilization of this process, as a fraction of the CPUs it can use.
+    The utilization is measured over at least interval_s, so there is none for the first
+    interval_s after it is created. Thread-safe.
+    """
+
+    def __init__(self, interval_s: float = 1.0) -> None:
+        self._lock = threading.Lock()
+        self.interval_s = interval_s
+        self._cpus = _usable_cpus()
+        self._last_wall = time.monotonic()
+        self._last_cpu = time.process_time()
+        self._utilization: typing.Optional[float] = None
+
+    def utilization(self) -> typing.Optional[float]:
+        """Returns the utilization over the last interval, or None if no interval has passed.
+        Reporting 0 instead would make a backend that just started look idle.
+        """
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._last_wall
+            if elapsed >= self.interval_s:
+                cpu = time.process_time()
+                self._utilization = (cpu - self._last_cpu) / (elapsed * self._cpus)
+                self._last_wall = now
+                self._last_cpu = cpu
+            return self._utilization
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import grpc
+import grpc.aio
+import helloworld_pb2
+import helloworld_pb2_grpc
+import logging
+import pythonaiomulticlient
+import pythonclient
+
+
+async def send_requests(
+    multi_stub: pythonaiomulticlient.AsyncRoundRobinMultiStub[helloworld_pb2_grpc.GreeterStub],
+    err_length: int,
+    count: int,
+    concurrency: int,
+    inter_request_sleep: float,
+) -> None:
+    """Sends count requests using concurrency tasks that each have one request in flight."""
+
+    req = helloworld_pb2.HelloRequest(name="errLength={}".format(err_length))
+    next_request = 0
+
+    async def worker() -> None:
+        nonlocal next_request
+        while next_request < count:
+            # claim the request before awaiting, so workers do not send more than count
+            request_index = next_request
+            next_request += 1
+            if request_index > 0:
+                await asyncio.sleep(inter_request_sleep)
+
+            logging.info("sending request")
+            try:
+                await multi_stub.get().SayHello(req)
+                logging.info("SUCCESS")
+            except grpc.aio.AioRpcError as e:
+                pythonclient.log_rpc_error(e.code(), e.details() or "")
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def async_main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Send requests for large error messages with asyncio"
+    )
+    parser.add_argument(
+        "--addrs",
+        type=str,
+        default="localhost:8001",
+        help="comma-separated list of addresses to connect to",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="number of requests to have in flight at the same time",
+    )
+    pythonclient.add_client_arguments(parser)
+    args = parser.parse_args()
+    if args.addrs == "":
+        raise ValueError("--addrs is required")
+    if args.concurrency <= 0:
+        raise ValueError("--concurrency must be > 0")
+
+    addrs = args.addrs.split(",")
+    grpc_options = pythonclient.grpc_options_from_args(args)
+    logging.info("creating channels for addrs={}; options={} ...".format(addrs, grpc_options))
+    multi_stub = pythonaiomulticlient.AsyncRoundRobinMultiStub(
+        addrs, helloworld_pb2_grpc.GreeterStub, grpc_options
+    )
+    try:
+        await send_requests(
+            multi_stub, args.errLength, args.count, args.concurrency, args.interRequestSleep
+        )
+    finally:
+        await multi_stub.close()
+
+
+def main() -> None:
+    asyncio.run(async_main())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format="%(asctime)s %(levelname)s %(message)s")
+    main()
@@ -0,0 +1,102 @@
+import asyncio
+import grpc
+import grpc.aio
+import logging
+import pythonmulticlient
+import random
+import typing
+
+
+StubType = typing.TypeVar("StubType", covariant=True)
+
+
+class AsyncNamedChannel(typing.Generic[StubType]):
+    """Holds an asyncio gRPC channel, an address, and a gRPC stub."""
+
+    def __init__(self, addr: str, grpc_channel: grpc.aio.Channel, stub: StubType) -> None:
+        self.addr = addr
+        self.grpc_channel = grpc_channel
+        self.stub = stub
+
+
+class AsyncRoundRobinMultiStub(typing.Generic[StubType]):
+    """Select a ready stub from a set of addresses, using a round-robin policy, with grpc.aio.
+
+    This must be created while an event loop is running. Each channel has a task that watches its
+    connectivity state, and asks IDLE channels to connect, so get() never waits for a connection.
+    get() is not thread-safe: only call it from the event loop thread.
+    """
+
+    def __init__(
+        self,
+        addrs: typing.Iterable[str],
+        stub_type: typing.Callable[[grpc.aio.Channel], StubType],
+        grpc_options: typing.Iterable[typing.Tuple[str, typing.Any]] = (),
+    ) -> None:
+        """Create a new AsyncRoundRobinMultiStub.
+        This adds the grpc.lb_policy_name=round_robin gRPC channel option to grpc_options.
+        """
+
+        # shuffle so separate instances have different orders
+        addrs = list(addrs)
+        if len(addrs) == 0:
+            raise ValueError("addrs cannot be empty")
+        random.shuffle(addrs)
+
+        grpc_options = tuple(grpc_options) + (pythonmulticlient._ROUND_ROBIN_OPTION,)
+
+        self.named_channels: typing.List[AsyncNamedChannel[StubType]] = []
+        for addr in addrs:
+            grpc_channel = grpc.aio.insecure_channel(addr, grpc_options)
+            stub = stub_type(grpc_channel)
+            self.named_channels.append(AsyncNamedChannel(addr, grpc_channel, stub))
+
+        self.ready = pythonmulticlient.ReadyChannels[AsyncNamedChannel[StubType]]()
+        self.picker = pythonmulticlient.RoundRobinPicker[AsyncNamedChannel[StubType]]()
+        self._closed = False
+        self._watch_tasks = [
+            asyncio.create_task(self._watch_connectivity(named_channel))
+            for named_channel in self.named_channels
+        ]
+
+    async def _watch_connectivity(self, named_channel: AsyncNamedChannel[StubType]) -> None:
+        # try_to_connect=True: IDLE channels start connecting in the background
+        state = named_channel.grpc_channel.get_state(try_to_connect=True)
+        while True:
+            logging.debug("channel=%s in state=%s", named_channel.addr, state.name)
+            if state is grpc.ChannelConnectivity.READY:
+                self.ready.add(named_channel)
+            else:
+                self.ready.remove(named_channel)
+            if state is grpc.ChannelConnectivity.SHUTDOWN:
+                return
+
+            await named_channel.grpc_channel.wait_for_state_change(state)
+            state = named_channel.grpc_channel.get_state(try_to_connect=True)
+
+    def get_named(self) -> AsyncNamedChannel[StubType]:
+        """Returns a ready AsyncNamedChannel, or a random channel if none are ready."""
+
+        if len(self.ready) > 0:
+            return self.picker.pick(self.ready.channels)
+        logging.debug("no ready channels; selecting a random channel")
+        return random.choice(self.named_channels)
+
+    def get(self) -> StubType:
+        return self.get_named().stub
+
+    async def close(self) -> None:
+        """Closes all gRPC channels. Calling close multiple times is permitted."""
+
+        if self._closed:
+            return
+        self._closed = True
+
+        for task in self._watch_tasks:
+            task.cancel()
+        await asyncio.gather(*self._watch_tasks, return_exceptions=True)
+        self.ready.clear()
+
+        await asyncio.gather(
+            *(named_channel.grpc_channel.close(None) for named_channel in self.named_channels)
+        )
@@ -3,7 +3,12 @@ import argparse
 import grpc
 import helloworld_pb2
 import helloworld_pb2_grpc
+import json
+import loadgen
 import logging
+import sys
+import threading
+import throttle
 import time
 import typing
 
@@ -17,14 +22,9 @@ _KEEPALIVE_PERMIT_WITHOUT_CALLS_OPTION = "grpc.keepalive_permit_without_calls"
 _MAX_METADATA_SIZE_OPTION = "grpc.max_metadata_size"
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser(description="Send a request for a large error message")
-    parser.add_argument(
-        "--addr",
-        type=str,
-        default="localhost:8001",
-        help="address for server to connect to",
-    )
+def add_client_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the request and gRPC channel arguments shared by the Python clients."""
+
     parser.add_argument(
         "--errLength",
         type=int,
@@ -73,24 +73,287 @@ def main() -> None:
         default=0,
         help="set grpc.max_metadata_size to change the maximum header sizes",
     )
+
+
+def grpc_options(
+    lb_policy: str = "",
+    keepalive_time_s: float = 0.0,
+    keepalive_timeout_s: float = 0.0,
+    keepalive_without_calls: bool = False,
+    max_header_size: int = 0,
+) -> typing.Tuple[typing.Tuple[str, typing.Any], ...]:
+    """Returns gRPC channel options. Zero or empty values use the gRPC defaults."""
+
+    options: typing.Tuple[typing.Tuple[str, typing.Any], ...] = ()
+    if lb_policy != "":
+        options += ((_LB_POLICY_OPTION, lb_policy),)
+    if keepalive_time_s > 0:
+        options += ((_KEEPALIVE_TIME_MS_OPTION, int(keepalive_time_s * 1000)),)
+    if keepalive_timeout_s > 0:
+        options += ((_KEEPALIVE_TIMEOUT_MS_OPTION, int(keepalive_timeout_s * 1000)),)
+    if keepalive_without_calls:
+        options += ((_KEEPALIVE_PERMIT_WITHOUT_CALLS_OPTION, 1),)
+    if max_header_size:
+        options += ((_MAX_METADATA_SIZE_OPTION, max_header_size),)
+    return options
+
+
+def grpc_options_from_args(
+    args: argparse.Namespace,
+) -> typing.Tuple[typing.Tuple[str, typing.Any], ...]:
+    """Returns the gRPC channel options from the arguments added by add_client_arguments."""
+
+    return grpc_options(
+        args.lbPolicy,
+        args.keepaliveTime,
+        args.keepaliveTimeout,
+        args.keepaliveWithoutCalls,
+        args.maxHeaderSize,
+    )
+
+
+def log_rpc_error(code: grpc.StatusCode, msg: str) -> None:
+    """Logs a failed request, truncating long error messages."""
+
+    msg_truncated = msg
+    LIMIT = 70
+    if len(msg_truncated) > LIMIT:
+        msg_truncated = msg[:LIMIT] + "...TRUNCATED"
+    logging.info("EXCEPTION! code={} len(msg)={} msg={}".format(code, len(msg), msg_truncated))
+
+
+def add_benchmark_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the arguments used by run_benchmark to parser."""
+
+    parser.add_argument(
+        "--benchmark",
+        default=False,
+        action="store_true",
+        help="send requests for --duration and print latency histograms as JSON",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="benchmark: number of threads sending requests",
+    )
+    parser.add_argument(
+        "--qps",
+        type=float,
+        default=0.0,
+        help="benchmark: target requests per second (open loop); default=0: closed loop",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=10.0,
+        help="benchmark: seconds to send requests",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="",
+        help="benchmark or stream: file to write the JSON results; default: stdout",
+    )
+
+
+def run_benchmark(
+    stub: helloworld_pb2_grpc.GreeterStub, args: argparse.Namespace
+) -> typing.Dict[str, typing.Any]:
+    """Sends requests using the benchmark arguments and returns the results for JSON output."""
+
+    req = helloworld_pb2.HelloRequest(name="errLength={}".format(args.errLength))
+
+    def send() -> grpc.StatusCode:
+        try:
+            stub.SayHello(req)
+            return grpc.StatusCode.OK
+        except grpc.RpcError as e:
+            # The raised RpcError will also be a Call
+            if not isinstance(e, grpc.Call):
+                raise Exception("BUG: grpc.RpcError should be an instance of grpc.Call")
+            code: grpc.StatusCode = e.code()
+            return code
+
+    result = loadgen.run(send, args.concurrency, args.duration, args.qps)
+    output = result.to_json_dict()
+    output["mode"] = "open_loop" if args.qps > 0 else "closed_loop"
+    output["concurrency"] = args.concurrency
+    output["target_qps"] = args.qps
+    output["err_length"] = args.errLength
+    return output
+
+
+def add_stream_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the arguments used by run_stream to parser."""
+
+    parser.add_argument(
+        "--stream",
+        type=str,
+        default="",
+        choices=("", "server", "bidi"),
+        help=(
+            "send one streaming call and print messages/s and bytes/s as JSON; the stream ends"
+            " with the --errLength error, or OK if it is 0"
+        ),
+    )
+    parser.add_argument(
+        "--streamReplies",
+        type=int,
+        default=10000,
+        help="stream: number of replies to receive",
+    )
+    parser.add_argument(
+        "--replyLength",
+        type=int,
+        default=100,
+        help="stream: length of the message in each reply",
+    )
+    parser.add_argument(
+        "--streamBatch",
+        type=int,
+        default=100,
+        help="bidi stream: number of replies requested by each request",
+    )
+    parser.add_argument(
+        "--streamWindow",
+        type=int,
+        default=4,
+        help="bidi stream: maximum requests sent before all their replies are received",
+    )
+
+
+def _bidi_requests(
+    args: argparse.Namespace, name: str, window: threading.Semaphore, done: threading.Event
+) -> typing.Iterator[helloworld_pb2.HelloRequest]:
+    """Yields requests for args.streamReplies replies in batches, waiting for window before
+    each request, so at most args.streamWindow batches are queued in the server and network.
+    """
+
+    remaining = args.streamReplies
+    while remaining > 0:
+        # gRPC consumes this iterator on its own thread: stop if the call ended
+        while not window.acquire(timeout=0.1):
+            if done.is_set():
+                return
+        count = min(remaining, args.streamBatch)
+        remaining -= count
+        yield helloworld_pb2.HelloRequest(
+            name=name, reply_count=count, reply_length=args.replyLength
+        )
+
+
+def run_stream(
+    stub: helloworld_pb2_grpc.GreeterStub, args: argparse.Namespace
+) -> typing.Dict[str, typing.Any]:
+    """Receives args.streamReplies replies on one stream and returns the throughput for JSON
+    output. Server streams request every reply at once. Bidi streams request args.streamBatch
+    replies at a time, with at most args.streamWindow requests outstanding.
+    """
+
+    if args.streamBatch <= 0 or args.streamWindow <= 0:
+        raise ValueError("--streamBatch and --streamWindow must be > 0")
+    name = ""
+    if args.errLength > 0:
+        name = "errLength={}".format(args.errLength)
+
+    messages = 0
+    message_bytes = 0
+    code = grpc.StatusCode.OK
+    details = ""
+    done = threading.Event()
+    window = threading.Semaphore(args.streamWindow)
+    start = time.monotonic()
+    try:
+        if args.stream == "server":
+            replies = stub.SayHelloStream(
+                helloworld_pb2.HelloRequest(
+                    name=name, reply_count=args.streamReplies, reply_length=args.replyLength
+                )
+            )
+        else:
+            replies = stub.SayHelloBidi(_bidi_requests(args, name, window, done))
+        for reply in replies:
+            messages += 1
+            message_bytes += reply.ByteSize()
+            if messages % args.streamBatch == 0:
+                window.release()
+    except grpc.RpcError as e:
+        # The raised RpcError will also be a Call
+        if not isinstance(e, grpc.Call):
+            raise Exception("BUG: grpc.RpcError should be an instance of grpc.Call")
+        code = e.code()
+        details = e.details() or ""
+    finally:
+        done.set()
+    duration_s = time.monotonic() - start
+
+    output: typing.Dict[str, typing.Any] = {
+        "mode": args.stream + "_stream",
+        "messages": messages,
+        "bytes": message_bytes,
+        "duration_s": duration_s,
+        "messages_per_s": messages / duration_s,
+        "bytes_per_s": message_bytes / duration_s,
+        "code": code.name,
+        "details_length": len(details),
+        "reply_length": args.replyLength,
+    }
+    if args.stream == "bidi":
+        output["batch"] = args.streamBatch
+        output["window"] = args.streamWindow
+    return output
+
+
+def write_json(output: typing.Dict[str, typing.Any], path: str) -> None:
+    """Writes output as JSON to path, or stdout if path is empty."""
+
+    if path == "":
+        json.dump(output, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
+        return
+    with open(path, "w") as f:
+        json.dump(output, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Send a request for a large error message")
+    parser.add_argument(
+        "--addr",
+        type=str,
+        default="localhost:8001",
+        help="address for server to connect to",
+    )
+    # not in add_client_arguments: pythonaioclient does not support it
+    parser.add_argument(
+        "--throttle",
+        default=False,
+        action="store_true",
+        help="reject requests locally when the server returns RESOURCE_EXHAUSTED or UNAVAILABLE",
+    )
+    add_client_arguments(parser)
+    add_benchmark_arguments(parser)
+    add_stream_arguments(parser)
     args = parser.parse_args()
 
-    grpc_options: typing.Tuple[typing.Tuple[str, int], ...] = ()
-    if args.lbPolicy != "":
-        grpc_options += ((_LB_POLICY_OPTION, args.lbPolicy),)
-    if args.keepaliveTime > 0:
-        grpc_options += ((_KEEPALIVE_TIME_MS_OPTION, int(args.keepaliveTime * 1000)),)
-    if args.keepaliveTimeout > 0:
-        grpc_options += ((_KEEPALIVE_TIMEOUT_MS_OPTION, int(args.keepaliveTimeout * 1000)),)
-    if args.keepaliveWithoutCalls:
-        grpc_options += ((_KEEPALIVE_PERMIT_WITHOUT_CALLS_OPTION, 1),)
-    if args.maxHeaderSize:
-        grpc_options += ((_MAX_METADATA_SIZE_OPTION, args.maxHeaderSize),)
+    grpc_options = grpc_options_from_args(args)
 
     logging.info("creating channel for addr={}; options={} ...".format(args.addr, grpc_options))
     channel = grpc.insecure_channel(args.addr, options=grpc_options)
+    if args.throttle:
+        channel = grpc.intercept_channel(
+            channel, throttle.ThrottleInterceptor(throttle.AdaptiveThrottle())
+        )
     client = helloworld_pb2_grpc.GreeterStub(channel)
 
+    if args.benchmark:
+        write_json(run_benchmark(client, args), args.output)
+        return
+    if args.stream != "":
+        write_json(run_stream(client, args), args.output)
+        return
+
     for i in range(args.count):
         if i > 0:
             time.sleep(args.interRequestSleep)
@@ -107,14 +370,7 @@ def main() -> None:
             if not isinstance(e, grpc.Call):
                 raise Exception("BUG: grpc.RpcError should be an instance of grpc.Call")
 
-            msg = e.details()
-            msg_truncated = msg
-            LIMIT = 70
-            if len(msg_truncated) > LIMIT:
-                msg_truncated = msg[:LIMIT] + "...TRUNCATED"
-            logging.info(
-                "EXCEPTION! code={} len(msg)={} msg={}".format(e.code(), len(msg), msg_truncated)
-            )
+            log_rpc_error(e.code(), e.details())
 
 
 if __name__ == "__main__":
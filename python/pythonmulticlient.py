@@ -1,13 +1,21 @@
 #!/usr/bin/env python3
 import argparse
+import clientmetrics
+import functools
 import grpc
+import hashlib
 import helloworld_pb2
 import helloworld_pb2_grpc
+import loadreport
 import logging
+import math
 import random
+import socket
 import threading
+import throttle
 import time
 import typing
+import weakref
 
 
 _CONNECTIVITY_CODE_MAP = {
@@ -24,23 +32,382 @@ def _connectivity_code_to_object(code: int) -> grpc.ChannelConnectivity:
     return _CONNECTIVITY_CODE_MAP.get(code, grpc.ChannelConnectivity.TRANSIENT_FAILURE)
 
 
+def _check_connectivity(
+    grpc_channel: grpc.Channel, try_to_connect: bool
+) -> grpc.ChannelConnectivity:
+    """Returns the channel's current state. If try_to_connect is True, IDLE channels start
+    connecting. This never blocks.
+    """
+    # call a private grpc channel method: the public subscribe API requires a thread per channel
+    state_code = grpc_channel._channel.check_connectivity_state(  # type: ignore[attr-defined]
+        try_to_connect
+    )
+    return _connectivity_code_to_object(state_code)
+
+
 # see channel arguments:
 # https://grpc.github.io/grpc/python/glossary.html#term-channel_arguments
 # https://github.com/grpc/grpc/blob/v1.37.x/include/grpc/impl/codegen/grpc_types.h
 _ROUND_ROBIN_OPTION = ("grpc.lb_policy_name", "round_robin")
+# by default, channels with the same address and arguments share a connection
+_LOCAL_SUBCHANNEL_POOL_OPTION = ("grpc.use_local_subchannel_pool", 1)
 _EMPTY_GRPC_OPTIONS = ()
 
 
 StubType = typing.TypeVar("StubType", covariant=True)
+ChannelType = typing.TypeVar("ChannelType")
+
+
+# status codes that indicate a problem with the backend, rather than the request
+OUTLIER_FAILURE_CODES = frozenset(
+    (
+        grpc.StatusCode.UNKNOWN,
+        grpc.StatusCode.RESOURCE_EXHAUSTED,
+        grpc.StatusCode.INTERNAL,
+        grpc.StatusCode.UNAVAILABLE,
+        grpc.StatusCode.DATA_LOSS,
+    )
+)
+
+
+class ChannelStats:
+    """Tracks the in-flight calls, the average latency, and the failures of calls on a channel.
+    The ejection fields are set by an OutlierDetector. Thread-safe.
+    """
+
+    # weight of each new latency sample in the exponentially weighted moving average
+    _LATENCY_EWMA_WEIGHT = 0.2
+    # weight of each new load report: servers report utilization over about a second
+    _UTILIZATION_EWMA_WEIGHT = 0.1
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self.in_flight = 0
+        # 0.0 until the first call completes
+        self.latency_ewma_s = 0.0
+
+        # calls since the last call to take_outcomes
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+
+        self.ejected = False
+        self.ejected_until = 0.0
+        # number of recent ejections: each ejection is longer than the last
+        self.ejection_count = 0
+
+        # average CPU utilization reported by the backend: None until the first report
+        self.utilization_ewma: typing.Optional[float] = None
+
+    def start_call(self) -> float:
+        """Records the start of a call. Returns the start time to pass to end_call."""
+        with self._lock:
+            self.in_flight += 1
+        return time.monotonic()
+
+    def end_call(self, start: float, failed: bool = False) -> float:
+        """Records the end of a call and returns its latency. failed is True if the backend failed
+        the call: see OUTLIER_FAILURE_CODES.
+        """
+        latency_s = time.monotonic() - start
+        with self._lock:
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self._idle.notify_all()
+            if self.latency_ewma_s == 0.0:
+                self.latency_ewma_s = latency_s
+            else:
+                self.latency_ewma_s += ChannelStats._LATENCY_EWMA_WEIGHT * (
+                    latency_s - self.latency_ewma_s
+                )
+            if failed:
+                self.failures += 1
+                self.consecutive_failures += 1
+            else:
+                self.successes += 1
+                self.consecutive_failures = 0
+        return latency_s
+
+    def record_load_report(self, report: typing.Mapping[str, float]) -> None:
+        utilization = report.get(loadreport.CPU_UTILIZATION)
+        if utilization is None:
+            return
+        with self._lock:
+            if self.utilization_ewma is None:
+                self.utilization_ewma = utilization
+            else:
+                self.utilization_ewma += ChannelStats._UTILIZATION_EWMA_WEIGHT * (
+                    utilization - self.utilization_ewma
+                )
+
+    def take_outcomes(self, min_calls: int) -> typing.Tuple[int, int, int]:
+        """Returns (successes, failures, consecutive_failures). If there were at least min_calls
+        calls, the successes and failures are reset, so the next call counts new calls.
+        """
+        with self._lock:
+            outcomes = (self.successes, self.failures, self.consecutive_failures)
+            if self.successes + self.failures >= min_calls:
+                self.successes = 0
+                self.failures = 0
+            return outcomes
+
+    def reset_outcomes(self) -> None:
+        with self._lock:
+            self.successes = 0
+            self.failures = 0
+            self.consecutive_failures = 0
+
+    def wait_idle(self, timeout_s: float) -> bool:
+        """Waits until no calls are in flight. Returns False if timeout_s expires first."""
+        with self._lock:
+            return self._idle.wait_for(lambda: self.in_flight == 0, timeout_s)
+
+    def load(self) -> float:
+        """Returns the expected cost of sending another call: lower is better.
+        This is the latency average multiplied by the calls that will share the channel.
+        """
+        if self.latency_ewma_s == 0.0:
+            return float(self.in_flight)
+        return (self.in_flight + 1) * self.latency_ewma_s
+
+
+class ChannelStatsInterceptor(grpc.UnaryUnaryClientInterceptor):  # type: ignore[type-arg]
+    """Records calls on a channel in a ChannelStats, and optionally in metrics for addr.
+    Records load reports from the backend's trailing metadata: see loadreport.
+    """
+
+    def __init__(
+        self,
+        stats: ChannelStats,
+        metrics: typing.Optional[clientmetrics.Metrics] = None,
+        addr: str = "",
+    ) -> None:
+        self.stats = stats
+        self.metrics = metrics
+        self.addr = addr
+
+    def intercept_unary_unary(
+        self,
+        continuation: typing.Callable[[grpc.ClientCallDetails, typing.Any], typing.Any],
+        client_call_details: grpc.ClientCallDetails,
+        request: typing.Any,
+    ) -> typing.Any:
+        start = self.stats.start_call()
+        try:
+            call = continuation(client_call_details, request)
+        except BaseException:
+            self.stats.end_call(start)
+            raise
+
+        def on_done(done: grpc.Call) -> None:
+            code = done.code()
+            latency_s = self.stats.end_call(start, code in OUTLIER_FAILURE_CODES)
+            report = loadreport.find_load_report(done.trailing_metadata())
+            if report is not None:
+                self.stats.record_load_report(report)
+            if self.metrics is not None:
+                self.metrics.record_rpc(self.addr, code, latency_s)
+
+        # blocking calls are already done: this calls on_done immediately
+        call.add_done_callback(on_done)
+        return call
 
 
 class NamedChannel(typing.Generic[StubType]):
     """Holds a gRPC channel, an address, and optionally a gRPC stub."""
 
-    def __init__(self, addr: str, grpc_channel: grpc.Channel, stub: StubType) -> None:
+    def __init__(
+        self,
+        addr: str,
+        grpc_channel: grpc.Channel,
+        stub: StubType,
+        stats: typing.Optional[ChannelStats] = None,
+    ) -> None:
         self.addr = addr
         self.grpc_channel = grpc_channel
         self.stub = stub
+        if stats is None:
+            stats = ChannelStats()
+        self.stats = stats
+
+
+class Picker(typing.Protocol[ChannelType]):
+    """Chooses a channel from a non-empty sequence of ready channels.
+    Called with the RoundRobinNamedChannels lock held, so it does not need to be thread-safe.
+    """
+
+    def pick(self, ready: typing.Sequence[ChannelType]) -> ChannelType:
+        # explicitly empty: this is a mypy protocol
+        ...
+
+
+class RoundRobinPicker(typing.Generic[ChannelType]):
+    """Picks the ready channels in order."""
+
+    def __init__(self) -> None:
+        self._next_index = 0
+
+    def pick(self, ready: typing.Sequence[ChannelType]) -> ChannelType:
+        index = self._next_index % len(ready)
+        self._next_index = index + 1
+        return ready[index]
+
+
+class PowerOfTwoChoicesPicker:
+    """Picks two random ready channels, and returns the one with the lowest ChannelStats.load().
+    This avoids slow or overloaded channels, without the herding caused by always choosing the
+    least loaded channel from stale statistics.
+    """
+
+    def pick(self, ready: typing.Sequence[NamedChannel[StubType]]) -> NamedChannel[StubType]:
+        if len(ready) == 1:
+            return ready[0]
+        first, second = random.sample(range(len(ready)), 2)
+        if ready[second].stats.load() < ready[first].stats.load():
+            return ready[second]
+        return ready[first]
+
+
+class LeastLoadedPicker:
+    """Picks the ready channel with the lowest ChannelStats.load(). This is O(channels)."""
+
+    def pick(self, ready: typing.Sequence[NamedChannel[StubType]]) -> NamedChannel[StubType]:
+        return min(ready, key=lambda named_channel: named_channel.stats.load())
+
+
+class WeightedRoundRobinPicker:
+    """Picks ready channels in proportion to their weights, using smooth weighted round robin
+    (as in nginx), which spreads the picks of each channel evenly. The weight of a channel is
+    1/utilization, from the load reports of its backend, so backends that are busier receive
+    fewer calls. Channels without load reports use the mean weight. This is O(channels).
+    """
+
+    # utilization below this is treated as this, so idle backends do not get all the calls
+    _MIN_UTILIZATION = 0.01
+
+    def __init__(self) -> None:
+        # not thread-safe: RoundRobinNamedChannels holds its lock while calling pick
+        self._current: "weakref.WeakKeyDictionary[NamedChannel[typing.Any], float]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def pick(self, ready: typing.Sequence[NamedChannel[StubType]]) -> NamedChannel[StubType]:
+        weights: typing.List[typing.Optional[float]] = []
+        reported = []
+        for named_channel in ready:
+            utilization = named_channel.stats.utilization_ewma
+            if utilization is None:
+                weights.append(None)
+            else:
+                weight = 1.0 / max(utilization, WeightedRoundRobinPicker._MIN_UTILIZATION)
+                weights.append(weight)
+                reported.append(weight)
+        mean_weight = 1.0
+        if len(reported) > 0:
+            mean_weight = sum(reported) / len(reported)
+
+        total = 0.0
+        best = ready[0]
+        best_current = -math.inf
+        for named_channel, reported_weight in zip(ready, weights):
+            weight = mean_weight if reported_weight is None else reported_weight
+            total += weight
+            current = self._current.get(named_channel, 0.0) + weight
+            self._current[named_channel] = current
+            if current > best_current:
+                best = named_channel
+                best_current = current
+        self._current[best] = best_current - total
+        return best
+
+
+# picker names for command line flags
+PICKERS: typing.Dict[str, typing.Callable[[], Picker[typing.Any]]] = {
+    "round_robin": RoundRobinPicker,
+    "power_of_two_choices": PowerOfTwoChoicesPicker,
+    "least_loaded": LeastLoadedPicker,
+    "weighted_round_robin": WeightedRoundRobinPicker,
+}
+
+
+_MASK64 = (1 << 64) - 1
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _mix64(value: int) -> int:
+    """Returns a well-mixed 64-bit value (the splitmix64 finalizer)."""
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+class RendezvousHasher:
+    """Picks a channel for a key with rendezvous (highest random weight) hashing: each key
+    prefers the address with the highest hash of (key, address). Adding or removing an address
+    only moves the keys that prefer that address. This is O(channels).
+
+    If load_factor > 0, this uses bounded loads: a channel is skipped if it has more than
+    load_factor times the average in-flight calls, so popular keys do not overload one backend.
+    """
+
+    def __init__(self, load_factor: float = 0.0) -> None:
+        if load_factor != 0 and load_factor < 1:
+            raise ValueError("load_factor must be 0 (unbounded) or >= 1")
+        self.load_factor = load_factor
+        # addresses are hashed once: this is only bounded to not grow forever
+        self._addr_hash = functools.lru_cache(maxsize=4096)(_hash64)
+
+    def pick(
+        self, channels: typing.Sequence[NamedChannel[StubType]], key: str
+    ) -> NamedChannel[StubType]:
+        key_hash = _hash64(key)
+
+        def score(named_channel: NamedChannel[StubType]) -> int:
+            return _mix64(key_hash ^ self._addr_hash(named_channel.addr))
+
+        if self.load_factor == 0:
+            # with channels_per_addr > 1, this is the first channel to the address
+            return max(channels, key=score)
+
+        total_in_flight = sum(named_channel.stats.in_flight for named_channel in channels)
+        max_in_flight = math.ceil(self.load_factor * (total_in_flight + 1) / len(channels))
+        ranked = sorted(channels, key=score, reverse=True)
+        for named_channel in ranked:
+            if named_channel.stats.in_flight < max_in_flight:
+                return named_channel
+        return ranked[0]
+
+
+def deterministic_subset(
+    addrs: typing.Iterable[str], client_id: int, subset_size: int
+) -> typing.List[str]:
+    """Returns subset_size addresses for client_id, so clients with consecutive IDs are spread
+    evenly across all addresses. This is the deterministic subsetting algorithm from the Site
+    Reliability Engineering book, chapter 20: each "round" of clients shuffles the addresses with
+    the same seed, then each client in the round takes a different slice. Returns all addresses if
+    subset_size >= len(addrs).
+    """
+    if subset_size <= 0:
+        raise ValueError("subset_size must be > 0")
+    if client_id < 0:
+        raise ValueError("client_id must be >= 0")
+
+    # sort so clients that receive the addresses in different orders pick the same subsets
+    addrs = sorted(addrs)
+    if subset_size >= len(addrs):
+        return addrs
+
+    subset_count = len(addrs) // subset_size
+    client_round = client_id // subset_count
+    random.Random(client_round).shuffle(addrs)
+
+    subset_id = client_id % subset_count
+    start = subset_id * subset_size
+    return addrs[start : start + subset_size]
 
 
 class RoundRobinMultiStub(typing.Generic[StubType]):
@@ -51,105 +418,697 @@ class RoundRobinMultiStub(typing.Generic[StubType]):
         addrs: typing.Iterable[str],
         stub_type: typing.Callable[[grpc.Channel], StubType],
         grpc_options: typing.Iterable[typing.Tuple[str, str]] = _EMPTY_GRPC_OPTIONS,
+        watch_connectivity: bool = False,
+        picker: typing.Optional[Picker[NamedChannel[typing.Any]]] = None,
+        subset_size: int = 0,
+        client_id: typing.Optional[int] = None,
+        outlier_detector: typing.Optional["OutlierDetector"] = None,
+        metrics: typing.Optional[clientmetrics.Metrics] = None,
+        channels_per_addr: int = 1,
+        hasher: typing.Optional[RendezvousHasher] = None,
+        adaptive_throttle: typing.Optional[throttle.AdaptiveThrottle] = None,
     ):
         """Create a new RoundRobinMultiStub.
         This adds the grpc.lb_policy_name=round_robin gRPC channel option to grpc_options.
+        See RoundRobinNamedChannels for watch_connectivity, picker, outlier_detector, metrics, and
+        hasher.
+        If subset_size > 0, this only connects to subset_size of the addresses, chosen with
+        deterministic_subset using client_id, which is required. Give each client a different ID
+        (e.g. a replica number) to spread clients evenly across the addresses.
+        If channels_per_addr > 1, this creates that many channels to each address, each with its
+        own connection, and picks between all of them. One HTTP/2 connection limits the number of
+        concurrent calls (MAX_CONCURRENT_STREAMS) and sends them all through one socket.
+        If adaptive_throttle is set, calls on all channels are rejected locally when backends are
+        overloaded: see throttle.AdaptiveThrottle.
         """
 
-        # shuffle so separate instances have different orders
+        if subset_size > 0 and client_id is None:
+            raise ValueError("client_id is required with subset_size")
+        if channels_per_addr <= 0:
+            raise ValueError("channels_per_addr must be > 0")
+        self.stub_type = stub_type
+        self.grpc_options: typing.Tuple[typing.Tuple[str, typing.Any], ...] = tuple(grpc_options)
+        self.grpc_options += (_ROUND_ROBIN_OPTION,)
+        if channels_per_addr > 1:
+            self.grpc_options += (_LOCAL_SUBCHANNEL_POOL_OPTION,)
+        self.channels_per_addr = channels_per_addr
+        self.adaptive_throttle = adaptive_throttle
+        self.subset_size = subset_size
+        self.client_id = client_id
+        self.metrics = metrics
+
         addrs = list(addrs)
+        # all the addresses, before subsetting: changes recompute the subset from these
+        self._all_addrs = set(addrs)
+        addrs = self._subset(addrs)
+        # shuffle so separate instances have different orders
         random.shuffle(addrs)
 
-        grpc_options = tuple(grpc_options) + (_ROUND_ROBIN_OPTION,)
-
         # connect to all the channels
-        named_channels: typing.List[NamedChannel[StubType]] = []
-        for addr in addrs:
-            grpc_channel = grpc.insecure_channel(addr, grpc_options)
-            stub = stub_type(grpc_channel)
-            named_channel = NamedChannel(addr, grpc_channel, stub)
-            named_channels.append(named_channel)
+        named_channels = self._new_named_channels(addrs)
+        self.rr_named = RoundRobinNamedChannels(
+            named_channels, watch_connectivity, picker, outlier_detector, metrics, hasher
+        )
+        # serializes changes to the addresses
+        self._update_lock = threading.Lock()
 
-        self.rr_named = RoundRobinNamedChannels(named_channels)
+    def _subset(self, addrs: typing.Iterable[str]) -> typing.List[str]:
+        if self.subset_size > 0:
+            assert self.client_id is not None
+            return deterministic_subset(addrs, self.client_id, self.subset_size)
+        return list(addrs)
 
-    def get(self) -> StubType:
-        named_channel = self.rr_named.get()
+    def _new_named_channels(
+        self, addrs: typing.Sequence[str]
+    ) -> typing.List[NamedChannel[StubType]]:
+        """Returns channels_per_addr channels for each address. Channels to the same address are
+        not next to each other, so a round-robin picker alternates between addresses.
+        """
+        return [
+            self._new_named_channel(addr) for _ in range(self.channels_per_addr) for addr in addrs
+        ]
+
+    def _new_named_channel(self, addr: str) -> NamedChannel[StubType]:
+        grpc_channel = grpc.insecure_channel(addr, self.grpc_options)
+        # the stub uses an intercepted channel to track calls; connectivity uses the original
+        stats = ChannelStats()
+        interceptors: typing.List[typing.Any] = [ChannelStatsInterceptor(stats, self.metrics, addr)]
+        if self.adaptive_throttle is not None:
+            # first: calls rejected by the throttle are not recorded as failures of the channel
+            interceptors.insert(0, throttle.ThrottleInterceptor(self.adaptive_throttle))
+        intercepted = grpc.intercept_channel(grpc_channel, *interceptors)
+        stub = self.stub_type(intercepted)
+        named_channel = NamedChannel(addr, grpc_channel, stub, stats)
+        if self.metrics is not None:
+            # new channels are IDLE: start timing the connection
+            self.metrics.record_state(
+                addr, named_channel, grpc.ChannelConnectivity.IDLE, time.monotonic()
+            )
+        return named_channel
+
+    def addrs(self) -> typing.List[str]:
+        """Returns the addresses this is currently connected to."""
+        with self.rr_named.lock:
+            # dict removes the duplicates with channels_per_addr > 1 and preserves the order
+            addrs = {named_channel.addr: None for named_channel in self.rr_named.named_channels}
+        return list(addrs)
+
+    def add_addrs(self, addrs: typing.Iterable[str]) -> None:
+        """Connects to addrs, in addition to the current addresses. Ignores existing addresses.
+        With subset_size, the subset is recomputed from all the addresses.
+        """
+        with self._update_lock:
+            self._set_addrs(self._all_addrs | set(addrs))
+
+    def remove_addrs(self, addrs: typing.Iterable[str]) -> None:
+        """Stops using addrs. Their channels are closed after in-flight calls finish. With
+        subset_size, the subset is recomputed from all the addresses, so removed addresses in the
+        subset are replaced.
+        """
+        with self._update_lock:
+            self._set_addrs(self._all_addrs - set(addrs))
+
+    def set_addrs(self, addrs: typing.Iterable[str]) -> None:
+        """Changes the addresses to addrs. Channels to addresses in both the old and new set are
+        reused, and channels to removed addresses are closed after in-flight calls finish.
+        """
+        with self._update_lock:
+            self._set_addrs(set(addrs))
+
+    def _set_addrs(self, addrs: typing.Set[str]) -> None:
+        """Changes all the addresses to addrs. Must hold _update_lock."""
+        new_addrs = set(self._subset(addrs))
+        if len(new_addrs) == 0:
+            raise ValueError("addrs cannot be empty")
+        self._all_addrs = set(addrs)
+
+        with self.rr_named.lock:
+            existing = list(self.rr_named.named_channels)
+        existing_addrs = {named_channel.addr for named_channel in existing}
+        # add first so there is always at least one channel
+        for named_channel in self._new_named_channels(sorted(new_addrs - existing_addrs)):
+            logging.info("adding channel=%s", named_channel.addr)
+            self.rr_named.add(named_channel)
+        for named_channel in existing:
+            if named_channel.addr not in new_addrs:
+                logging.info("removing channel=%s", named_channel.addr)
+                self.rr_named.remove(named_channel)
+
+    def get(self, key: typing.Optional[str] = None) -> StubType:
+        """Returns a stub for a ready channel. If key is set, calls with the same key use the same
+        backend while it is ready, e.g. to use per-key caches on the backends.
+        """
+        named_channel = self.rr_named.get(key=key)
         return named_channel.stub
 
+    def wait_ready(self, min_ready: int = 1, timeout_s: typing.Optional[float] = None) -> bool:
+        """Waits until min_ready channels are READY. See RoundRobinNamedChannels.wait_ready."""
+        return self.rr_named.wait_ready(min_ready, timeout_s)
+
+    def get_named(
+        self,
+        exclude: typing.Container[NamedChannel[StubType]] = (),
+        key: typing.Optional[str] = None,
+    ) -> NamedChannel[StubType]:
+        """Returns the NamedChannel that get would use. See RoundRobinNamedChannels.get."""
+        return self.rr_named.get(exclude, key)
+
     def close(self) -> None:
         self.rr_named.close()
 
 
+class ConnectionManager:
+    """Connects a set of gRPC channels from a background thread, so callers never wait.
+    gRPC reconnects channels in TRANSIENT_FAILURE with backoff, but IDLE channels (e.g. after the
+    server sends GOAWAY during a rollout) only connect when asked. This asks every channel to
+    connect each interval, or immediately after wake() is called.
+    """
+
+    _RECONNECT_INTERVAL_S = 1.0
+
+    def __init__(
+        self,
+        grpc_channels: typing.Iterable[grpc.Channel],
+        interval_s: float = _RECONNECT_INTERVAL_S,
+    ) -> None:
+        self._lock = threading.Lock()
+        self.grpc_channels = list(grpc_channels)
+        self.interval_s = interval_s
+        self._wake_event = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="ConnectionManager", daemon=True)
+        self._thread.start()
+
+    def wake(self) -> None:
+        """Asks the background thread to connect IDLE channels now."""
+        self._wake_event.set()
+
+    def add(self, grpc_channel: grpc.Channel) -> None:
+        with self._lock:
+            self.grpc_channels.append(grpc_channel)
+        self.wake()
+
+    def remove(self, grpc_channel: grpc.Channel) -> None:
+        with self._lock:
+            self.grpc_channels.remove(grpc_channel)
+
+    def _run(self) -> None:
+        while True:
+            # clear before checking so a wake() during the checks causes another pass
+            self._wake_event.clear()
+            if self._closed:
+                return
+            with self._lock:
+                grpc_channels = list(self.grpc_channels)
+            for grpc_channel in grpc_channels:
+                try:
+                    _check_connectivity(grpc_channel, True)
+                except ValueError:
+                    # the channel was removed and closed after we copied the list
+                    pass
+            self._wake_event.wait(self.interval_s)
+
+    def close(self) -> None:
+        """Stops the background thread. This does not close the channels."""
+        self._closed = True
+        self._wake_event.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+
+class OutlierDetector:
+    """Ejects channels whose backends fail calls, so get() does not return them, even though they
+    are READY. A background thread checks each channel every interval_s. A channel is ejected if
+    it has consecutive_failures failures in a row, or if at least failure_rate of its last
+    min_calls or more calls failed. Failures are calls that end with OUTLIER_FAILURE_CODES.
+    Ejected channels return after base_ejection_s, doubled for each recent ejection up to
+    max_ejection_s. At most max_ejected_fraction of the channels are ejected at once.
+    """
+
+    def __init__(
+        self,
+        consecutive_failures: int = 5,
+        failure_rate: float = 0.5,
+        min_calls: int = 20,
+        base_ejection_s: float = 10.0,
+        max_ejection_s: float = 300.0,
+        max_ejected_fraction: float = 0.5,
+        interval_s: float = 1.0,
+    ) -> None:
+        if consecutive_failures <= 0 or min_calls <= 0:
+            raise ValueError("consecutive_failures and min_calls must be > 0")
+        if not 0 < failure_rate <= 1 or not 0 <= max_ejected_fraction <= 1:
+            raise ValueError("failure_rate and max_ejected_fraction must be fractions")
+        self.consecutive_failures = consecutive_failures
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.base_ejection_s = base_ejection_s
+        self.max_ejection_s = max_ejection_s
+        self.max_ejected_fraction = max_ejected_fraction
+        self.interval_s = interval_s
+
+        self._lock = threading.Lock()
+        self.named_channels: typing.List[NamedChannel[typing.Any]] = []
+        # number of ejected channels: get() only checks channels if this is > 0
+        self.ejected = 0
+        self._closed_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="OutlierDetector", daemon=True)
+        self._thread.start()
+
+    def add(self, named_channel: NamedChannel[typing.Any]) -> None:
+        with self._lock:
+            self.named_channels.append(named_channel)
+
+    def remove(self, named_channel: NamedChannel[typing.Any]) -> None:
+        with self._lock:
+            self.named_channels.remove(named_channel)
+            if named_channel.stats.ejected:
+                named_channel.stats.ejected = False
+                self.ejected -= 1
+
+    def _run(self) -> None:
+        while not self._closed_event.wait(self.interval_s):
+            self.check(time.monotonic())
+
+    def check(self, now: float) -> None:
+        """Returns expired channels and ejects failing channels."""
+
+        with self._lock:
+            max_ejected = int(len(self.named_channels) * self.max_ejected_fraction)
+            for named_channel in self.named_channels:
+                stats = named_channel.stats
+                if stats.ejected:
+                    if now < stats.ejected_until:
+                        continue
+                    logging.info("returning ejected channel=%s", named_channel.addr)
+                    stats.ejected = False
+                    self.ejected -= 1
+                    # ignore calls that were sent while ejected
+                    stats.reset_outcomes()
+                    continue
+
+                successes, failures, consecutive_failures = stats.take_outcomes(self.min_calls)
+                calls = successes + failures
+                failing = consecutive_failures >= self.consecutive_failures or (
+                    calls >= self.min_calls and failures >= self.failure_rate * calls
+                )
+                if not failing:
+                    if calls >= self.min_calls and stats.ejection_count > 0:
+                        # healthy for a while: shorten the next ejection
+                        stats.ejection_count -= 1
+                    continue
+                if self.ejected >= max_ejected:
+                    logging.warning(
+                        "not ejecting failing channel=%s: %d channels already ejected",
+                        named_channel.addr,
+                        self.ejected,
+                    )
+                    continue
+
+                duration_s = min(
+                    self.max_ejection_s, self.base_ejection_s * 2**stats.ejection_count
+                )
+                logging.warning(
+                    "ejecting channel=%s for %.1fs: failures=%d/%d consecutive_failures=%d",
+                    named_channel.addr,
+                    duration_s,
+                    failures,
+                    calls,
+                    consecutive_failures,
+                )
+                stats.ejection_count += 1
+                stats.ejected_until = now + duration_s
+                stats.ejected = True
+                self.ejected += 1
+                stats.reset_outcomes()
+
+    def close(self) -> None:
+        """Stops the background thread."""
+        self._closed_event.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+
+class ReadyChannels(typing.Generic[ChannelType]):
+    """A set of ready channels, with the channels in a list that can be passed to a Picker.
+    All operations are O(1). This is not thread-safe: callers must hold a lock.
+    """
+
+    def __init__(self) -> None:
+        self.channels: typing.List[ChannelType] = []
+        self._indexes: typing.Dict[ChannelType, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.channels)
+
+    def __contains__(self, named_channel: object) -> bool:
+        return named_channel in self._indexes
+
+    def add(self, named_channel: ChannelType) -> None:
+        if named_channel in self._indexes:
+            return
+        self._indexes[named_channel] = len(self.channels)
+        self.channels.append(named_channel)
+
+    def remove(self, named_channel: ChannelType) -> None:
+        index = self._indexes.pop(named_channel, None)
+        if index is None:
+            return
+        # swap the last channel into the removed slot so removal is O(1)
+        last = self.channels.pop()
+        if last is not named_channel:
+            self.channels[index] = last
+            self._indexes[last] = index
+
+    def clear(self) -> None:
+        self.channels = []
+        self._indexes = {}
+
+
 class RoundRobinNamedChannels(typing.Generic[StubType]):
-    """Select a ready gRPC channel from a set of addresses, using a round-robin policy."""
+    """Select a ready gRPC channel from a set of addresses, using a round-robin policy.
+    get() never waits for connections: a ConnectionManager connects channels in the background.
+    Channels can be added and removed while in use.
+    """
 
-    # time to wait for idle/connecting channels before checking other channels
-    _CONNECT_TIMEOUT_S = 0.05
+    # time to wait for calls on removed channels to finish before closing them
+    _DRAIN_TIMEOUT_S = 30.0
+    # time between connectivity checks in wait_ready without watch_connectivity
+    _WAIT_READY_POLL_S = 0.01
 
-    def __init__(self, named_channels: typing.List[NamedChannel[StubType]]) -> None:
+    def __init__(
+        self,
+        named_channels: typing.List[NamedChannel[StubType]],
+        watch_connectivity: bool = False,
+        picker: typing.Optional[Picker[NamedChannel[typing.Any]]] = None,
+        outlier_detector: typing.Optional[OutlierDetector] = None,
+        metrics: typing.Optional[clientmetrics.Metrics] = None,
+        hasher: typing.Optional[RendezvousHasher] = None,
+    ) -> None:
+        """Create a new RoundRobinNamedChannels.
+        If watch_connectivity is True, this subscribes to connectivity changes on all channels and
+        maintains the set of READY channels, so get() does not need to check each channel. This
+        costs one gRPC polling thread per channel.
+        picker chooses between the READY channels. The default is a RoundRobinPicker.
+        If outlier_detector is set, get() avoids channels it ejects. This closes it on close().
+        If metrics is set, this records the channels get() returns and skips, and the time
+        channels take to become READY.
+        hasher picks the channel for get() with a key. The default is a RendezvousHasher.
+        """
         if len(named_channels) == 0:
             raise ValueError("channels cannot be empty")
         for named_channel in named_channels:
             assert named_channel is not None
 
         self.lock = threading.Lock()
-        self.next_index = 0
-        self.named_channels = named_channels
+        # notified when a channel becomes READY with watch_connectivity
+        self._ready_changed = threading.Condition(self.lock)
+        self.named_channels = list(named_channels)
+        if picker is None:
+            picker = RoundRobinPicker()
+        self.picker = picker
+        if hasher is None:
+            hasher = RendezvousHasher()
+        self.hasher = hasher
 
-    def get(self) -> NamedChannel[StubType]:
-        """Returns a ready NamedChannel from the set, or a random channel if none are ready."""
+        self.metrics = metrics
+        self._closed = False
+        self.watch_connectivity = watch_connectivity
+        self.ready = ReadyChannels[NamedChannel[StubType]]()
+        self._callbacks: typing.Dict[
+            NamedChannel[StubType], typing.Callable[[grpc.ChannelConnectivity], None]
+        ] = {}
+        self.connection_manager = ConnectionManager(
+            named_channel.grpc_channel for named_channel in named_channels
+        )
+        self.outlier_detector = outlier_detector
+        if outlier_detector is not None:
+            for named_channel in named_channels:
+                outlier_detector.add(named_channel)
 
-        with self.lock:
-            # check each channel in the round-robin order
-            channels = (
-                self.named_channels[self.next_index :] + self.named_channels[0 : self.next_index]
-            )
-            for i, named_channel in enumerate(channels):
-                # call a private grpc channel method to see if the channel is working
-                # TODO: use the public subscribe API, but that is more complicated
-                try_to_connect = True
+        # subscribe last: gRPC calls _on_connectivity_change at once on its own thread, which
+        # uses the attributes above. Hold the lock so callbacks wait until all are registered
+        if watch_connectivity:
+            with self.lock:
+                for named_channel in named_channels:
+                    self._subscribe(named_channel)
+
+    def _subscribe(self, named_channel: NamedChannel[StubType]) -> None:
+        """Subscribes to connectivity changes of named_channel. Must hold the lock."""
+
+        def on_change(state: grpc.ChannelConnectivity) -> None:
+            self._on_connectivity_change(named_channel, state)
+
+        self._callbacks[named_channel] = on_change
+        # try_to_connect=True: start connecting immediately, so channels are READY before use
+        named_channel.grpc_channel.subscribe(on_change, try_to_connect=True)
+
+    def _on_connectivity_change(
+        self, named_channel: NamedChannel[StubType], state: grpc.ChannelConnectivity
+    ) -> None:
+        """Called by gRPC's connectivity polling thread when a channel changes state."""
 
-                state_code = named_channel.grpc_channel._channel.check_connectivity_state(  # type: ignore[attr-defined]
-                    try_to_connect
+        logging.debug("channel=%s changed to state=%s", named_channel.addr, state.name)
+        with self.lock:
+            if self._closed or named_channel not in self._callbacks:
+                return
+            # after the check: callbacks after remove() must not record removed channels again
+            if self.metrics is not None:
+                self.metrics.record_state(
+                    named_channel.addr, named_channel, state, time.monotonic()
                 )
-                state = _connectivity_code_to_object(state_code)
-                if state is grpc.ChannelConnectivity.READY:
-                    self.next_index = (self.next_index + 1 + i) % len(self.named_channels)
-                    return named_channel
-
-                # for idle channels: the call to check_connectivity_state(try_to_connect=True)
-                # causes it to start connecting, so wait for IDLE or CONNECTING channels for a bit.
-                if state in (grpc.ChannelConnectivity.IDLE, grpc.ChannelConnectivity.CONNECTING):
-                    # wait to see if it manages to connect
-                    connected_future = grpc.channel_ready_future(named_channel.grpc_channel)
-                    try:
-                        connected_future.result(timeout=RoundRobinNamedChannels._CONNECT_TIMEOUT_S)
-
-                        # connected!
-                        self.next_index = (self.next_index + 1 + i) % len(self.named_channels)
-                        return named_channel
-                    except grpc.FutureTimeoutError as e:
-                        logging.debug(
-                            "failed to connect to channel=%s within timeout=%fs",
-                            named_channel.addr,
-                            RoundRobinNamedChannels._CONNECT_TIMEOUT_S,
-                        )
-
-                # not ready: check the other channels
-                logging.debug("skipping channel=%s in state=%s", named_channel.addr, state.name)
+            if state is grpc.ChannelConnectivity.READY:
+                self.ready.add(named_channel)
+                self._ready_changed.notify_all()
+            else:
+                self.ready.remove(named_channel)
+        if state is grpc.ChannelConnectivity.IDLE:
+            self.connection_manager.wake()
+
+    def get(
+        self,
+        exclude: typing.Container[NamedChannel[StubType]] = (),
+        key: typing.Optional[str] = None,
+    ) -> NamedChannel[StubType]:
+        """Returns a ready NamedChannel from the set, or a random channel if none are ready.
+        Channels in exclude are only returned if there are no others, e.g. to retry a call on a
+        different channel. If key is set, the hasher chooses the channel, so calls with the same
+        key go to the same backend while it is ready.
+        """
+
+        with self.lock:
+            if self.watch_connectivity:
+                ready: typing.Sequence[NamedChannel[StubType]] = self.ready.channels
+            else:
+                ready = self._check_ready()
+            if self.outlier_detector is not None and self.outlier_detector.ejected > 0:
+                # use ejected channels only if all the ready channels are ejected
+                ready = [c for c in ready if not c.stats.ejected] or ready
+            if exclude:
+                ready = [named_channel for named_channel in ready if named_channel not in exclude]
+            if len(ready) > 0:
+                if key is not None:
+                    named_channel = self.hasher.pick(ready, key)
+                else:
+                    named_channel = self.picker.pick(ready)
+                if self.metrics is not None:
+                    self.metrics.record_pick(named_channel.addr)
+                return named_channel
 
             # we did not find any ready channel. Select one at random
-            return random.choice(self.named_channels)
+            logging.debug("no ready channels; selecting a random channel")
+            candidates = self.named_channels
+            if exclude:
+                candidates = [c for c in self.named_channels if c not in exclude] or candidates
+            if key is not None:
+                named_channel = self.hasher.pick(candidates, key)
+            else:
+                named_channel = random.choice(candidates)
+            if self.metrics is not None:
+                self.metrics.record_random_fallback(named_channel.addr)
+            return named_channel
+
+    def wait_ready(self, min_ready: int = 1, timeout_s: typing.Optional[float] = None) -> bool:
+        """Waits until at least min_ready channels are READY, or all channels if there are fewer.
+        All channels connect in parallel, so this takes about as long as the slowest of the
+        first min_ready connections. Returns False if timeout_s expires first.
+        """
+
+        # connect IDLE channels now rather than at the next connection manager check
+        self.connection_manager.wake()
+        deadline = None
+        if timeout_s is not None:
+            deadline = time.monotonic() + timeout_s
+        with self._ready_changed:
+            while True:
+                if self.watch_connectivity:
+                    ready_count = len(self.ready)
+                else:
+                    ready_count = len(self._check_ready())
+                if ready_count >= min(min_ready, len(self.named_channels)):
+                    return True
+
+                wait_s = None
+                if deadline is not None:
+                    wait_s = deadline - time.monotonic()
+                    if wait_s <= 0:
+                        return False
+                if not self.watch_connectivity and (
+                    wait_s is None or wait_s > self._WAIT_READY_POLL_S
+                ):
+                    # nothing notifies us: poll
+                    wait_s = self._WAIT_READY_POLL_S
+                self._ready_changed.wait(wait_s)
+
+    def add(self, named_channel: NamedChannel[StubType]) -> None:
+        """Adds a channel to the set."""
+
+        with self.lock:
+            if self._closed:
+                raise ValueError("cannot add channels after close")
+            self.named_channels.append(named_channel)
+            if self.watch_connectivity:
+                self._subscribe(named_channel)
+        self.connection_manager.add(named_channel.grpc_channel)
+        if self.outlier_detector is not None:
+            self.outlier_detector.add(named_channel)
+
+    def remove(self, named_channel: NamedChannel[StubType]) -> None:
+        """Removes a channel from the set. get() will not return it, and it is closed after its
+        in-flight calls finish, or after _DRAIN_TIMEOUT_S.
+        """
+
+        with self.lock:
+            if len(self.named_channels) == 1:
+                raise ValueError("cannot remove the last channel")
+            self.named_channels.remove(named_channel)
+            callback = self._callbacks.pop(named_channel, None)
+            if callback is not None:
+                named_channel.grpc_channel.unsubscribe(callback)
+            self.ready.remove(named_channel)
+            if self.metrics is not None:
+                self.metrics.remove_channel(named_channel)
+        self.connection_manager.remove(named_channel.grpc_channel)
+        if self.outlier_detector is not None:
+            self.outlier_detector.remove(named_channel)
+
+        def drain() -> None:
+            if not named_channel.stats.wait_idle(RoundRobinNamedChannels._DRAIN_TIMEOUT_S):
+                logging.warning(
+                    "closing removed channel=%s with %d calls in flight",
+                    named_channel.addr,
+                    named_channel.stats.in_flight,
+                )
+            named_channel.grpc_channel.close()
+
+        threading.Thread(target=drain, name="drain " + named_channel.addr, daemon=True).start()
+
+    def _check_ready(self) -> typing.List[NamedChannel[StubType]]:
+        """Returns the READY channels by checking the state of every channel."""
+
+        ready = []
+        now = time.monotonic()
+        for named_channel in self.named_channels:
+            # try_to_connect=False: the connection manager connects channels in the background
+            state = _check_connectivity(named_channel.grpc_channel, False)
+            if self.metrics is not None:
+                self.metrics.record_state(named_channel.addr, named_channel, state, now)
+            if state is grpc.ChannelConnectivity.READY:
+                ready.append(named_channel)
+                continue
+            if state is grpc.ChannelConnectivity.IDLE:
+                self.connection_manager.wake()
+
+            # not ready: check the other channels
+            logging.debug("skipping channel=%s in state=%s", named_channel.addr, state.name)
+            if self.metrics is not None:
+                self.metrics.record_skip(named_channel.addr, state)
+        return ready
 
     def close(self) -> None:
         """Closes all gRPC channels. Only close if you really are finished with the channels."""
 
+        # stop the connection manager first so it does not use closed channels
+        self.connection_manager.close()
+        if self.outlier_detector is not None:
+            self.outlier_detector.close()
         with self.lock:
+            self._closed = True
+            for named_channel, callback in self._callbacks.items():
+                named_channel.grpc_channel.unsubscribe(callback)
+            self._callbacks = {}
+            self.ready.clear()
+
             for named_channel in self.named_channels:
                 if named_channel.grpc_channel is not None:
                     named_channel.grpc_channel.close()
 
 
+def resolve_dns(target: str) -> typing.List[str]:
+    """Returns an ip:port address for each IP address that DNS returns for the host:port target."""
+
+    host, _, port = target.rpartition(":")
+    if host == "" or port == "":
+        raise ValueError("target must be host:port: " + repr(target))
+    addrs = set()
+    for family, _, _, _, sockaddr in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM):
+        ip = sockaddr[0]
+        if family == socket.AF_INET6:
+            ip = "[" + ip + "]"
+        addrs.add(ip + ":" + port)
+    return sorted(addrs)
+
+
+def read_addrs_file(path: str) -> typing.List[str]:
+    """Returns the addresses in a file, separated by commas or whitespace."""
+
+    with open(path) as f:
+        return f.read().replace(",", " ").split()
+
+
+class PeriodicResolver:
+    """Calls resolve every interval from a background thread, and updates a RoundRobinMultiStub
+    with the returned addresses. If resolve fails or returns no addresses, the current addresses
+    are kept.
+    """
+
+    _RESOLVE_INTERVAL_S = 30.0
+
+    def __init__(
+        self,
+        multi_stub: RoundRobinMultiStub[typing.Any],
+        resolve: typing.Callable[[], typing.List[str]],
+        interval_s: float = _RESOLVE_INTERVAL_S,
+    ) -> None:
+        self.multi_stub = multi_stub
+        self.resolve = resolve
+        self.interval_s = interval_s
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="PeriodicResolver", daemon=True)
+        self._thread.start()
+
+    def resolve_now(self) -> None:
+        try:
+            addrs = self.resolve()
+        except Exception:
+            logging.exception("failed to resolve addresses; keeping the current addresses")
+            return
+        if len(addrs) == 0:
+            logging.warning("resolved no addresses; keeping the current addresses")
+            return
+        self.multi_stub.set_addrs(addrs)
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval_s):
+            self.resolve_now()
+
+    def close(self) -> None:
+        """Stops the background thread. This does not close the RoundRobinMultiStub."""
+        self._stop_event.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+
 class StubHolder(typing.Generic[StubType]):
     def __init__(self, stub: StubType) -> None:
         assert stub is not None
@@ -166,6 +1125,10 @@ class StubGetter(typing.Protocol[StubType]):
         ...
 
 
+# time main waits for --min_ready channels
+_MAIN_WAIT_READY_TIMEOUT_S = 30.0
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Connect to some gRPC servers!")
     parser.add_argument(
@@ -174,27 +1137,133 @@ def main() -> None:
         default="localhost:8001",
         help="comma-separated list of addresses to connect to",
     )
+    parser.add_argument(
+        "--addrs_file",
+        type=str,
+        default="",
+        help="file with addresses to connect to, re-read every --resolve_interval; replaces --addrs",
+    )
+    parser.add_argument(
+        "--dns_target",
+        type=str,
+        default="",
+        help="host:port to resolve with DNS every --resolve_interval; replaces --addrs",
+    )
+    parser.add_argument(
+        "--resolve_interval",
+        type=float,
+        default=30.0,
+        help="seconds between reading --addrs_file or resolving --dns_target",
+    )
     parser.add_argument(
         "--force_multi",
         default=False,
         action="store_true",
         help="use the RoundRobinMultiChannel even with a single address",
     )
+    parser.add_argument(
+        "--picker",
+        choices=sorted(PICKERS.keys()),
+        default="round_robin",
+        help="policy for choosing between ready channels",
+    )
+    parser.add_argument(
+        "--subset_size",
+        type=int,
+        default=0,
+        help="only connect to this many of --addrs, chosen using --client_id; default=0: all",
+    )
+    parser.add_argument(
+        "--client_id",
+        type=int,
+        default=-1,
+        help="unique ID for this client used with --subset_size, e.g. a replica number",
+    )
+    parser.add_argument(
+        "--watch_connectivity",
+        default=False,
+        action="store_true",
+        help="subscribe to channel connectivity changes instead of checking on each request",
+    )
+    parser.add_argument(
+        "--outlier_detection",
+        default=False,
+        action="store_true",
+        help="avoid backends that fail calls, even if they are connected",
+    )
+    parser.add_argument(
+        "--metrics_port",
+        type=int,
+        default=0,
+        help="serve Prometheus metrics at http://localhost:(port)/metrics; default=0: disabled",
+    )
+    parser.add_argument(
+        "--min_ready",
+        type=int,
+        default=0,
+        help="wait for this many channels to be READY before sending requests; default=0: no wait",
+    )
+    parser.add_argument(
+        "--channels_per_addr",
+        type=int,
+        default=1,
+        help="number of channels (connections) to each address",
+    )
+    parser.add_argument(
+        "--throttle",
+        default=False,
+        action="store_true",
+        help="reject requests locally when backends return RESOURCE_EXHAUSTED or UNAVAILABLE",
+    )
     args = parser.parse_args()
     if args.addrs == "":
         raise ValueError("--addrs is required")
 
-    addrs = args.addrs.split(",")
+    resolve: typing.Optional[typing.Callable[[], typing.List[str]]] = None
+    if args.addrs_file != "":
+        resolve = lambda: read_addrs_file(args.addrs_file)
+    elif args.dns_target != "":
+        resolve = lambda: resolve_dns(args.dns_target)
+
+    if resolve is not None:
+        addrs = resolve()
+    else:
+        addrs = args.addrs.split(",")
     logging.info("connecting to %d addresses = %r ...", len(addrs), addrs)
 
-    if len(addrs) == 1 and not args.force_multi:
+    if len(addrs) == 1 and not args.force_multi and resolve is None:
         logging.warning("using single gRPC channel with single address with round_robin")
         channel = grpc.insecure_channel(addrs[0], options=(_ROUND_ROBIN_OPTION,))
         stub = helloworld_pb2_grpc.GreeterStub(channel)
         stub_getter: StubGetter[helloworld_pb2_grpc.GreeterStub] = StubHolder(stub)
     else:
         logging.info("using RoundRobinMultiStub with %d addresses = %r ...", len(addrs), addrs)
-        stub_getter = RoundRobinMultiStub(addrs, helloworld_pb2_grpc.GreeterStub)
+        metrics = None
+        if args.metrics_port > 0:
+            metrics = clientmetrics.Metrics()
+            clientmetrics.serve_prometheus(metrics, "localhost", args.metrics_port)
+            logging.info("serving metrics at http://localhost:%d/metrics", args.metrics_port)
+        stub_getter = RoundRobinMultiStub(
+            addrs,
+            helloworld_pb2_grpc.GreeterStub,
+            watch_connectivity=args.watch_connectivity,
+            picker=PICKERS[args.picker](),
+            subset_size=args.subset_size,
+            client_id=args.client_id if args.client_id >= 0 else None,
+            outlier_detector=OutlierDetector() if args.outlier_detection else None,
+            metrics=metrics,
+            channels_per_addr=args.channels_per_addr,
+            adaptive_throttle=throttle.AdaptiveThrottle() if args.throttle else None,
+        )
+        if resolve is not None:
+            PeriodicResolver(stub_getter, resolve, args.resolve_interval)
+        if args.min_ready > 0:
+            if not stub_getter.wait_ready(args.min_ready, _MAIN_WAIT_READY_TIMEOUT_S):
+                logging.warning(
+                    "fewer than %d channels READY after %.0fs; sending requests anyway",
+                    args.min_ready,
+                    _MAIN_WAIT_READY_TIMEOUT_S,
+                )
 
     while True:
         stub = stub_getter.get()
@@ -1,33 +1,443 @@
 #!/usr/bin/env python3
+import argparse
+import asyncio
+import functools
 import grpc
+import grpc.aio
 import helloworld_pb2
 import helloworld_pb2_grpc
+import itertools
+import loadreport
 import logging
+import multiprocessing
+import os
+import signal
+import threading
+import trailerguard
+import types
+import typing
 import concurrent.futures
 
 
+# see https://github.com/grpc/grpc/tree/master/examples/python/multiprocessing
+_SO_REUSEPORT_OPTION = ("grpc.so_reuseport", 1)
+
+
+# default number of error messages to cache
+_DEFAULT_CACHE_SIZE = 16
+
+
 class ErrorGreeter(helloworld_pb2_grpc.GreeterServicer):
-    def SayHello(
-        self, request: helloworld_pb2.HelloRequest, context: grpc.ServicerContext
-    ) -> helloworld_pb2.HelloReply:
+    def __init__(
+        self,
+        cache_size: int = _DEFAULT_CACHE_SIZE,
+        log_every: int = 1,
+        report_load: bool = False,
+    ) -> None:
+        """Create a new ErrorGreeter.
+        The last cache_size error and reply messages are cached by length: large messages are
+        expensive to allocate on every request. One in every log_every requests is logged; 0
+        disables logging.
+        If report_load is True, responses include a load report in the trailing metadata: see
+        loadreport. Set queue_depth to report the number of requests waiting for a thread.
+        """
+        self.error_message = functools.lru_cache(maxsize=cache_size)(_generate_error_message)
+        self.log_every = log_every
+        self._request_counter = itertools.count()
+
+        self.report_load = report_load
+        self.queue_depth: typing.Optional[typing.Callable[[], int]] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self._cpu_sampler: typing.Optional[loadreport.CPUSampler] = None
+        if report_load:
+            self._cpu_sampler = loadreport.CPUSampler()
+
+    def load_report(self) -> str:
+        report: typing.Dict[str, float] = {loadreport.IN_FLIGHT: self.in_flight}
+        if self._cpu_sampler is not None:
+            utilization = self._cpu_sampler.utilization()
+            if utilization is not None:
+                report[loadreport.CPU_UTILIZATION] = utilization
+        if self.queue_depth is not None:
+            report[loadreport.QUEUE_DEPTH] = self.queue_depth()
+        return loadreport.format_load_report(report)
+
+    def set_error(
+        self,
+        request: helloworld_pb2.HelloRequest,
+        context: typing.Union[
+            grpc.ServicerContext, grpc.aio.ServicerContext[typing.Any, typing.Any]
+        ],
+    ) -> None:
+        """Sets the error requested by request on context. Used by the sync and async servers."""
+        if not self.report_load:
+            self._set_error(request, context)
+            return
+
+        with self._lock:
+            self.in_flight += 1
+        try:
+            self._set_error(request, context)
+            context.set_trailing_metadata(((loadreport.LOAD_REPORT_KEY, self.load_report()),))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _set_error(
+        self,
+        request: helloworld_pb2.HelloRequest,
+        context: typing.Union[
+            grpc.ServicerContext, grpc.aio.ServicerContext[typing.Any, typing.Any]
+        ],
+    ) -> None:
         parts = request.name.split("=")
         err_length = int(parts[1])
-        err_msg = "x" * err_length
+        err_msg = self.error_message(err_length)
         context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
         context.set_details(err_msg)
-        logging.info("returning message length = %d", len(err_msg))
+        # next() on itertools.count is atomic, so this is thread-safe
+        if self.log_every > 0 and next(self._request_counter) % self.log_every == 0:
+            logging.info("returning message length = %d", len(err_msg))
+
+    def reply(self, request: helloworld_pb2.HelloRequest) -> helloworld_pb2.HelloReply:
+        """Returns the reply streaming methods send for request."""
+        return helloworld_pb2.HelloReply(message=self.error_message(request.reply_length))
+
+    def end_stream(
+        self,
+        request: helloworld_pb2.HelloRequest,
+        context: typing.Union[
+            grpc.ServicerContext, grpc.aio.ServicerContext[typing.Any, typing.Any]
+        ],
+    ) -> None:
+        """Sets the status of a stream: OK if request.name is empty, or the error it requests."""
+        if request.name != "":
+            self.set_error(request, context)
+
+    def SayHello(
+        self, request: helloworld_pb2.HelloRequest, context: grpc.ServicerContext
+    ) -> helloworld_pb2.HelloReply:
+        self.set_error(request, context)
         return helloworld_pb2.HelloReply()
 
+    def SayHelloStream(
+        self, request: helloworld_pb2.HelloRequest, context: grpc.ServicerContext
+    ) -> typing.Iterator[helloworld_pb2.HelloReply]:
+        reply = self.reply(request)
+        for _ in range(request.reply_count):
+            yield reply
+        self.end_stream(request, context)
+
+    def SayHelloBidi(
+        self,
+        request_iterator: typing.Iterator[helloworld_pb2.HelloRequest],
+        context: grpc.ServicerContext,
+    ) -> typing.Iterator[helloworld_pb2.HelloReply]:
+        last_request = helloworld_pb2.HelloRequest()
+        for request in request_iterator:
+            last_request = request
+            reply = self.reply(request)
+            for _ in range(request.reply_count):
+                yield reply
+        self.end_stream(last_request, context)
+
+
+class AsyncErrorGreeter(helloworld_pb2_grpc.GreeterServicer):
+    """ErrorGreeter for grpc.aio servers."""
+
+    def __init__(self, greeter: ErrorGreeter) -> None:
+        self.greeter = greeter
+
+    async def SayHello(
+        self,
+        request: helloworld_pb2.HelloRequest,
+        context: grpc.aio.ServicerContext[helloworld_pb2.HelloRequest, helloworld_pb2.HelloReply],
+    ) -> helloworld_pb2.HelloReply:
+        self.greeter.set_error(request, context)
+        return helloworld_pb2.HelloReply()
+
+    async def SayHelloStream(
+        self,
+        request: helloworld_pb2.HelloRequest,
+        context: grpc.aio.ServicerContext[helloworld_pb2.HelloRequest, helloworld_pb2.HelloReply],
+    ) -> typing.AsyncIterator[helloworld_pb2.HelloReply]:
+        reply = self.greeter.reply(request)
+        for _ in range(request.reply_count):
+            yield reply
+        self.greeter.end_stream(request, context)
+
+    async def SayHelloBidi(
+        self,
+        request_iterator: typing.AsyncIterator[helloworld_pb2.HelloRequest],
+        context: grpc.aio.ServicerContext[helloworld_pb2.HelloRequest, helloworld_pb2.HelloReply],
+    ) -> typing.AsyncIterator[helloworld_pb2.HelloReply]:
+        last_request = helloworld_pb2.HelloRequest()
+        async for request in request_iterator:
+            last_request = request
+            reply = self.greeter.reply(request)
+            for _ in range(request.reply_count):
+                yield reply
+        self.greeter.end_stream(last_request, context)
 
-def main() -> None:
-    addr = "localhost:8001"
 
-    server = grpc.server(concurrent.futures.ThreadPoolExecutor(max_workers=10))
-    helloworld_pb2_grpc.add_GreeterServicer_to_server(ErrorGreeter(), server)
-    print("listening for gRPC on {} ...".format(addr))
+def _generate_error_message(err_length: int) -> str:
+    return "x" * err_length
+
+
+def _wait_for_stop_signal() -> None:
+    """Blocks until this process receives SIGTERM or SIGINT."""
+
+    stop_event = threading.Event()
+
+    def handle_signal(signum: int, frame: typing.Optional[types.FrameType]) -> None:
+        print("pid={} received {}; stopping ...".format(os.getpid(), signal.Signals(signum).name))
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    # wait with a timeout so the main thread can run the signal handlers
+    while not stop_event.wait(1.0):
+        pass
+
+
+def serve(
+    addr: str,
+    threads: int,
+    grace_s: float,
+    greeter: ErrorGreeter,
+    grpc_options: typing.Sequence[typing.Tuple[str, typing.Any]] = (),
+    trailer_budget: typing.Optional[trailerguard.TrailerBudget] = None,
+) -> None:
+    """Runs a gRPC server until this process receives SIGTERM or SIGINT, then stops it gracefully,
+    waiting up to grace_s seconds for in-flight requests. If trailer_budget is set, errors are
+    truncated to fit it.
+    """
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads)
+    # the executor has no public API for its queue
+    greeter.queue_depth = executor._work_queue.qsize
+    interceptors: typing.List[grpc.ServerInterceptor[typing.Any, typing.Any]] = []
+    if trailer_budget is not None:
+        interceptors.append(trailerguard.TrailerSizeInterceptor(trailer_budget))
+    server = grpc.server(executor, interceptors=interceptors, options=grpc_options)
+    helloworld_pb2_grpc.add_GreeterServicer_to_server(greeter, server)
+    print("pid={} listening for gRPC on {} ...".format(os.getpid(), addr), flush=True)
     server.add_insecure_port(addr)
     server.start()
-    server.wait_for_termination()
+
+    _wait_for_stop_signal()
+    server.stop(grace_s).wait()
+    _log_truncations(trailer_budget)
+
+
+async def serve_async(
+    addr: str,
+    grace_s: float,
+    greeter: ErrorGreeter,
+    grpc_options: typing.Sequence[typing.Tuple[str, typing.Any]] = (),
+    trailer_budget: typing.Optional[trailerguard.TrailerBudget] = None,
+) -> None:
+    """Runs a grpc.aio server until this process receives SIGTERM or SIGINT. See serve."""
+
+    interceptors: typing.List[grpc.aio.ServerInterceptor[typing.Any, typing.Any]] = []
+    if trailer_budget is not None:
+        interceptors.append(trailerguard.AsyncTrailerSizeInterceptor(trailer_budget))
+    server = grpc.aio.server(interceptors=interceptors, options=grpc_options)
+    helloworld_pb2_grpc.add_GreeterServicer_to_server(AsyncErrorGreeter(greeter), server)
+    print("pid={} listening for gRPC (asyncio) on {} ...".format(os.getpid(), addr), flush=True)
+    server.add_insecure_port(addr)
+    await server.start()
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop_event.set)
+    await stop_event.wait()
+    print("pid={} received signal; stopping ...".format(os.getpid()))
+    await server.stop(grace_s)
+    _log_truncations(trailer_budget)
+
+
+def _log_truncations(trailer_budget: typing.Optional[trailerguard.TrailerBudget]) -> None:
+    if trailer_budget is not None:
+        print(
+            "pid={} truncated {} errors to fit {} bytes".format(
+                os.getpid(), trailer_budget.truncations, trailer_budget.budget
+            )
+        )
+
+
+def _serve_worker(
+    addr: str,
+    threads: int,
+    grace_s: float,
+    use_aio: bool,
+    cache_size: int,
+    log_every: int,
+    report_load: bool,
+    max_trailer_size: int = 0,
+    grpc_options: typing.Sequence[typing.Tuple[str, typing.Any]] = (),
+) -> None:
+    greeter = ErrorGreeter(cache_size, log_every, report_load)
+    trailer_budget = None
+    if max_trailer_size > 0:
+        trailer_budget = trailerguard.TrailerBudget(max_trailer_size)
+    if use_aio:
+        asyncio.run(serve_async(addr, grace_s, greeter, grpc_options, trailer_budget))
+    else:
+        serve(addr, threads, grace_s, greeter, grpc_options, trailer_budget)
+
+
+def serve_processes(
+    addr: str,
+    workers: int,
+    threads: int,
+    grace_s: float,
+    use_aio: bool,
+    cache_size: int,
+    log_every: int,
+    report_load: bool,
+    max_trailer_size: int = 0,
+) -> None:
+    """Runs workers processes that share addr with SO_REUSEPORT, so the kernel spreads
+    connections between them. When this process receives SIGTERM or SIGINT, or any worker exits,
+    all workers are sent SIGTERM and stopped gracefully.
+    """
+
+    # gRPC must not be started before forking: the workers each create their own server
+    processes = []
+    for _ in range(workers):
+        process = multiprocessing.Process(
+            target=_serve_worker,
+            args=(
+                addr,
+                threads,
+                grace_s,
+                use_aio,
+                cache_size,
+                log_every,
+                report_load,
+                max_trailer_size,
+                (_SO_REUSEPORT_OPTION,),
+            ),
+        )
+        process.start()
+        processes.append(process)
+
+    stop_event = threading.Event()
+
+    def handle_signal(signum: int, frame: typing.Optional[types.FrameType]) -> None:
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    while not stop_event.wait(1.0):
+        exited = [process for process in processes if not process.is_alive()]
+        if len(exited) > 0:
+            logging.error(
+                "worker pid=%d exited with exitcode=%s; stopping all workers",
+                exited[0].pid,
+                exited[0].exitcode,
+            )
+            break
+
+    for process in processes:
+        if process.is_alive() and process.pid is not None:
+            os.kill(process.pid, signal.SIGTERM)
+    for process in processes:
+        process.join()
+    print("all {} workers stopped".format(len(processes)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="gRPC server that returns large errors")
+    parser.add_argument(
+        "--addr",
+        type=str,
+        default="localhost:8001",
+        help="listening address",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of server processes sharing --addr with SO_REUSEPORT",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=10,
+        help="size of the thread pool in each server process",
+    )
+    parser.add_argument(
+        "--aio",
+        default=False,
+        action="store_true",
+        help="use a grpc.aio asyncio server; ignores --threads",
+    )
+    parser.add_argument(
+        "--cacheSize",
+        type=int,
+        default=_DEFAULT_CACHE_SIZE,
+        help="number of generated error messages to cache",
+    )
+    parser.add_argument(
+        "--logEvery",
+        type=int,
+        default=1,
+        help="log one in every N requests; 0 disables request logging",
+    )
+    parser.add_argument(
+        "--reportLoad",
+        default=False,
+        action="store_true",
+        help="add load reports to the trailing metadata, for clients that balance by load",
+    )
+    parser.add_argument(
+        "--maxTrailerSize",
+        type=int,
+        default=0,
+        help=(
+            "truncate errors so the trailers fit in this many bytes; 0 disables."
+            " {} is the default client limit".format(trailerguard.DEFAULT_BUDGET)
+        ),
+    )
+    parser.add_argument(
+        "--grace",
+        type=float,
+        default=5.0,
+        help="seconds to wait for in-flight requests when stopping",
+    )
+    args = parser.parse_args()
+    if args.workers <= 0:
+        raise ValueError("--workers must be > 0")
+    if args.workers > 1 and args.addr.endswith(":0"):
+        raise ValueError("--workers > 1 requires a fixed port: each would pick a different port")
+
+    if args.workers == 1:
+        _serve_worker(
+            args.addr,
+            args.threads,
+            args.grace,
+            args.aio,
+            args.cacheSize,
+            args.logEvery,
+            args.reportLoad,
+            args.maxTrailerSize,
+        )
+    else:
+        serve_processes(
+            args.addr,
+            args.workers,
+            args.threads,
+            args.grace,
+            args.aio,
+            args.cacheSize,
+            args.logEvery,
+            args.reportLoad,
+            args.maxTrailerSize,
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,125 @@
+import asyncio
+import grpc
+import grpc.aio
+import helloworld_pb2
+import helloworld_pb2_grpc
+import pythonaioclient
+import pythonaiomulticlient
+import unittest
+
+
+class AsyncHelloWorldServicer(helloworld_pb2_grpc.GreeterServicer):
+    def __init__(self) -> None:
+        self._request_count = 0
+
+    async def SayHello(
+        self,
+        request: helloworld_pb2.HelloRequest,
+        context: grpc.aio.ServicerContext[helloworld_pb2.HelloRequest, helloworld_pb2.HelloReply],
+    ) -> helloworld_pb2.HelloReply:
+        self._request_count += 1
+        return helloworld_pb2.HelloReply(message="message")
+
+
+class AsyncBackend(object):
+    def __init__(self, server: grpc.aio.Server, backend: AsyncHelloWorldServicer, listen_port: int):
+        self.server = server
+        self.backend = backend
+        self.listen_port = listen_port
+
+    def addr(self) -> str:
+        return "localhost:" + str(self.listen_port)
+
+    async def close(self) -> None:
+        await self.server.stop(grace=None)
+
+
+async def _make_test_backend() -> AsyncBackend:
+    server = grpc.aio.server()
+    backend = AsyncHelloWorldServicer()
+    helloworld_pb2_grpc.add_GreeterServicer_to_server(backend, server)
+    listen_port = server.add_insecure_port("localhost:0")
+    await server.start()
+    return AsyncBackend(server, backend, listen_port)
+
+
+async def _wait_for_ready(
+    multi_stub: pythonaiomulticlient.AsyncRoundRobinMultiStub[helloworld_pb2_grpc.GreeterStub],
+    count: int,
+    timeout: float = 5.0,
+) -> None:
+    """Waits for count channels to be ready, or raises asyncio.TimeoutError."""
+
+    async def poll() -> None:
+        while len(multi_stub.ready) != count:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+class TestAsyncRoundRobinMultiStub(unittest.IsolatedAsyncioTestCase):
+    async def test_no_backend(self) -> None:
+        multi_stub = pythonaiomulticlient.AsyncRoundRobinMultiStub(
+            ["localhost:1"], helloworld_pb2_grpc.GreeterStub
+        )
+        stub = multi_stub.get()
+        self.assertIsNotNone(stub)
+        with self.assertRaises(grpc.aio.AioRpcError) as cm:
+            await stub.SayHello(helloworld_pb2.HelloRequest(name="test"))
+        self.assertEqual(cm.exception.code(), grpc.StatusCode.UNAVAILABLE)
+
+        # multiple close calls are permitted
+        await multi_stub.close()
+        await multi_stub.close()
+
+    async def test_local_backends(self) -> None:
+        backend_a = await _make_test_backend()
+        backend_b = await _make_test_backend()
+        multi_stub = pythonaiomulticlient.AsyncRoundRobinMultiStub(
+            [backend_a.addr(), backend_b.addr(), "localhost:1"],
+            helloworld_pb2_grpc.GreeterStub,
+        )
+        try:
+            await _wait_for_ready(multi_stub, 2)
+
+            # concurrent requests are evenly distributed across the ready backends
+            resps = await asyncio.gather(
+                *(
+                    multi_stub.get().SayHello(helloworld_pb2.HelloRequest(name="test"))
+                    for _ in range(4)
+                )
+            )
+            self.assertEqual(["message"] * 4, [resp.message for resp in resps])
+            self.assertEqual(2, backend_a.backend._request_count)
+            self.assertEqual(2, backend_b.backend._request_count)
+
+            # stopping a backend removes it from the ready set
+            await backend_b.close()
+            await _wait_for_ready(multi_stub, 1)
+            for _ in range(2):
+                resp = await multi_stub.get().SayHello(helloworld_pb2.HelloRequest(name="test"))
+                self.assertEqual(resp.message, "message")
+            self.assertEqual(4, backend_a.backend._request_count)
+        finally:
+            await multi_stub.close()
+            await backend_b.close()
+            await backend_a.close()
+
+
+class TestSendRequests(unittest.IsolatedAsyncioTestCase):
+    async def test_count(self) -> None:
+        backend = await _make_test_backend()
+        multi_stub = pythonaiomulticlient.AsyncRoundRobinMultiStub(
+            [backend.addr()], helloworld_pb2_grpc.GreeterStub
+        )
+        try:
+            await _wait_for_ready(multi_stub, 1)
+            sent = 0
+            for count, concurrency in ((3, 2), (10, 4), (2, 5)):
+                # workers sleep between requests: the total is still exactly count
+                await pythonaioclient.send_requests(multi_stub, 0, count, concurrency, 0.01)
+                sent += count
+                self.assertEqual(sent, backend.backend._request_count)
+        finally:
+            await multi_stub.close()
+            await backend.close()
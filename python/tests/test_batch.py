@@ -0,0 +1,112 @@
+import batch
+import fakebackend
+import grpc
+import helloworld_pb2
+import helloworld_pb2_grpc
+import pythonmulticlient
+import threading
+import typing
+import unittest
+
+
+class TestCallBatch(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cluster = fakebackend.FakeCluster(
+            [
+                fakebackend.Faults(latency=fakebackend.uniform_latency(0.0, 0.01)),
+                fakebackend.Faults(latency=fakebackend.uniform_latency(0.0, 0.01)),
+            ]
+        )
+        self.multi_stub = pythonmulticlient.RoundRobinMultiStub(
+            self.cluster.addrs(), helloworld_pb2_grpc.GreeterStub
+        )
+        self.assertTrue(self.multi_stub.wait_ready(2, timeout_s=5.0))
+        self.started = 0
+
+    def tearDown(self) -> None:
+        self.multi_stub.close()
+        self.cluster.close()
+
+    def _start_call(
+        self, stub: helloworld_pb2_grpc.GreeterStub, request: helloworld_pb2.HelloRequest
+    ) -> "grpc.Future[helloworld_pb2.HelloReply]":
+        self.started += 1
+        future: "grpc.Future[helloworld_pb2.HelloReply]" = stub.SayHello.future(
+            request, timeout=5.0
+        )
+        return future
+
+    def _requests(self, count: int) -> typing.List[helloworld_pb2.HelloRequest]:
+        return [helloworld_pb2.HelloRequest(name=str(i)) for i in range(count)]
+
+    def test_completion_order(self) -> None:
+        requests = self._requests(50)
+        indexes: typing.List[int] = []
+        for result in batch.call_batch(
+            self.multi_stub, requests, self._start_call, max_in_flight=5
+        ):
+            # at most max_in_flight calls are started and not yet yielded
+            self.assertLessEqual(self.started - len(indexes), 5)
+            self.assertIs(requests[result.index], result.request)
+            self.assertEqual("message", result.result().message)
+            indexes.append(result.index)
+        self.assertEqual(list(range(50)), sorted(indexes))
+        # calls are spread across the backends
+        self.assertEqual(50, sum(self.cluster.request_counts()))
+        self.assertGreater(min(self.cluster.request_counts()), 0)
+
+    def test_ordered_errors(self) -> None:
+        self.cluster.backends[0].faults.error_code = grpc.StatusCode.INTERNAL
+        results = list(
+            batch.call_batch(
+                self.multi_stub,
+                iter(self._requests(20)),
+                self._start_call,
+                max_in_flight=3,
+                ordered=True,
+            )
+        )
+        self.assertEqual(list(range(20)), [result.index for result in results])
+        errors = [result.error for result in results if result.error is not None]
+        self.assertEqual(self.cluster.request_counts()[0], len(errors))
+        self.assertGreater(len(errors), 0)
+        with self.assertRaises(grpc.RpcError):
+            next(result for result in results if result.error is not None).result()
+
+    def test_close(self) -> None:
+        # backend 0 does not respond until the gate is set
+        gate = threading.Event()
+        self.cluster.backends[0].greeter.gate = gate
+        futures: typing.List["grpc.Future[helloworld_pb2.HelloReply]"] = []
+
+        def start_call(
+            stub: helloworld_pb2_grpc.GreeterStub, request: helloworld_pb2.HelloRequest
+        ) -> "grpc.Future[helloworld_pb2.HelloReply]":
+            future = self._start_call(stub, request)
+            futures.append(future)
+            return future
+
+        try:
+            results = batch.call_batch(
+                self.multi_stub, self._requests(10), start_call, max_in_flight=4
+            )
+            # nothing is started until the first result is requested
+            self.assertEqual(0, self.started)
+            first = next(results)
+            self.assertIsNone(first.error)
+            self.assertLessEqual(self.started, 4)
+
+            # closing the generator cancels the calls still in flight on backend 0
+            results.close()
+            self.assertEqual(self.started, len(futures))
+            self.assertTrue(any(future.cancelled() for future in futures))
+            self.assertTrue(all(future.done() for future in futures))
+        finally:
+            gate.set()
+
+        with self.assertRaises(ValueError):
+            next(batch.call_batch(self.multi_stub, [], start_call, max_in_flight=0))
+
+
+if __name__ == "__main__":
+    unittest.main()
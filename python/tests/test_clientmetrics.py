@@ -0,0 +1,100 @@
+import clientmetrics
+import fakebackend
+import grpc
+import helloworld_pb2
+import helloworld_pb2_grpc
+import pythonmulticlient
+import test_multichannel
+import unittest
+import urllib.request
+
+
+class TestMetrics(unittest.TestCase):
+    def test_prometheus_text(self) -> None:
+        metrics = clientmetrics.Metrics()
+        metrics.record_pick("a:1")
+        metrics.record_pick("a:1")
+        metrics.record_skip("b:2", grpc.ChannelConnectivity.TRANSIENT_FAILURE)
+        metrics.record_rpc("a:1", grpc.StatusCode.OK, 0.002)
+        metrics.record_state("b:2", 1, grpc.ChannelConnectivity.CONNECTING, 10.0)
+        metrics.record_state("b:2", 1, grpc.ChannelConnectivity.CONNECTING, 11.0)
+        # a second channel to the same address is timed separately
+        metrics.record_state("b:2", 2, grpc.ChannelConnectivity.CONNECTING, 11.5)
+        metrics.record_state("b:2", 2, grpc.ChannelConnectivity.READY, 12.0)
+        metrics.record_state("b:2", 1, grpc.ChannelConnectivity.READY, 12.5)
+        # READY without a not READY state is not a connection
+        metrics.record_state("b:2", 2, grpc.ChannelConnectivity.READY, 13.0)
+
+        self.assertEqual(2, metrics.counter(clientmetrics.PICKS, "a:1"))
+        self.assertEqual(0, metrics.counter(clientmetrics.PICKS, "b:2"))
+        self.assertEqual(2, metrics.histogram_count(clientmetrics.CONNECT_SECONDS, "b:2"))
+
+        text = metrics.prometheus_text()
+        self.assertIn('grpc_multistub_picks_total{addr="a:1"} 2\n', text)
+        self.assertIn('grpc_multistub_skips_total{addr="b:2",state="TRANSIENT_FAILURE"} 1\n', text)
+        self.assertIn('grpc_multistub_rpcs_total{addr="a:1",code="OK"} 1\n', text)
+        self.assertIn('grpc_multistub_rpc_seconds_bucket{addr="a:1",le="0.001"} 0\n', text)
+        self.assertIn('grpc_multistub_rpc_seconds_bucket{addr="a:1",le="0.0025"} 1\n', text)
+        self.assertIn('grpc_multistub_rpc_seconds_bucket{addr="a:1",le="+Inf"} 1\n', text)
+        self.assertIn('grpc_multistub_connect_seconds_sum{addr="b:2"} 3.0\n', text)
+
+
+class TestMultiStubMetrics(unittest.TestCase):
+    def test_multi_stub(self) -> None:
+        backend = fakebackend.FakeBackend(max_workers=2)
+        addr = backend.addr()
+
+        metrics = clientmetrics.Metrics()
+        multi_stub = pythonmulticlient.RoundRobinMultiStub(
+            [addr, "localhost:1"], helloworld_pb2_grpc.GreeterStub, metrics=metrics
+        )
+        http_server = clientmetrics.serve_prometheus(metrics, "localhost", 0)
+        try:
+            test_multichannel._wait_for(
+                lambda: multi_stub.rr_named.get().addr == addr
+                and metrics.counter(clientmetrics.PICKS, addr) > 0
+            )
+            resp = multi_stub.get().SayHello(helloworld_pb2.HelloRequest(name="test"))
+            self.assertEqual("message", resp.message)
+
+            self.assertEqual(1, metrics.counter(clientmetrics.RPCS, addr, "OK"))
+            self.assertEqual(1, metrics.histogram_count(clientmetrics.RPC_SECONDS, addr))
+            self.assertEqual(1, metrics.histogram_count(clientmetrics.CONNECT_SECONDS, addr))
+            # the address that refuses connections is skipped
+            self.assertGreater(
+                metrics.counter(clientmetrics.SKIPS, "localhost:1", "TRANSIENT_FAILURE")
+                + metrics.counter(clientmetrics.SKIPS, "localhost:1", "CONNECTING")
+                + metrics.counter(clientmetrics.SKIPS, "localhost:1", "IDLE"),
+                0,
+            )
+
+            url = "http://localhost:{}/metrics".format(http_server.server_address[1])
+            with urllib.request.urlopen(url) as resp_http:
+                text = resp_http.read().decode("utf-8")
+            self.assertIn('grpc_multistub_rpcs_total{{addr="{}",code="OK"}} 1\n'.format(addr), text)
+        finally:
+            http_server.shutdown()
+            http_server.server_close()
+            multi_stub.close()
+            backend.close()
+
+    def test_removed_channel(self) -> None:
+        metrics = clientmetrics.Metrics()
+        multi_stub = pythonmulticlient.RoundRobinMultiStub(
+            ["localhost:1", "localhost:2"], helloworld_pb2_grpc.GreeterStub, metrics=metrics
+        )
+        try:
+            removed = next(c for c in multi_stub.rr_named.named_channels if c.addr == "localhost:2")
+            multi_stub.remove_addrs(["localhost:2"])
+            self.assertNotIn(removed, metrics._not_ready_since)
+            # a connectivity callback that was in flight when the channel was removed is ignored
+            multi_stub.rr_named._on_connectivity_change(
+                removed, grpc.ChannelConnectivity.CONNECTING
+            )
+            self.assertNotIn(removed, metrics._not_ready_since)
+        finally:
+            multi_stub.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import errorsweep
+import grpc
+import typing
+import unittest
+
+
+class TestFindBoundary(unittest.TestCase):
+    def test_find_boundary(self) -> None:
+        probed: typing.List[int] = []
+
+        def fails_from(
+            limit: int,
+        ) -> typing.Callable[[int], typing.Optional[errorsweep.ProbeResult]]:
+            def fails(err_length: int) -> typing.Optional[errorsweep.ProbeResult]:
+                probed.append(err_length)
+                if err_length < limit:
+                    return None
+                return errorsweep.ProbeResult(err_length, grpc.StatusCode.INTERNAL, "")
+
+            return fails
+
+        for limit in (1, 8003, 1000000):
+            probed.clear()
+            failure = errorsweep.find_boundary(fails_from(limit), 1 << 20)
+            assert failure is not None
+            self.assertEqual(limit, failure.err_length)
+            self.assertLessEqual(len(probed), 22)
+
+        self.assertIsNone(errorsweep.find_boundary(fails_from(2000000), 1 << 20))
+        failure = errorsweep.find_boundary(fails_from(0), 1 << 20)
+        assert failure is not None
+        self.assertEqual(0, failure.err_length)
+
+        # a known failure is not probed again
+        probed.clear()
+        known = errorsweep.ProbeResult(100, grpc.StatusCode.INTERNAL, "")
+        failure = errorsweep.find_boundary(fails_from(50), 100, known)
+        assert failure is not None
+        self.assertEqual(50, failure.err_length)
+        self.assertNotIn(100, probed)
+
+    def test_received(self) -> None:
+        code = grpc.StatusCode.FAILED_PRECONDITION
+        self.assertTrue(errorsweep.ProbeResult(3, code, "xxx").received())
+        self.assertFalse(errorsweep.ProbeResult(3, code, "xx").received())
+        self.assertFalse(errorsweep.ProbeResult(3, grpc.StatusCode.INTERNAL, "xxx").received())
+
+
+class TestSweep(unittest.TestCase):
+    def test_python_server(self) -> None:
+        server = errorsweep.ServerProcess("python", errorsweep.DEFAULT_SERVER_COMMANDS["python"])
+        try:
+            configs = [
+                errorsweep.SweepConfig("python", 8192, 0.0, ""),
+                errorsweep.SweepConfig("python", 32768, 10.0, "round_robin"),
+            ]
+            results = errorsweep.run_sweep(
+                {"python": server.addr},
+                configs,
+                max_err_length=1 << 17,
+                attempts=2,
+                parallelism=2,
+                timeout_s=10.0,
+            )
+        finally:
+            server.stop()
+        self.assertIsNotNone(server.process.returncode)
+
+        self.assertEqual(configs, [result.config for result in results])
+        for result, limit in zip(results, (8192, 32768)):
+            assert result.first_failure is not None
+            assert result.always_failure is not None
+            self.assertEqual(grpc.StatusCode.RESOURCE_EXHAUSTED, result.first_failure.code)
+            # the client rejects trailers over the limit at random, up to twice the limit
+            self.assertGreater(result.first_failure.err_length, limit - 200)
+            self.assertLessEqual(result.first_failure.err_length, result.always_failure.err_length)
+            self.assertLessEqual(result.always_failure.err_length, 2 * limit)
+
+        table = errorsweep.format_table(results).splitlines()
+        self.assertEqual(3, len(table))
+        self.assertEqual(["python", "32768", "10", "round_robin"], table[2].split()[:4])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import failover
+import fakebackend
+import grpc
+import helloworld_pb2
+import helloworld_pb2_grpc
+import pythonmulticlient
+import test_multichannel
+import threading
+import time
+import typing
+import unittest
+
+
+def _say_hello(
+    stub: helloworld_pb2_grpc.GreeterStub, timeout: typing.Optional[float]
+) -> "grpc.Future[helloworld_pb2.HelloReply]":
+    future: "grpc.Future[helloworld_pb2.HelloReply]" = stub.SayHello.future(
+        helloworld_pb2.HelloRequest(name="test"), timeout=timeout
+    )
+    return future
+
+
+class TestRetryBudget(unittest.TestCase):
+    def test_ratio(self) -> None:
+        budget = failover.RetryBudget(ratio=0.5, min_per_s=0)
+        self.assertFalse(budget.try_withdraw())
+        budget.deposit()
+        self.assertFalse(budget.try_withdraw())
+        budget.deposit()
+        self.assertTrue(budget.try_withdraw())
+        self.assertFalse(budget.try_withdraw())
+
+    def test_min_per_s(self) -> None:
+        budget = failover.RetryBudget(ratio=0, min_per_s=2, max_tokens=2)
+        self.assertTrue(budget.try_withdraw())
+        self.assertTrue(budget.try_withdraw())
+        self.assertFalse(budget.try_withdraw())
+
+
+class TestLatencyPercentile(unittest.TestCase):
+    def test_percentile(self) -> None:
+        latencies = failover.LatencyPercentile(90)
+        for i in range(19):
+            latencies.record(i / 100.0)
+        self.assertIsNone(latencies.value_s())
+        latencies.record(0.19)
+        self.assertEqual(0.18, latencies.value_s())
+
+
+class TestFailoverCaller(unittest.TestCase):
+    def setUp(self) -> None:
+        self.backend_a = fakebackend.FakeBackend()
+        self.backend_b = fakebackend.FakeBackend()
+        self.multi_stub = pythonmulticlient.RoundRobinMultiStub(
+            [self.backend_a.addr(), self.backend_b.addr()],
+            helloworld_pb2_grpc.GreeterStub,
+            watch_connectivity=True,
+        )
+        test_multichannel._wait_for(lambda: len(self.multi_stub.rr_named.ready) == 2)
+
+    def tearDown(self) -> None:
+        self.multi_stub.close()
+        self.backend_a.close()
+        self.backend_b.close()
+
+    def test_retry(self) -> None:
+        self.backend_a.faults.error_code = grpc.StatusCode.UNAVAILABLE
+        caller = failover.FailoverCaller(self.multi_stub, max_attempts=2)
+        for _ in range(4):
+            resp = caller.call(_say_hello, timeout=5.0)
+            self.assertEqual("message", resp.message)
+        # calls sent to backend_a first were retried on backend_b
+        self.assertGreater(self.backend_a.greeter.request_count, 0)
+        self.assertEqual(4, self.backend_b.greeter.request_count)
+
+        # errors that are not retryable are returned
+        self.backend_b.faults.error_code = grpc.StatusCode.FAILED_PRECONDITION
+        with self.assertRaises(grpc.RpcError) as cm:
+            for _ in range(2):
+                caller.call(_say_hello, timeout=5.0)
+        self.assertEqual(grpc.StatusCode.FAILED_PRECONDITION, cm.exception.code())
+
+    def test_budget_exhausted(self) -> None:
+        self.backend_a.faults.error_code = grpc.StatusCode.UNAVAILABLE
+        self.backend_b.faults.error_code = grpc.StatusCode.UNAVAILABLE
+        caller = failover.FailoverCaller(
+            self.multi_stub, max_attempts=3, budget=failover.RetryBudget(ratio=0, min_per_s=0)
+        )
+        with self.assertRaises(grpc.RpcError) as cm:
+            caller.call(_say_hello, timeout=5.0)
+        self.assertEqual(grpc.StatusCode.UNAVAILABLE, cm.exception.code())
+        self.assertEqual(
+            1, self.backend_a.greeter.request_count + self.backend_b.greeter.request_count
+        )
+
+    def test_hedge(self) -> None:
+        gate = threading.Event()
+        self.backend_a.greeter.gate = gate
+        caller = failover.FailoverCaller(self.multi_stub, hedge_delay_s=0.05)
+        try:
+            for _ in range(4):
+                start = time.monotonic()
+                resp = caller.call(_say_hello, timeout=5.0)
+                self.assertEqual("message", resp.message)
+                self.assertLess(time.monotonic() - start, 2.0)
+            # calls sent to backend_a first were hedged to backend_b
+            self.assertEqual(4, self.backend_b.greeter.request_count)
+            self.assertGreater(self.backend_a.greeter.request_count, 0)
+        finally:
+            gate.set()
+
+
+if __name__ == "__main__":
+    unittest.main()
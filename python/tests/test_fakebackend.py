@@ -0,0 +1,116 @@
+import fakebackend
+import grpc
+import helloworld_pb2
+import helloworld_pb2_grpc
+import random
+import time
+import unittest
+
+
+class TestLatencyDistributions(unittest.TestCase):
+    def test_distributions(self) -> None:
+        rng = random.Random(1)
+        self.assertEqual(0.5, fakebackend.constant_latency(0.5)(rng))
+        for _ in range(100):
+            self.assertTrue(0.1 <= fakebackend.uniform_latency(0.1, 0.2)(rng) <= 0.2)
+            self.assertIn(fakebackend.bimodal_latency(0.001, 1.0, 0.1)(rng), (0.001, 1.0))
+            self.assertGreater(fakebackend.exponential_latency(0.01)(rng), 0.0)
+
+        # the same seed produces the same latencies
+        lognormal = fakebackend.lognormal_latency(0.01, 1.0)
+        rng_a = random.Random(2)
+        rng_b = random.Random(2)
+        self.assertEqual(
+            [lognormal(rng_a) for _ in range(10)], [lognormal(rng_b) for _ in range(10)]
+        )
+        samples = sorted(lognormal(rng_a) for _ in range(1001))
+        self.assertAlmostEqual(0.01, samples[500], delta=0.003)
+
+
+class TestFakeBackend(unittest.TestCase):
+    def test_faults(self) -> None:
+        faults = fakebackend.Faults(
+            latency=fakebackend.constant_latency(0.05),
+            error_code=grpc.StatusCode.INTERNAL,
+            error_rate=0.0,
+            error_length=1000,
+        )
+        backend = fakebackend.FakeBackend(faults)
+        try:
+            with grpc.insecure_channel(backend.addr()) as channel:
+                stub = helloworld_pb2_grpc.GreeterStub(channel)
+                request = helloworld_pb2.HelloRequest(name="test")
+                start = time.monotonic()
+                self.assertEqual("message", stub.SayHello(request).message)
+                self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+                faults.latency = None
+                faults.error_rate = 1.0
+                with self.assertRaises(grpc.RpcError) as cm:
+                    stub.SayHello(request)
+                self.assertEqual(grpc.StatusCode.INTERNAL, cm.exception.code())
+                self.assertEqual("x" * 1000, cm.exception.details())
+
+                faults.reset_rate = 1.0
+                with self.assertRaises(grpc.RpcError) as cm:
+                    stub.SayHello(request)
+                self.assertEqual(grpc.StatusCode.CANCELLED, cm.exception.code())
+                self.assertEqual(3, backend.greeter.request_count)
+
+                # the client reconnects to the same address
+                faults.reset_rate = 0.0
+                faults.error_code = None
+                backend.drop_connections()
+                self.assertEqual("message", stub.SayHello(request, wait_for_ready=True).message)
+                self.assertEqual(2, len(backend.greeter.peers))
+
+                backend.stop()
+                with self.assertRaises(grpc.RpcError) as cm:
+                    stub.SayHello(request)
+                self.assertEqual(grpc.StatusCode.UNAVAILABLE, cm.exception.code())
+        finally:
+            backend.close()
+
+    def test_slow_start(self) -> None:
+        faults = fakebackend.Faults(
+            latency=fakebackend.constant_latency(0.001), slow_start_s=60.0, slow_start_factor=101.0
+        )
+        greeter = fakebackend.FakeGreeter(faults)
+        # started now: latency is slow_start_factor times longer
+        self.assertAlmostEqual(0.101, greeter._latency_s(), delta=0.001)
+        greeter.started_at -= 30.0
+        self.assertAlmostEqual(0.051, greeter._latency_s(), delta=0.001)
+        greeter.started_at -= 30.0
+        self.assertEqual(0.001, greeter._latency_s())
+
+    def test_cluster(self) -> None:
+        cluster = fakebackend.FakeCluster(
+            [
+                fakebackend.Faults(),
+                fakebackend.Faults(error_code=grpc.StatusCode.UNAVAILABLE, error_rate=0.5),
+            ]
+        )
+        try:
+            self.assertEqual(2, len(set(cluster.addrs())))
+            codes = []
+            for addr in cluster.addrs():
+                with grpc.insecure_channel(addr) as channel:
+                    stub = helloworld_pb2_grpc.GreeterStub(channel)
+                    for _ in range(20):
+                        try:
+                            stub.SayHello(helloworld_pb2.HelloRequest(name="test"))
+                            codes.append(grpc.StatusCode.OK)
+                        except grpc.RpcError as e:
+                            codes.append(e.code())
+            self.assertEqual([20, 20], cluster.request_counts())
+            self.assertEqual([grpc.StatusCode.OK] * 20, codes[:20])
+            # seeded: the same errors each time
+            failures = codes[20:].count(grpc.StatusCode.UNAVAILABLE)
+            self.assertGreater(failures, 0)
+            self.assertLess(failures, 20)
+        finally:
+            cluster.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import grpc
+import loadgen
+import unittest
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_empty(self) -> None:
+        histogram = loadgen.LatencyHistogram()
+        self.assertEqual(0.0, histogram.percentile_s(50))
+        self.assertEqual(0, histogram.summary()["count"])
+
+    def test_percentiles(self) -> None:
+        histogram = loadgen.LatencyHistogram()
+        # 1 ms to 1000 ms
+        for i in range(1, 1001):
+            histogram.record(i / 1000.0)
+        self.assertEqual(1000, histogram.total_count)
+        for percentile, expected_s in ((50, 0.5), (90, 0.9), (99, 0.99), (99.9, 0.999)):
+            self.assertAlmostEqual(
+                expected_s, histogram.percentile_s(percentile), delta=expected_s * 0.01
+            )
+        self.assertEqual(1.0, histogram.percentile_s(100))
+
+        # small values are exact
+        small = loadgen.LatencyHistogram()
+        small.record(0.000005)
+        self.assertEqual(0.000005, small.percentile_s(50))
+
+        # merging adds the counts
+        histogram.merge(small)
+        self.assertEqual(1001, histogram.total_count)
+        self.assertEqual(1.0, histogram.percentile_s(100))
+
+
+class TestRun(unittest.TestCase):
+    def test_closed_loop(self) -> None:
+        codes = [grpc.StatusCode.OK, grpc.StatusCode.FAILED_PRECONDITION]
+        calls = 0
+
+        def send() -> grpc.StatusCode:
+            nonlocal calls
+            calls += 1
+            return codes[calls % 2]
+
+        result = loadgen.run(send, concurrency=1, duration_s=10.0, max_requests=10)
+        self.assertEqual(10, calls)
+        self.assertEqual(5, result.by_code[grpc.StatusCode.OK].total_count)
+        output = result.to_json_dict()
+        self.assertEqual(10, output["requests"])
+        self.assertEqual(5, output["codes"]["FAILED_PRECONDITION"]["count"])
+
+    def test_open_loop(self) -> None:
+        # 50 requests at 500 QPS takes about 0.1 seconds
+        result = loadgen.run(
+            lambda: grpc.StatusCode.OK,
+            concurrency=4,
+            duration_s=10.0,
+            target_qps=500.0,
+            max_requests=50,
+        )
+        self.assertEqual(50, result.all_codes().total_count)
+        self.assertGreaterEqual(result.duration_s, 0.09)
+
+        # stops at the duration
+        result = loadgen.run(
+            lambda: grpc.StatusCode.OK, concurrency=2, duration_s=0.1, target_qps=100.0
+        )
+        self.assertEqual(10, result.all_codes().total_count)
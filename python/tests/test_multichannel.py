@@ -1,39 +1,272 @@
+import fakebackend
 import grpc
 import helloworld_pb2
 import helloworld_pb2_grpc
+import loadreport
 import pythonmulticlient
 import unittest
+import os
+import socket
+import tempfile
 import threading
-import concurrent.futures
+import time
+import typing
 
 
-class HelloWorldServicer(helloworld_pb2_grpc.GreeterServicer):
-    def __init__(self) -> None:
-        self._lock = threading.Lock()
-        self._request_count = 0
+_EMPTY_GRPC_OPTIONS = ()
 
-    def SayHello(
-        self, request: helloworld_pb2.HelloRequest, context: grpc.ServicerContext
-    ) -> helloworld_pb2.HelloReply:
-        with self._lock:
-            self._request_count += 1
-        return helloworld_pb2.HelloReply(message="message")
 
+def _wait_for(condition: typing.Callable[[], bool], timeout: float = 5.0) -> None:
+    """Waits for condition() to become true, or raises AssertionError."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting for condition")
+        time.sleep(0.01)
 
-class Backend(object):
-    def __init__(self, server: grpc.Server, backend: HelloWorldServicer, listen_port: int):
-        self.server = server
-        self.backend = backend
-        self.listen_port = listen_port
 
-    def addr(self) -> str:
-        return "localhost:" + str(self.listen_port)
+def _fake_named_channels(count: int) -> typing.List[pythonmulticlient.NamedChannel[int]]:
+    """Returns NamedChannels without gRPC channels, where the stub is the index."""
+    return [
+        pythonmulticlient.NamedChannel("addr" + str(i), typing.cast(grpc.Channel, None), i)
+        for i in range(count)
+    ]
 
-    def close(self) -> None:
-        self.server.stop(grace=0)
 
+class TestReadyChannels(unittest.TestCase):
+    def test_add_remove(self) -> None:
+        channels = _fake_named_channels(3)
+        ready = pythonmulticlient.ReadyChannels[pythonmulticlient.NamedChannel[int]]()
+        picker = pythonmulticlient.RoundRobinPicker[pythonmulticlient.NamedChannel[int]]()
 
-_EMPTY_GRPC_OPTIONS = ()
+        def next_stub() -> int:
+            return picker.pick(ready.channels).stub
+
+        for named_channel in channels:
+            ready.add(named_channel)
+        # adding twice is a no-op
+        ready.add(channels[0])
+        self.assertEqual(3, len(ready))
+        self.assertEqual([0, 1, 2, 0], [next_stub() for _ in range(4)])
+
+        ready.remove(channels[0])
+        ready.remove(channels[0])
+        self.assertEqual(2, len(ready))
+        self.assertNotIn(channels[0], ready)
+        self.assertEqual({1, 2}, {next_stub() for _ in range(2)})
+
+        ready.clear()
+        self.assertEqual(0, len(ready))
+
+
+class TestPickers(unittest.TestCase):
+    def test_channel_stats(self) -> None:
+        stats = pythonmulticlient.ChannelStats()
+        self.assertEqual(0.0, stats.load())
+        start = stats.start_call()
+        self.assertEqual(1, stats.in_flight)
+        self.assertEqual(1.0, stats.load())
+        stats.end_call(start - 1.0)
+        self.assertEqual(0, stats.in_flight)
+        self.assertGreaterEqual(stats.latency_ewma_s, 1.0)
+        self.assertEqual(stats.latency_ewma_s, stats.load())
+
+        # new samples move the average part of the way
+        stats.end_call(stats.start_call() - 2.0)
+        self.assertGreater(stats.latency_ewma_s, 1.0)
+        self.assertLess(stats.latency_ewma_s, 2.0)
+
+    def test_load_pickers(self) -> None:
+        channels = _fake_named_channels(2)
+        # channel 1 is slow
+        channels[0].stats.latency_ewma_s = 0.001
+        channels[1].stats.latency_ewma_s = 0.1
+
+        p2c = pythonmulticlient.PowerOfTwoChoicesPicker()
+        least_loaded = pythonmulticlient.LeastLoadedPicker()
+        for _ in range(10):
+            self.assertEqual(0, p2c.pick(channels).stub)
+            self.assertEqual(0, least_loaded.pick(channels).stub)
+        self.assertEqual(1, p2c.pick(channels[1:]).stub)
+
+        # many calls in flight on the fast channel makes it more expensive
+        channels[0].stats.in_flight = 200
+        self.assertEqual(1, p2c.pick(channels).stub)
+        self.assertEqual(1, least_loaded.pick(channels).stub)
+
+
+class TestOutlierDetector(unittest.TestCase):
+    def test_ejection(self) -> None:
+        channels = _fake_named_channels(4)
+        # a long interval so only the test calls check
+        detector = pythonmulticlient.OutlierDetector(
+            consecutive_failures=3, min_calls=10, base_ejection_s=10.0, interval_s=3600.0
+        )
+        try:
+            for named_channel in channels:
+                detector.add(named_channel)
+
+            def fail(stats: pythonmulticlient.ChannelStats, count: int) -> None:
+                for _ in range(count):
+                    stats.end_call(stats.start_call(), failed=True)
+
+            # consecutive failures
+            fail(channels[0].stats, 3)
+            # failure rate: 5/10 calls failed, but not consecutively
+            for _ in range(5):
+                fail(channels[1].stats, 1)
+                channels[1].stats.end_call(channels[1].stats.start_call())
+            # 2/10 calls failed
+            fail(channels[2].stats, 2)
+            for _ in range(8):
+                channels[2].stats.end_call(channels[2].stats.start_call())
+            detector.check(100.0)
+            self.assertEqual([True, True, False, False], [c.stats.ejected for c in channels])
+            self.assertEqual(2, detector.ejected)
+
+            # at most half the channels are ejected
+            fail(channels[2].stats, 3)
+            detector.check(101.0)
+            self.assertFalse(channels[2].stats.ejected)
+
+            # ejected channels return after the ejection time, so channel 2 can be ejected
+            detector.check(110.0)
+            self.assertEqual([False, False, True, False], [c.stats.ejected for c in channels])
+
+            # the next ejection is twice as long
+            fail(channels[0].stats, 3)
+            detector.check(111.0)
+            self.assertTrue(channels[0].stats.ejected)
+            self.assertEqual(131.0, channels[0].stats.ejected_until)
+        finally:
+            detector.close()
+
+
+class TestRendezvousHasher(unittest.TestCase):
+    def test_pick(self) -> None:
+        channels = _fake_named_channels(10)
+        hasher = pythonmulticlient.RendezvousHasher()
+        keys = ["key" + str(i) for i in range(1000)]
+        picks = {key: hasher.pick(channels, key).stub for key in keys}
+        # the same key picks the same channel
+        self.assertEqual(picks, {key: hasher.pick(channels, key).stub for key in keys})
+        # keys are spread across the channels
+        counts = [list(picks.values()).count(i) for i in range(10)]
+        self.assertGreater(min(counts), 50)
+
+        # removing a channel only moves the keys that picked it
+        without_3 = channels[:3] + channels[4:]
+        for key in keys:
+            stub = hasher.pick(without_3, key).stub
+            if picks[key] != 3:
+                self.assertEqual(picks[key], stub)
+
+    def test_bounded_load(self) -> None:
+        channels = _fake_named_channels(4)
+        hasher = pythonmulticlient.RendezvousHasher(load_factor=1.5)
+        preferred = hasher.pick(channels, "key")
+        self.assertIs(preferred, pythonmulticlient.RendezvousHasher().pick(channels, "key"))
+        # the preferred channel is overloaded: use the next choice
+        preferred.stats.in_flight = 10
+        self.assertIsNot(preferred, hasher.pick(channels, "key"))
+        # the preferred channel is not overloaded compared to the average
+        for named_channel in channels:
+            named_channel.stats.in_flight = 2
+        preferred.stats.in_flight = 3
+        self.assertIs(preferred, hasher.pick(channels, "key"))
+
+
+class TestWeightedRoundRobinPicker(unittest.TestCase):
+    def test_weights(self) -> None:
+        channels = _fake_named_channels(3)
+        picker = pythonmulticlient.WeightedRoundRobinPicker()
+        # without load reports: round robin
+        self.assertEqual([0, 1, 2] * 2, [picker.pick(channels).stub for _ in range(6)])
+
+        channels[0].stats.record_load_report({loadreport.CPU_UTILIZATION: 0.2})
+        channels[1].stats.record_load_report({loadreport.CPU_UTILIZATION: 0.8})
+        # a backend that is warming up reports no utilization yet
+        channels[2].stats.record_load_report({loadreport.IN_FLIGHT: 1})
+        # channel 2 has no utilization: it uses the mean weight, so the weights are 16:4:10
+        picker = pythonmulticlient.WeightedRoundRobinPicker()
+        picks = [picker.pick(channels).stub for _ in range(60)]
+        self.assertEqual([32, 8, 20], [picks.count(i) for i in range(3)])
+        # smooth: the picks of channel 0 are interleaved with the others. It has 16/30 of the
+        # weight, so it is never picked more than twice in a row. Plain weighted round robin
+        # would pick it 16 times in a row
+        self.assertNotIn((0, 0, 0), zip(picks, picks[1:], picks[2:]))
+
+
+class TestDeterministicSubset(unittest.TestCase):
+    def test_balanced(self) -> None:
+        addrs = ["backend" + str(i) for i in range(12)]
+        # 12 addresses / 3 per subset = 4 subsets per round: 8 clients is 2 complete rounds
+        counts = {addr: 0 for addr in addrs}
+        for client_id in range(8):
+            subset = pythonmulticlient.deterministic_subset(addrs, client_id, 3)
+            self.assertEqual(3, len(set(subset)))
+            for addr in subset:
+                counts[addr] += 1
+        self.assertEqual({2}, set(counts.values()))
+
+        # clients in the same round use disjoint subsets
+        round_addrs = set()
+        for client_id in range(4):
+            round_addrs.update(pythonmulticlient.deterministic_subset(addrs, client_id, 3))
+        self.assertEqual(set(addrs), round_addrs)
+
+    def test_deterministic(self) -> None:
+        addrs = ["backend" + str(i) for i in range(10)]
+        subset = pythonmulticlient.deterministic_subset(addrs, 7, 4)
+        self.assertEqual(subset, pythonmulticlient.deterministic_subset(reversed(addrs), 7, 4))
+        self.assertEqual(sorted(addrs), pythonmulticlient.deterministic_subset(addrs, 7, 10))
+
+        with self.assertRaisesRegex(ValueError, "client_id is required"):
+            pythonmulticlient.RoundRobinMultiStub(
+                addrs, helloworld_pb2_grpc.GreeterStub, subset_size=2
+            )
+        multi_stub = pythonmulticlient.RoundRobinMultiStub(
+            addrs, helloworld_pb2_grpc.GreeterStub, subset_size=2, client_id=3
+        )
+        try:
+            self.assertEqual(
+                sorted(pythonmulticlient.deterministic_subset(addrs, 3, 2)),
+                sorted(c.addr for c in multi_stub.rr_named.named_channels),
+            )
+        finally:
+            multi_stub.close()
+
+    def test_change_addrs(self) -> None:
+        addrs = ["b" + str(i) + ":1" for i in range(12)]
+        multi_stub = pythonmulticlient.RoundRobinMultiStub(
+            addrs, helloworld_pb2_grpc.GreeterStub, subset_size=3, client_id=0
+        )
+        try:
+            subset = pythonmulticlient.deterministic_subset(addrs, 0, 3)
+            self.assertEqual(sorted(subset), sorted(multi_stub.addrs()))
+
+            # removing an address in the subset replaces it from the other addresses
+            addrs.remove(subset[0])
+            multi_stub.remove_addrs([subset[0]])
+            subset = pythonmulticlient.deterministic_subset(addrs, 0, 3)
+            self.assertEqual(sorted(subset), sorted(multi_stub.addrs()))
+
+            # adding recomputes the subset from all the addresses
+            addrs.append("b12:1")
+            multi_stub.add_addrs(["b12:1"])
+            subset = pythonmulticlient.deterministic_subset(addrs, 0, 3)
+            self.assertEqual(sorted(subset), sorted(multi_stub.addrs()))
+
+            # removing an address outside the subset also recomputes it
+            outside = next(addr for addr in addrs if addr not in subset)
+            addrs.remove(outside)
+            multi_stub.remove_addrs([outside])
+            self.assertEqual(
+                sorted(pythonmulticlient.deterministic_subset(addrs, 0, 3)),
+                sorted(multi_stub.addrs()),
+            )
+        finally:
+            multi_stub.close()
 
 
 class TestRoundRobinMultiStub(unittest.TestCase):
@@ -61,14 +294,8 @@ class TestRoundRobinMultiStub(unittest.TestCase):
         with self.assertRaisesRegex(ValueError, "closed channel"):
             stub1.SayHello(helloworld_pb2.HelloRequest(name="test"))
 
-    def _make_test_backend(self) -> Backend:
-        server = grpc.server(concurrent.futures.ThreadPoolExecutor(max_workers=2))
-        backend = HelloWorldServicer()
-        helloworld_pb2_grpc.add_GreeterServicer_to_server(backend, server)
-        listen_port = server.add_insecure_port("localhost:0")
-        server.start()
-
-        return Backend(server, backend, listen_port)
+    def _make_test_backend(self) -> fakebackend.FakeBackend:
+        return fakebackend.FakeBackend(max_workers=2)
 
     def test_local_backends(self) -> None:
         backend_a = self._make_test_backend()
@@ -80,14 +307,18 @@ class TestRoundRobinMultiStub(unittest.TestCase):
         )
 
         try:
+            # get() does not wait for connections: wait for the background connections
+            for named_channel in multi_stub.rr_named.named_channels:
+                grpc.channel_ready_future(named_channel.grpc_channel).result(timeout=5)
+
             # 4 requests should execute correctly
             for _ in range(4):
                 resp = multi_stub.get().SayHello(helloworld_pb2.HelloRequest(name="test"))
                 self.assertEqual(resp.message, "message")
 
             # the requests should have been evenly distributed across the backends
-            self.assertEqual(2, backend_a.backend._request_count)
-            self.assertEqual(2, backend_b.backend._request_count)
+            self.assertEqual(2, backend_a.greeter.request_count)
+            self.assertEqual(2, backend_b.greeter.request_count)
 
             # calling close multiple times is fine, but requests should fail
             multi_stub.close()
@@ -99,11 +330,395 @@ class TestRoundRobinMultiStub(unittest.TestCase):
             partial_stubs = pythonmulticlient.RoundRobinMultiStub(
                 [backend_a.addr(), "localhost:1"], helloworld_pb2_grpc.GreeterStub
             )
+            _wait_for(
+                lambda: any(
+                    pythonmulticlient._check_connectivity(c.grpc_channel, False)
+                    is grpc.ChannelConnectivity.READY
+                    for c in partial_stubs.rr_named.named_channels
+                )
+            )
             for _ in range(4):
                 resp = partial_stubs.get().SayHello(helloworld_pb2.HelloRequest(name="test"))
                 self.assertEqual(resp.message, "message")
-            self.assertEqual(6, backend_a.backend._request_count)
+            self.assertEqual(6, backend_a.greeter.request_count)
+            partial_stubs.close()
+
+        finally:
+            multi_stub.close()
+            backend_b.close()
+            backend_a.close()
+
+    def test_wait_ready(self) -> None:
+        backend_a = self._make_test_backend()
+        backend_b = self._make_test_backend()
+        try:
+            for watch_connectivity in (False, True):
+                multi_stub = pythonmulticlient.RoundRobinMultiStub(
+                    [backend_a.addr(), backend_b.addr(), "localhost:1"],
+                    helloworld_pb2_grpc.GreeterStub,
+                    watch_connectivity=watch_connectivity,
+                )
+                try:
+                    self.assertTrue(multi_stub.wait_ready(2, timeout_s=5.0))
+                    self.assertEqual(2, len(multi_stub.rr_named._check_ready()))
+                    # localhost:1 never connects
+                    start = time.monotonic()
+                    self.assertFalse(multi_stub.wait_ready(3, timeout_s=0.1))
+                    self.assertGreaterEqual(time.monotonic() - start, 0.1)
+                finally:
+                    multi_stub.close()
+
+            # min_ready is limited to the number of channels
+            multi_stub = pythonmulticlient.RoundRobinMultiStub(
+                [backend_a.addr()], helloworld_pb2_grpc.GreeterStub
+            )
+            try:
+                self.assertTrue(multi_stub.wait_ready(2, timeout_s=5.0))
+            finally:
+                multi_stub.close()
+        finally:
+            backend_a.close()
+            backend_b.close()
+
+    def test_channels_per_addr(self) -> None:
+        backend_a = self._make_test_backend()
+        backend_b = self._make_test_backend()
+        multi_stub = pythonmulticlient.RoundRobinMultiStub(
+            [backend_a.addr(), backend_b.addr()],
+            helloworld_pb2_grpc.GreeterStub,
+            channels_per_addr=3,
+        )
+        try:
+            self.assertEqual(6, len(multi_stub.rr_named.named_channels))
+            self.assertEqual(
+                sorted([backend_a.addr(), backend_b.addr()]), sorted(multi_stub.addrs())
+            )
+            self.assertTrue(multi_stub.wait_ready(6, timeout_s=5.0))
+            for _ in range(12):
+                multi_stub.get().SayHello(helloworld_pb2.HelloRequest(name="test"))
+            # each channel has its own connection
+            self.assertEqual(3, len(backend_a.greeter.peers))
+            self.assertEqual(3, len(backend_b.greeter.peers))
+            self.assertEqual(6, backend_a.greeter.request_count)
+
+            # removing an address removes all its channels
+            multi_stub.remove_addrs([backend_b.addr()])
+            self.assertEqual([backend_a.addr()], multi_stub.addrs())
+            self.assertEqual(3, len(multi_stub.rr_named.named_channels))
+        finally:
+            multi_stub.close()
+            backend_a.close()
+            backend_b.close()
+
+    def test_get_key(self) -> None:
+        backends = [self._make_test_backend() for _ in range(3)]
+        multi_stub = pythonmulticlient.RoundRobinMultiStub(
+            [backend.addr() for backend in backends], helloworld_pb2_grpc.GreeterStub
+        )
+        try:
+            self.assertTrue(multi_stub.wait_ready(3, timeout_s=5.0))
+            keys = ["key" + str(i) for i in range(30)]
+            addrs = {key: multi_stub.get_named(key=key).addr for key in keys}
+            self.assertEqual(3, len(set(addrs.values())))
+            for key in keys:
+                self.assertEqual(addrs[key], multi_stub.get_named(key=key).addr)
+                resp = multi_stub.get(key).SayHello(helloworld_pb2.HelloRequest(name=key))
+                self.assertEqual("message", resp.message)
+
+            # when a backend stops, only its keys move to the other backends
+            backends[0].close()
+            _wait_for(lambda: len(multi_stub.rr_named._check_ready()) == 2)
+            for key in keys:
+                addr = multi_stub.get_named(key=key).addr
+                self.assertNotEqual(backends[0].addr(), addr)
+                if addrs[key] != backends[0].addr():
+                    self.assertEqual(addrs[key], addr)
+        finally:
+            multi_stub.close()
+            for backend in backends:
+                backend.close()
+
+    def test_load_reports(self) -> None:
+        backend_a = self._make_test_backend()
+        backend_b = self._make_test_backend()
+        backend_a.greeter.load_report = loadreport.format_load_report(
+            {loadreport.CPU_UTILIZATION: 0.2}
+        )
+        backend_b.greeter.load_report = loadreport.format_load_report(
+            {loadreport.CPU_UTILIZATION: 0.8}
+        )
+        multi_stub = pythonmulticlient.RoundRobinMultiStub(
+            [backend_a.addr(), backend_b.addr()],
+            helloworld_pb2_grpc.GreeterStub,
+            picker=pythonmulticlient.WeightedRoundRobinPicker(),
+        )
+        try:
+            self.assertTrue(multi_stub.wait_ready(2, timeout_s=5.0))
+            for _ in range(50):
+                multi_stub.get().SayHello(helloworld_pb2.HelloRequest(name="test"))
+            for named_channel in multi_stub.rr_named.named_channels:
+                self.assertIsNotNone(named_channel.stats.utilization_ewma)
+            # the less utilized backend gets about 4 times the calls
+            self.assertGreater(backend_a.greeter.request_count, 3 * backend_b.greeter.request_count)
+        finally:
+            multi_stub.close()
+            backend_a.close()
+            backend_b.close()
+
+    def test_get_does_not_block(self) -> None:
+        # a listening socket that never completes the HTTP/2 handshake: channels stay CONNECTING
+        with socket.socket() as blackhole:
+            blackhole.bind(("localhost", 0))
+            blackhole.listen()
+            addr = "localhost:" + str(blackhole.getsockname()[1])
+
+            for watch_connectivity in (False, True):
+                multi_stub = pythonmulticlient.RoundRobinMultiStub(
+                    [addr, addr],
+                    helloworld_pb2_grpc.GreeterStub,
+                    watch_connectivity=watch_connectivity,
+                )
+                try:
+                    start = time.monotonic()
+                    for _ in range(10):
+                        self.assertIsNotNone(multi_stub.get())
+                    # previously waited 50 ms per connecting channel per call: 1 second
+                    self.assertLess(time.monotonic() - start, 0.5)
+                finally:
+                    multi_stub.close()
+
+    def test_connection_manager(self) -> None:
+        backend = self._make_test_backend()
+        channel = grpc.insecure_channel(backend.addr())
+        manager = pythonmulticlient.ConnectionManager([channel])
+        try:
+            # new channels are IDLE until something asks them to connect
+            _wait_for(
+                lambda: pythonmulticlient._check_connectivity(channel, False)
+                is grpc.ChannelConnectivity.READY
+            )
+        finally:
+            manager.close()
+            manager.close()
+            channel.close()
+            backend.close()
+
+    def test_picker(self) -> None:
+        backend_a = self._make_test_backend()
+        backend_b = self._make_test_backend()
+
+        multi_stub = pythonmulticlient.RoundRobinMultiStub(
+            [backend_a.addr(), backend_b.addr()],
+            helloworld_pb2_grpc.GreeterStub,
+            picker=pythonmulticlient.LeastLoadedPicker(),
+        )
+        try:
+            for named_channel in multi_stub.rr_named.named_channels:
+                grpc.channel_ready_future(named_channel.grpc_channel).result(timeout=5)
+
+            # blocking and future calls are both tracked
+            resp = multi_stub.get().SayHello(helloworld_pb2.HelloRequest(name="test"))
+            self.assertEqual(resp.message, "message")
+            future = multi_stub.get().SayHello.future(helloworld_pb2.HelloRequest(name="test"))
+            self.assertEqual(future.result().message, "message")
+            self.assertEqual(2, backend_a.greeter.request_count + backend_b.greeter.request_count)
+
+            # the latency callback for futures can run after result() returns
+            _wait_for(
+                lambda: all(
+                    named_channel.stats.in_flight == 0
+                    for named_channel in multi_stub.rr_named.named_channels
+                )
+            )
+            self.assertTrue(
+                any(
+                    named_channel.stats.latency_ewma_s > 0.0
+                    for named_channel in multi_stub.rr_named.named_channels
+                )
+            )
+
+            # calls on closed channels are still tracked
+            multi_stub.close()
+            with self.assertRaisesRegex(ValueError, "closed"):
+                multi_stub.get().SayHello(helloworld_pb2.HelloRequest(name="test"))
+            for named_channel in multi_stub.rr_named.named_channels:
+                self.assertEqual(0, named_channel.stats.in_flight)
+        finally:
+            multi_stub.close()
+            backend_b.close()
+            backend_a.close()
+
+    def test_watch_connectivity_startup(self) -> None:
+        # gRPC calls the connectivity callbacks on its own thread as soon as channels subscribe:
+        # they must not run before the stub is initialized
+        backend = self._make_test_backend()
+        addrs = [backend.addr()] + ["localhost:1"] * 5
+        multi_stubs = []
+        try:
+            with self.assertNoLogs(level="ERROR"):
+                for _ in range(10):
+                    multi_stubs.append(
+                        pythonmulticlient.RoundRobinMultiStub(
+                            addrs,
+                            helloworld_pb2_grpc.GreeterStub,
+                            watch_connectivity=True,
+                            channels_per_addr=2,
+                        )
+                    )
+                for multi_stub in multi_stubs:
+                    self.assertTrue(multi_stub.wait_ready(2, timeout_s=5.0))
+        finally:
+            for multi_stub in multi_stubs:
+                multi_stub.close()
+            backend.close()
+
+    def test_change_addrs(self) -> None:
+        backend_a = self._make_test_backend()
+        backend_b = self._make_test_backend()
+        backend_a.greeter.gate = threading.Event()
+
+        multi_stub = pythonmulticlient.RoundRobinMultiStub(
+            [backend_a.addr()], helloworld_pb2_grpc.GreeterStub, watch_connectivity=True
+        )
+        try:
+            _wait_for(lambda: len(multi_stub.rr_named.ready) == 1)
+            channel_a = multi_stub.rr_named.named_channels[0]
+            in_flight = multi_stub.get().SayHello.future(helloworld_pb2.HelloRequest(name="test"))
+            _wait_for(lambda: backend_a.greeter.request_count == 1)
+
+            # adding reuses the existing channel
+            multi_stub.add_addrs([backend_a.addr(), backend_b.addr()])
+            self.assertEqual(
+                sorted([backend_a.addr(), backend_b.addr()]), sorted(multi_stub.addrs())
+            )
+            self.assertIn(channel_a, multi_stub.rr_named.named_channels)
+
+            # removing the last address is not permitted
+            with self.assertRaisesRegex(ValueError, "empty"):
+                multi_stub.set_addrs([])
+
+            # removed channels are not used, but in-flight calls finish
+            multi_stub.set_addrs([backend_b.addr()])
+            self.assertEqual([backend_b.addr()], multi_stub.addrs())
+            _wait_for(lambda: len(multi_stub.rr_named.ready) == 1)
+            for _ in range(2):
+                resp = multi_stub.get().SayHello(helloworld_pb2.HelloRequest(name="test"))
+                self.assertEqual(resp.message, "message")
+            self.assertEqual(2, backend_b.greeter.request_count)
+
+            backend_a.greeter.gate.set()
+            self.assertEqual("message", in_flight.result(timeout=5).message)
+
+            # the removed channel is closed after the call finishes
+            def channel_a_closed() -> bool:
+                try:
+                    pythonmulticlient._check_connectivity(channel_a.grpc_channel, False)
+                    return False
+                except ValueError:
+                    return True
+
+            _wait_for(channel_a_closed)
+
+            multi_stub.remove_addrs(["doesnotexist:1234"])
+            self.assertEqual([backend_b.addr()], multi_stub.addrs())
+        finally:
+            backend_a.greeter.gate.set()
+            multi_stub.close()
+            backend_b.close()
+            backend_a.close()
+
+    def test_periodic_resolver(self) -> None:
+        self.assertIn("127.0.0.1:1234", pythonmulticlient.resolve_dns("localhost:1234"))
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, "addrs")
+            with open(path, "w") as f:
+                f.write("localhost:1,localhost:2\n")
+
+            multi_stub = pythonmulticlient.RoundRobinMultiStub(
+                pythonmulticlient.read_addrs_file(path), helloworld_pb2_grpc.GreeterStub
+            )
+            resolver = pythonmulticlient.PeriodicResolver(
+                multi_stub, lambda: pythonmulticlient.read_addrs_file(path), 0.01
+            )
+            try:
+                with open(path, "w") as f:
+                    f.write("localhost:2\nlocalhost:3\n")
+                _wait_for(lambda: sorted(multi_stub.addrs()) == ["localhost:2", "localhost:3"])
+
+                # errors keep the current addresses
+                os.remove(path)
+                resolver.resolve_now()
+                self.assertEqual(["localhost:2", "localhost:3"], sorted(multi_stub.addrs()))
+            finally:
+                resolver.close()
+                multi_stub.close()
+
+    def test_outlier_detection(self) -> None:
+        backend_a = self._make_test_backend()
+        backend_b = self._make_test_backend()
+        # backend_a is connected but fails every call
+        backend_a.faults.error_code = grpc.StatusCode.INTERNAL
+        detector = pythonmulticlient.OutlierDetector(consecutive_failures=2, interval_s=0.01)
+        multi_stub = pythonmulticlient.RoundRobinMultiStub(
+            [backend_a.addr(), backend_b.addr()],
+            helloworld_pb2_grpc.GreeterStub,
+            watch_connectivity=True,
+            outlier_detector=detector,
+        )
+        try:
+            _wait_for(lambda: len(multi_stub.rr_named.ready) == 2)
+
+            def say_hello() -> bool:
+                try:
+                    multi_stub.get().SayHello(helloworld_pb2.HelloRequest(name="test"))
+                    return False
+                except grpc.RpcError:
+                    return True
+
+            def send_until_ejected() -> bool:
+                say_hello()
+                return detector.ejected == 1
+
+            _wait_for(send_until_ejected)
+            # backend_a is still READY, but is not used
+            self.assertEqual(2, len(multi_stub.rr_named.ready))
+            for _ in range(4):
+                self.assertFalse(say_hello())
+        finally:
+            multi_stub.close()
+            backend_a.close()
+            backend_b.close()
+
+    def test_watch_connectivity(self) -> None:
+        backend_a = self._make_test_backend()
+        backend_b = self._make_test_backend()
+
+        multi_stub = pythonmulticlient.RoundRobinMultiStub(
+            [backend_a.addr(), backend_b.addr(), "localhost:1"],
+            helloworld_pb2_grpc.GreeterStub,
+            watch_connectivity=True,
+        )
+        try:
+            # the channels connect in the background
+            _wait_for(lambda: len(multi_stub.rr_named.ready) == 2)
+
+            for _ in range(4):
+                resp = multi_stub.get().SayHello(helloworld_pb2.HelloRequest(name="test"))
+                self.assertEqual(resp.message, "message")
+            self.assertEqual(2, backend_a.greeter.request_count)
+            self.assertEqual(2, backend_b.greeter.request_count)
+
+            # stopping a backend removes it from the ready set
+            backend_b.close()
+            _wait_for(lambda: len(multi_stub.rr_named.ready) == 1)
+            for _ in range(2):
+                resp = multi_stub.get().SayHello(helloworld_pb2.HelloRequest(name="test"))
+                self.assertEqual(resp.message, "message")
+            self.assertEqual(4, backend_a.greeter.request_count)
 
+            multi_stub.close()
+            self.assertEqual(0, len(multi_stub.rr_named.ready))
         finally:
             multi_stub.close()
             backend_b.close()
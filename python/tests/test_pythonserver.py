@@ -0,0 +1,195 @@
+import argparse
+import grpc
+import grpc.aio
+import helloworld_pb2
+import helloworld_pb2_grpc
+import loadreport
+import os
+import pythonclient
+import pythonserver
+import signal
+import socket
+import subprocess
+import sys
+import time
+import typing
+import unittest
+import concurrent.futures
+
+
+_SERVER_PATH = os.path.join(os.path.dirname(__file__), "..", "pythonserver.py")
+
+
+def _unused_port() -> int:
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        port: int = s.getsockname()[1]
+        return port
+
+
+class TestErrorGreeter(unittest.TestCase):
+    def test_error_message_cache(self) -> None:
+        greeter = pythonserver.ErrorGreeter(cache_size=2, log_every=0)
+        message = greeter.error_message(1000)
+        self.assertEqual("x" * 1000, message)
+        # the same message is reused
+        self.assertIs(message, greeter.error_message(1000))
+        greeter.error_message(1)
+        greeter.error_message(2)
+        self.assertEqual(2, greeter.error_message.cache_info().currsize)
+
+    def test_load_report(self) -> None:
+        # the CPU is only sampled when reporting load
+        self.assertIsNone(pythonserver.ErrorGreeter(log_every=0)._cpu_sampler)
+
+        greeter = pythonserver.ErrorGreeter(log_every=0, report_load=True)
+        greeter.queue_depth = lambda: 3
+        server = grpc.server(concurrent.futures.ThreadPoolExecutor(max_workers=1))
+        helloworld_pb2_grpc.add_GreeterServicer_to_server(greeter, server)
+        port = server.add_insecure_port("localhost:0")
+        server.start()
+        try:
+            with grpc.insecure_channel("localhost:" + str(port)) as channel:
+                stub = helloworld_pb2_grpc.GreeterStub(channel)
+                with self.assertRaises(grpc.RpcError) as cm:
+                    stub.SayHello(helloworld_pb2.HelloRequest(name="errLength=10"))
+                self.assertEqual(grpc.StatusCode.FAILED_PRECONDITION, cm.exception.code())
+                report = loadreport.find_load_report(cm.exception.trailing_metadata())
+                assert report is not None
+                self.assertEqual(1, report[loadreport.IN_FLIGHT])
+                self.assertEqual(3, report[loadreport.QUEUE_DEPTH])
+                # the CPU has not been sampled for a full interval yet
+                self.assertNotIn(loadreport.CPU_UTILIZATION, report)
+                self.assertEqual(0, greeter.in_flight)
+        finally:
+            server.stop(None)
+
+    def test_streams(self) -> None:
+        server = grpc.server(concurrent.futures.ThreadPoolExecutor(max_workers=2))
+        helloworld_pb2_grpc.add_GreeterServicer_to_server(
+            pythonserver.ErrorGreeter(log_every=0), server
+        )
+        port = server.add_insecure_port("localhost:0")
+        server.start()
+        parser = argparse.ArgumentParser()
+        pythonclient.add_client_arguments(parser)
+        pythonclient.add_stream_arguments(parser)
+        try:
+            with grpc.insecure_channel("localhost:" + str(port)) as channel:
+                stub = helloworld_pb2_grpc.GreeterStub(channel)
+                request = helloworld_pb2.HelloRequest(reply_count=3, reply_length=5)
+                replies = list(stub.SayHelloStream(request))
+                self.assertEqual(["xxxxx"] * 3, [reply.message for reply in replies])
+
+                for stream in ("server", "bidi"):
+                    args = parser.parse_args(
+                        [
+                            "--stream=" + stream,
+                            "--streamReplies=250",
+                            "--streamBatch=100",
+                            "--streamWindow=2",
+                            "--replyLength=10",
+                            "--errLength=0",
+                        ]
+                    )
+                    output = pythonclient.run_stream(stub, args)
+                    self.assertEqual("OK", output["code"])
+                    self.assertEqual(250, output["messages"])
+                    # each reply has a 2 byte protobuf field tag and length
+                    self.assertEqual(250 * 12, output["bytes"])
+                    self.assertGreater(output["messages_per_s"], 0)
+
+                    # the stream ends with the requested error
+                    args.errLength = 20
+                    output = pythonclient.run_stream(stub, args)
+                    self.assertEqual("FAILED_PRECONDITION", output["code"])
+                    self.assertEqual(20, output["details_length"])
+                    self.assertEqual(250, output["messages"])
+        finally:
+            server.stop(None)
+
+
+class TestLoadReport(unittest.TestCase):
+    def test_format_parse(self) -> None:
+        value = loadreport.format_load_report({"cpu_utilization": 0.25, "in_flight": 3})
+        self.assertEqual("TEXT cpu_utilization=0.25, in_flight=3", value)
+        self.assertEqual(
+            {"cpu_utilization": 0.25, "in_flight": 3}, loadreport.parse_load_report(value)
+        )
+        self.assertEqual({"a": 1.0}, loadreport.parse_load_report(b"TEXT a=1, b=x"))
+        with self.assertRaises(ValueError):
+            loadreport.parse_load_report("cpu_utilization=0.25")
+        self.assertIsNone(loadreport.find_load_report((("other", "x"),)))
+
+    def test_cpu_sampler(self) -> None:
+        sampler = loadreport.CPUSampler(interval_s=0.05)
+        # no utilization until the first interval has passed
+        self.assertIsNone(sampler.utilization())
+        time.sleep(0.06)
+        utilization = sampler.utilization()
+        assert utilization is not None
+        self.assertGreaterEqual(utilization, 0.0)
+
+
+class TestAsyncServer(unittest.IsolatedAsyncioTestCase):
+    async def test_async_server(self) -> None:
+        server = grpc.aio.server()
+        helloworld_pb2_grpc.add_GreeterServicer_to_server(
+            pythonserver.AsyncErrorGreeter(pythonserver.ErrorGreeter()), server
+        )
+        port = server.add_insecure_port("localhost:0")
+        await server.start()
+        try:
+            async with grpc.aio.insecure_channel("localhost:" + str(port)) as channel:
+                stub = helloworld_pb2_grpc.GreeterStub(channel)
+                with self.assertRaises(grpc.aio.AioRpcError) as cm:
+                    await stub.SayHello(helloworld_pb2.HelloRequest(name="errLength=10"))
+                self.assertEqual(grpc.StatusCode.FAILED_PRECONDITION, cm.exception.code())
+                self.assertEqual("x" * 10, cm.exception.details())
+
+                request = helloworld_pb2.HelloRequest(reply_count=2, reply_length=3)
+                replies = [reply async for reply in stub.SayHelloStream(request)]
+                self.assertEqual(["xxx"] * 2, [reply.message for reply in replies])
+
+                call = stub.SayHelloBidi(
+                    [request, helloworld_pb2.HelloRequest(name="errLength=4", reply_count=1)]
+                )
+                messages = []
+                with self.assertRaises(grpc.aio.AioRpcError) as cm:
+                    async for reply in call:
+                        messages.append(reply.message)
+                self.assertEqual(["xxx", "xxx", ""], messages)
+                self.assertEqual(grpc.StatusCode.FAILED_PRECONDITION, cm.exception.code())
+                self.assertEqual("x" * 4, cm.exception.details())
+        finally:
+            await server.stop(None)
+
+
+class TestPythonServer(unittest.TestCase):
+    def test_workers(self) -> None:
+        self._test_workers(["--threads", "2"])
+
+    def test_async_workers(self) -> None:
+        self._test_workers(["--aio", "--logEvery", "0"])
+
+    def _test_workers(self, extra_args: typing.List[str]) -> None:
+        addr = "localhost:" + str(_unused_port())
+        server = subprocess.Popen(
+            [sys.executable, _SERVER_PATH, "--addr", addr, "--workers", "2"] + extra_args
+        )
+        try:
+            channel = grpc.insecure_channel(addr)
+            grpc.channel_ready_future(channel).result(timeout=10)
+            stub = helloworld_pb2_grpc.GreeterStub(channel)
+            with self.assertRaises(grpc.RpcError) as cm:
+                stub.SayHello(helloworld_pb2.HelloRequest(name="errLength=10"))
+            self.assertEqual(grpc.StatusCode.FAILED_PRECONDITION, cm.exception.code())
+            self.assertEqual("x" * 10, cm.exception.details())
+            channel.close()
+
+            # SIGTERM stops all the workers
+            server.send_signal(signal.SIGTERM)
+            self.assertEqual(0, server.wait(timeout=10))
+        finally:
+            server.kill()
+            server.wait()
@@ -0,0 +1,81 @@
+import fakebackend
+import grpc
+import helloworld_pb2
+import helloworld_pb2_grpc
+import pythonmulticlient
+import throttle
+import unittest
+
+
+class TestAdaptiveThrottle(unittest.TestCase):
+    def test_reject_probability(self) -> None:
+        now = 1000.0
+        random_float = 0.5
+        adaptive_throttle = throttle.AdaptiveThrottle(
+            k=2.0, window_s=10.0, clock=lambda: now, random_float=lambda: random_float
+        )
+        # accepted calls: never rejects
+        for _ in range(10):
+            self.assertFalse(adaptive_throttle.should_reject())
+            adaptive_throttle.record(grpc.StatusCode.OK)
+        # errors that are not overload are accepts
+        adaptive_throttle.record(grpc.StatusCode.FAILED_PRECONDITION)
+        self.assertEqual(0.0, adaptive_throttle.reject_probability())
+
+        # 10 accepts allow 20 requests before rejecting
+        for _ in range(10):
+            self.assertFalse(adaptive_throttle.should_reject())
+            adaptive_throttle.record(grpc.StatusCode.RESOURCE_EXHAUSTED)
+        self.assertEqual(0.0, adaptive_throttle.reject_probability())
+        for _ in range(30):
+            if not adaptive_throttle.should_reject():
+                adaptive_throttle.record(grpc.StatusCode.UNAVAILABLE)
+        # (50 - 2 * 11) / 51
+        self.assertAlmostEqual(28 / 51, adaptive_throttle.reject_probability())
+
+        # old requests expire
+        now += 11.0
+        self.assertEqual(0.0, adaptive_throttle.reject_probability())
+        self.assertEqual(0, adaptive_throttle.requests)
+
+
+class TestThrottleInterceptor(unittest.TestCase):
+    def test_multi_stub(self) -> None:
+        backend = fakebackend.FakeBackend(
+            fakebackend.Faults(error_code=grpc.StatusCode.RESOURCE_EXHAUSTED), max_workers=2
+        )
+        addr = backend.addr()
+
+        adaptive_throttle = throttle.AdaptiveThrottle()
+        multi_stub = pythonmulticlient.RoundRobinMultiStub(
+            [addr],
+            helloworld_pb2_grpc.GreeterStub,
+            adaptive_throttle=adaptive_throttle,
+        )
+        try:
+            self.assertTrue(multi_stub.wait_ready(1, timeout_s=5.0))
+            throttled = 0
+            for _ in range(100):
+                with self.assertRaises(grpc.RpcError) as cm:
+                    multi_stub.get().SayHello(helloworld_pb2.HelloRequest(name="test"))
+                self.assertEqual(grpc.StatusCode.RESOURCE_EXHAUSTED, cm.exception.code())
+                if isinstance(cm.exception, throttle.ThrottledError):
+                    throttled += 1
+            # most requests are rejected without being sent
+            self.assertGreater(throttled, 50)
+            self.assertEqual(100 - throttled, backend.greeter.request_count)
+
+            # rejected calls are not recorded as failures of the channel
+            stats = multi_stub.rr_named.named_channels[0].stats
+            self.assertEqual(backend.greeter.request_count, stats.failures)
+
+            # futures are also rejected
+            future = multi_stub.get().SayHello.future(helloworld_pb2.HelloRequest(name="test"))
+            self.assertEqual(grpc.StatusCode.RESOURCE_EXHAUSTED, future.exception().code())
+        finally:
+            multi_stub.close()
+            backend.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,309 @@
+import grpc
+import grpc.aio
+import helloworld_pb2
+import helloworld_pb2_grpc
+import pythonserver
+import trailerguard
+import typing
+import unittest
+import concurrent.futures
+
+
+_CLIENT_OPTIONS = (("grpc.max_metadata_size", trailerguard.DEFAULT_BUDGET),)
+# error details are sent in this trailer by grpcio-status and other gRPC implementations
+_DETAILS_KEY = "grpc-status-details-bin"
+
+
+class _Status(grpc.Status):
+    def __init__(
+        self, code: grpc.StatusCode, details: str, trailing_metadata: trailerguard.Metadata
+    ) -> None:
+        self.code = code
+        self.details = details
+        self.trailing_metadata = tuple(trailing_metadata)
+
+
+# a status with large error details, as returned by grpcio-status
+_RICH_STATUS = _Status(
+    grpc.StatusCode.FAILED_PRECONDITION, "rich", ((_DETAILS_KEY, b"d" * 20000), ("small", "s"))
+)
+
+
+class TestTrailerBudget(unittest.TestCase):
+    def test_trailers_size(self) -> None:
+        # the README: a client limit of 8192 fails with messages of 8003 bytes or longer
+        code = grpc.StatusCode.FAILED_PRECONDITION
+        self.assertEqual(8192, trailerguard.trailers_size(code, "x" * 8002, ()))
+        self.assertEqual(8193, trailerguard.trailers_size(code, "x" * 8003, ()))
+        # percent-encoded characters count 3 bytes
+        self.assertEqual(
+            trailerguard.trailers_size(code, "xxxxxx", ()),
+            trailerguard.trailers_size(code, "%\n", ()),
+        )
+        # binary values count as base64
+        self.assertEqual(
+            trailerguard.trailers_size(code, "", (("k-bin", b"\x00\x01\x02"),)),
+            trailerguard.trailers_size(code, "", (("k-bin", "abcd"),)),
+        )
+
+    def test_fit(self) -> None:
+        budget = trailerguard.TrailerBudget()
+        code = grpc.StatusCode.FAILED_PRECONDITION
+        details, metadata = budget.fit(code, "x" * 8002, ())
+        self.assertEqual("x" * 8002, details)
+        self.assertEqual(0, budget.truncations)
+
+        for length in (8003, 100000):
+            details, metadata = budget.fit(code, "x" * length, ())
+            self.assertEqual(8192, trailerguard.trailers_size(code, details, metadata))
+            self.assertTrue(details.endswith("(truncated)"))
+        self.assertEqual(2, budget.truncations)
+
+        # multi-byte characters are not split
+        details, _ = budget.fit(code, "é" * 2000, ())
+        self.assertLessEqual(trailerguard.trailers_size(code, details, ()), 8192)
+        self.assertTrue(details.startswith("é" * 1000))
+
+        # large metadata is dropped, and small metadata is kept
+        metadata_in = (("small", "s"), ("large-bin", b"x" * 9000), ("medium", "m" * 2000))
+        details, metadata = budget.fit(code, "x" * 1000, metadata_in)
+        self.assertEqual("x" * 1000, details)
+        self.assertEqual([("small", "s"), ("medium", "m" * 2000)], metadata)
+
+        # details are truncated before metadata is dropped
+        details, metadata = budget.fit(code, "x" * 8000, (("medium", "m" * 2000),))
+        self.assertEqual((("medium", "m" * 2000),), metadata)
+        self.assertLessEqual(trailerguard.trailers_size(code, details, metadata), 8192)
+
+        with self.assertRaises(ValueError):
+            trailerguard.TrailerBudget(100)
+
+    def test_encoded_message_length(self) -> None:
+        details = "".join(chr(c) for c in range(0x200)) + "€😀"
+        expected = sum(
+            1 if 0x20 <= byte <= 0x7E and byte != ord("%") else 3
+            for byte in details.encode("utf-8")
+        )
+        self.assertEqual(expected, trailerguard._encoded_message_length(details))
+
+    def test_fit_large(self) -> None:
+        # multi-megabyte errors are truncated to the budget
+        budget = trailerguard.TrailerBudget()
+        code = grpc.StatusCode.FAILED_PRECONDITION
+        original = "x%é\n" * 1000000
+        details, metadata = budget.fit(code, original, ())
+        size = trailerguard.trailers_size(code, details, metadata)
+        self.assertLessEqual(size, 8192)
+        # the next character would not fit: é is encoded as 6 bytes
+        self.assertGreater(size, 8192 - 6)
+        self.assertTrue(details.endswith("...(truncated)"))
+        prefix = details[: -len("...(truncated)")]
+        self.assertEqual(original[: len(prefix)], prefix)
+
+
+class RaisingGreeter(helloworld_pb2_grpc.GreeterServicer):
+    def SayHello(
+        self, request: helloworld_pb2.HelloRequest, context: grpc.ServicerContext
+    ) -> helloworld_pb2.HelloReply:
+        if request.name == "abort":
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "a" * 20000)
+        if request.name == "metadata":
+            context.set_trailing_metadata((("large", "m" * 20000), ("small", "s")))
+            context.set_code(grpc.StatusCode.INTERNAL)
+            return helloworld_pb2.HelloReply()
+        if request.name == "ok":
+            context.set_trailing_metadata((("small", "s"),))
+            return helloworld_pb2.HelloReply(message="ok")
+        if request.name == "status":
+            context.abort_with_status(_Status(grpc.StatusCode.FAILED_PRECONDITION, "status", ()))
+        if request.name == "rich":
+            context.abort_with_status(_RICH_STATUS)
+        raise ValueError("e" * 20000)
+
+    def SayHelloStream(
+        self, request: helloworld_pb2.HelloRequest, context: grpc.ServicerContext
+    ) -> typing.Iterator[helloworld_pb2.HelloReply]:
+        yield helloworld_pb2.HelloReply(message="reply")
+        if request.name == "rich":
+            context.abort_with_status(_RICH_STATUS)
+        raise ValueError("e" * 20000)
+
+
+class AsyncRaisingGreeter(helloworld_pb2_grpc.GreeterServicer):
+    async def SayHello(
+        self,
+        request: helloworld_pb2.HelloRequest,
+        context: grpc.aio.ServicerContext[helloworld_pb2.HelloRequest, helloworld_pb2.HelloReply],
+    ) -> helloworld_pb2.HelloReply:
+        if request.name == "rich":
+            await context.abort_with_status(_RICH_STATUS)  # type: ignore[attr-defined]
+        await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "a" * 20000, (("small", "s"),))
+
+
+class TestTrailerSizeInterceptor(unittest.TestCase):
+    def _check_truncated(self, error: grpc.RpcError, code: grpc.StatusCode) -> None:
+        self.assertEqual(code, error.code())
+        details = error.details()
+        assert details is not None
+        self.assertTrue(details.endswith("...(truncated)"))
+        self.assertGreater(len(details), 8000)
+
+    def _check_errors(self, stub: helloworld_pb2_grpc.GreeterStub) -> None:
+        with self.assertRaises(grpc.RpcError) as cm:
+            stub.SayHello(helloworld_pb2.HelloRequest(name="errLength=20000"))
+        self._check_truncated(cm.exception, grpc.StatusCode.FAILED_PRECONDITION)
+
+        # streams
+        request = helloworld_pb2.HelloRequest(name="errLength=20000", reply_count=2)
+        replies = []
+        with self.assertRaises(grpc.RpcError) as cm:
+            for reply in stub.SayHelloStream(request):
+                replies.append(reply)
+        self.assertEqual(2, len(replies))
+        self._check_truncated(cm.exception, grpc.StatusCode.FAILED_PRECONDITION)
+        with self.assertRaises(grpc.RpcError) as cm:
+            list(stub.SayHelloBidi(iter((request,))))
+        self._check_truncated(cm.exception, grpc.StatusCode.FAILED_PRECONDITION)
+
+    def test_sync(self) -> None:
+        budget = trailerguard.TrailerBudget()
+        server = grpc.server(
+            concurrent.futures.ThreadPoolExecutor(max_workers=1),
+            interceptors=[trailerguard.TrailerSizeInterceptor(budget)],
+        )
+        helloworld_pb2_grpc.add_GreeterServicer_to_server(
+            pythonserver.ErrorGreeter(log_every=0), server
+        )
+        port = server.add_insecure_port("localhost:0")
+        server.start()
+
+        raising_server = grpc.server(
+            concurrent.futures.ThreadPoolExecutor(max_workers=1),
+            interceptors=[trailerguard.TrailerSizeInterceptor(budget)],
+        )
+        helloworld_pb2_grpc.add_GreeterServicer_to_server(RaisingGreeter(), raising_server)
+        raising_port = raising_server.add_insecure_port("localhost:0")
+        raising_server.start()
+        try:
+            with grpc.insecure_channel(
+                "localhost:" + str(port), options=_CLIENT_OPTIONS
+            ) as channel:
+                stub = helloworld_pb2_grpc.GreeterStub(channel)
+                self._check_errors(stub)
+                with self.assertRaises(grpc.RpcError) as cm:
+                    stub.SayHello(helloworld_pb2.HelloRequest(name="errLength=10"))
+                self.assertEqual("x" * 10, cm.exception.details())
+            self.assertEqual(3, budget.truncations)
+
+            with grpc.insecure_channel(
+                "localhost:" + str(raising_port), options=_CLIENT_OPTIONS
+            ) as channel:
+                stub = helloworld_pb2_grpc.GreeterStub(channel)
+                cases = (
+                    ("abort", grpc.StatusCode.INVALID_ARGUMENT),
+                    ("raise", grpc.StatusCode.UNKNOWN),
+                    ("metadata", grpc.StatusCode.INTERNAL),
+                )
+                for name, code in cases:
+                    with self.assertRaises(grpc.RpcError) as cm:
+                        stub.SayHello(helloworld_pb2.HelloRequest(name=name))
+                    self.assertEqual(code, cm.exception.code(), name)
+                # the large metadata was dropped
+                self.assertEqual([("small", "s")], list(cm.exception.trailing_metadata()))
+
+                reply, call = stub.SayHello.with_call(helloworld_pb2.HelloRequest(name="ok"))
+                self.assertEqual("ok", reply.message)
+                self.assertIn(("small", "s"), call.trailing_metadata())
+
+                # abort_with_status keeps its code, and large error details are dropped
+                with self.assertRaises(grpc.RpcError) as cm:
+                    stub.SayHello(helloworld_pb2.HelloRequest(name="status"))
+                self.assertEqual(grpc.StatusCode.FAILED_PRECONDITION, cm.exception.code())
+                self.assertEqual("status", cm.exception.details())
+                with self.assertRaises(grpc.RpcError) as cm:
+                    stub.SayHello(helloworld_pb2.HelloRequest(name="rich"))
+                self.assertEqual(grpc.StatusCode.FAILED_PRECONDITION, cm.exception.code())
+                self.assertEqual("rich", cm.exception.details())
+                self.assertEqual([("small", "s")], list(cm.exception.trailing_metadata()))
+
+                # streams
+                with self.assertRaises(grpc.RpcError) as cm:
+                    list(stub.SayHelloStream(helloworld_pb2.HelloRequest(name="raise")))
+                self._check_truncated(cm.exception, grpc.StatusCode.UNKNOWN)
+                details = cm.exception.details()
+                assert details is not None
+                self.assertTrue(details.startswith("Exception iterating responses: eee"))
+                with self.assertRaises(grpc.RpcError) as cm:
+                    list(stub.SayHelloStream(helloworld_pb2.HelloRequest(name="rich")))
+                self.assertEqual(grpc.StatusCode.FAILED_PRECONDITION, cm.exception.code())
+                self.assertEqual([("small", "s")], list(cm.exception.trailing_metadata()))
+            self.assertEqual(9, budget.truncations)
+        finally:
+            server.stop(None)
+            raising_server.stop(None)
+
+
+class TestAsyncTrailerSizeInterceptor(unittest.IsolatedAsyncioTestCase):
+    async def test_async(self) -> None:
+        budget = trailerguard.TrailerBudget()
+        server = grpc.aio.server(interceptors=[trailerguard.AsyncTrailerSizeInterceptor(budget)])
+        helloworld_pb2_grpc.add_GreeterServicer_to_server(
+            pythonserver.AsyncErrorGreeter(pythonserver.ErrorGreeter(log_every=0)), server
+        )
+        port = server.add_insecure_port("localhost:0")
+        await server.start()
+        try:
+            async with grpc.aio.insecure_channel(
+                "localhost:" + str(port), options=_CLIENT_OPTIONS
+            ) as channel:
+                stub = helloworld_pb2_grpc.GreeterStub(channel)
+                with self.assertRaises(grpc.aio.AioRpcError) as cm:
+                    await stub.SayHello(helloworld_pb2.HelloRequest(name="errLength=20000"))
+                self.assertEqual(grpc.StatusCode.FAILED_PRECONDITION, cm.exception.code())
+                details = cm.exception.details()
+                assert details is not None
+                self.assertTrue(details.endswith("...(truncated)"))
+
+                request = helloworld_pb2.HelloRequest(name="errLength=20000", reply_count=2)
+                replies = []
+                with self.assertRaises(grpc.aio.AioRpcError) as cm:
+                    async for reply in stub.SayHelloStream(request):
+                        replies.append(reply)
+                self.assertEqual(2, len(replies))
+                self.assertEqual(grpc.StatusCode.FAILED_PRECONDITION, cm.exception.code())
+                details = cm.exception.details()
+                assert details is not None
+                self.assertTrue(details.endswith("...(truncated)"))
+        finally:
+            await server.stop(None)
+        self.assertEqual(2, budget.truncations)
+
+    async def test_abort(self) -> None:
+        budget = trailerguard.TrailerBudget()
+        server = grpc.aio.server(interceptors=[trailerguard.AsyncTrailerSizeInterceptor(budget)])
+        helloworld_pb2_grpc.add_GreeterServicer_to_server(AsyncRaisingGreeter(), server)
+        port = server.add_insecure_port("localhost:0")
+        await server.start()
+        try:
+            async with grpc.aio.insecure_channel(
+                "localhost:" + str(port), options=_CLIENT_OPTIONS
+            ) as channel:
+                stub = helloworld_pb2_grpc.GreeterStub(channel)
+                with self.assertRaises(grpc.aio.AioRpcError) as cm:
+                    await stub.SayHello(helloworld_pb2.HelloRequest(name="rich"))
+                self.assertEqual(grpc.StatusCode.FAILED_PRECONDITION, cm.exception.code())
+                self.assertEqual("rich", cm.exception.details())
+                self.assertEqual((("small", "s"),), tuple(cm.exception.trailing_metadata() or ()))
+
+                # metadata passed to abort is kept
+                with self.assertRaises(grpc.aio.AioRpcError) as cm:
+                    await stub.SayHello(helloworld_pb2.HelloRequest(name="abort"))
+                self.assertEqual(grpc.StatusCode.INVALID_ARGUMENT, cm.exception.code())
+                self.assertEqual((("small", "s"),), tuple(cm.exception.trailing_metadata() or ()))
+        finally:
+            await server.stop(None)
+        self.assertEqual(2, budget.truncations)
+
+
+if __name__ == "__main__":
+    unittest.main()
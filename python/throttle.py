@@ -0,0 +1,154 @@
+import collections
+import grpc
+import random
+import threading
+import time
+import typing
+
+
+# status codes that mean the backend refused the request because it is overloaded
+OVERLOAD_CODES = frozenset((grpc.StatusCode.RESOURCE_EXHAUSTED, grpc.StatusCode.UNAVAILABLE))
+
+
+class AdaptiveThrottle:
+    """Rejects calls locally when backends are refusing them, using the adaptive throttling
+    from the Google SRE book (Handling Overload). Over the last window_s seconds, this counts the
+    requests, including rejected ones, and the accepts: calls that did not fail with
+    OVERLOAD_CODES. Calls are rejected with probability
+    max(0, (requests - k * accepts) / (requests + 1)), so while backends accept calls, clients
+    send up to k times more than are accepted. Thread-safe.
+    """
+
+    # the window is counted in buckets of this many seconds
+    _BUCKET_S = 1.0
+
+    def __init__(
+        self,
+        k: float = 2.0,
+        window_s: float = 120.0,
+        clock: typing.Callable[[], float] = time.monotonic,
+        random_float: typing.Callable[[], float] = random.random,
+    ) -> None:
+        if k < 1:
+            raise ValueError("k must be >= 1")
+        self.k = k
+        self.window_s = window_s
+        self._clock = clock
+        self._random_float = random_float
+
+        self._lock = threading.Lock()
+        # [bucket number, requests, accepts] for each bucket in the window, oldest first
+        self._buckets: typing.Deque[typing.List[int]] = collections.deque()
+        self.requests = 0
+        self.accepts = 0
+
+    def _current_bucket(self) -> typing.List[int]:
+        """Returns the bucket for now after removing expired buckets. Must hold the lock."""
+        bucket_number = int(self._clock() / AdaptiveThrottle._BUCKET_S)
+        oldest = bucket_number - int(self.window_s / AdaptiveThrottle._BUCKET_S)
+        while len(self._buckets) > 0 and self._buckets[0][0] <= oldest:
+            _, requests, accepts = self._buckets.popleft()
+            self.requests -= requests
+            self.accepts -= accepts
+        if len(self._buckets) == 0 or self._buckets[-1][0] != bucket_number:
+            self._buckets.append([bucket_number, 0, 0])
+        return self._buckets[-1]
+
+    def reject_probability(self) -> float:
+        with self._lock:
+            self._current_bucket()
+            return max(0.0, (self.requests - self.k * self.accepts) / (self.requests + 1))
+
+    def should_reject(self) -> bool:
+        """Records a request. Returns True if it should be rejected without sending it."""
+        with self._lock:
+            bucket = self._current_bucket()
+            probability = max(0.0, (self.requests - self.k * self.accepts) / (self.requests + 1))
+            bucket[1] += 1
+            self.requests += 1
+        return self._random_float() < probability
+
+    def record(self, code: typing.Optional[grpc.StatusCode]) -> None:
+        """Records the status of a call that was sent."""
+        if code in OVERLOAD_CODES:
+            return
+        with self._lock:
+            self._current_bucket()[2] += 1
+            self.accepts += 1
+
+
+class ThrottledError(grpc.RpcError, grpc.Future, grpc.Call):  # type: ignore[type-arg]
+    """The result of a call rejected by an AdaptiveThrottle: a completed call that fails with
+    RESOURCE_EXHAUSTED, which is raised like errors returned by the server.
+    """
+
+    _DETAILS = "rejected by client-side adaptive throttling"
+
+    def initial_metadata(self) -> typing.Tuple[typing.Any, ...]:
+        return ()
+
+    def trailing_metadata(self) -> typing.Tuple[typing.Any, ...]:
+        return ()
+
+    def code(self) -> grpc.StatusCode:
+        return grpc.StatusCode.RESOURCE_EXHAUSTED
+
+    def details(self) -> str:
+        return ThrottledError._DETAILS
+
+    def debug_error_string(self) -> str:
+        return ThrottledError._DETAILS
+
+    def is_active(self) -> bool:
+        return False
+
+    def time_remaining(self) -> float:
+        return 0.0
+
+    def cancel(self) -> bool:
+        return False
+
+    def cancelled(self) -> bool:
+        return False
+
+    def running(self) -> bool:
+        return False
+
+    def done(self) -> bool:
+        return True
+
+    def result(self, timeout: typing.Optional[float] = None) -> typing.NoReturn:
+        raise self
+
+    def exception(self, timeout: typing.Optional[float] = None) -> "ThrottledError":
+        return self
+
+    def traceback(self, timeout: typing.Optional[float] = None) -> None:
+        return None
+
+    def add_done_callback(self, fn: typing.Callable[[typing.Any], None]) -> None:
+        fn(self)
+
+    def add_callback(self, callback: typing.Callable[[], None]) -> bool:
+        return False
+
+
+class ThrottleInterceptor(grpc.UnaryUnaryClientInterceptor):  # type: ignore[type-arg]
+    """Rejects calls using an AdaptiveThrottle, and records the results of the calls it sends.
+    Use one throttle for all the channels to the same service.
+    """
+
+    def __init__(self, throttle: AdaptiveThrottle) -> None:
+        self.throttle = throttle
+
+    def intercept_unary_unary(
+        self,
+        continuation: typing.Callable[[grpc.ClientCallDetails, typing.Any], typing.Any],
+        client_call_details: grpc.ClientCallDetails,
+        request: typing.Any,
+    ) -> typing.Any:
+        if self.throttle.should_reject():
+            return ThrottledError()
+        call = continuation(client_call_details, request)
+        call.add_done_callback(lambda done: self.throttle.record(done.code()))
+        return call
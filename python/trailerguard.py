@@ -0,0 +1,333 @@
+import base64
+import grpc
+import grpc.aio
+import inspect
+import logging
+import threading
+import typing
+
+
+# the limit on response headers and trailers suggested by gRPC's PROTOCOL-HTTP2.md, which the C
+# and Java clients use by default. See the README.
+DEFAULT_BUDGET = 8192
+
+# HTTP/2 counts each header as len(name) + len(value) + 32 bytes (RFC 7540 Section 6.5.2)
+_HEADER_OVERHEAD = 32
+# an error without a response is sent as Trailers-Only, which includes these headers
+_TRAILERS_ONLY_HEADERS = ((":status", "200"), ("content-type", "application/grpc"))
+_STATUS_HEADER = "grpc-status"
+_MESSAGE_HEADER = "grpc-message"
+# details are truncated to at least this length before dropping trailing metadata
+_MIN_DETAILS_LENGTH = 256
+_TRUNCATED_SUFFIX = "...(truncated)"
+
+Metadata = typing.Sequence[typing.Tuple[str, typing.Union[str, bytes]]]
+
+
+def _header_size(name: str, value_length: int) -> int:
+    return len(name) + value_length + _HEADER_OVERHEAD
+
+
+# bytes of grpc-message that are sent as is: all others are percent-encoded as 3 bytes
+_UNESCAPED_BYTES = bytes(byte for byte in range(0x20, 0x7F) if byte != ord("%"))
+
+
+def _encoded_message_length(details: str) -> int:
+    """Returns the length of details percent-encoded for grpc-message."""
+    encoded = details.encode("utf-8")
+    # deleting the unescaped bytes leaves the escaped bytes: one pass in C for long errors
+    escaped = len(encoded.translate(None, _UNESCAPED_BYTES))
+    return len(encoded) + 2 * escaped
+
+
+def _metadatum_size(key: str, value: typing.Union[str, bytes]) -> int:
+    if isinstance(value, bytes):
+        # binary values are sent base64 encoded without padding
+        return _header_size(key, len(base64.b64encode(value).rstrip(b"=")))
+    return _header_size(key, len(value.encode("utf-8")))
+
+
+def trailers_size(code: grpc.StatusCode, details: str, metadata: Metadata) -> int:
+    """Returns the HTTP/2 header list size of an error response with no messages."""
+    size = sum(_header_size(name, len(value)) for name, value in _TRAILERS_ONLY_HEADERS)
+    size += _header_size(
+        _STATUS_HEADER, len(str(typing.cast(typing.Tuple[int, str], code.value)[0]))
+    )
+    if details != "":
+        size += _header_size(_MESSAGE_HEADER, _encoded_message_length(details))
+    return size + sum(_metadatum_size(key, value) for key, value in metadata)
+
+
+def _truncate_details(details: str, max_encoded_length: int) -> str:
+    """Returns details truncated so it is at most max_encoded_length when percent-encoded."""
+    if _encoded_message_length(details) <= max_encoded_length:
+        return details
+    # each character encodes to at least one byte: longer prefixes cannot fit
+    details = details[:max_encoded_length]
+    # binary search for the longest prefix that fits with the suffix
+    low = 0
+    high = len(details)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if _encoded_message_length(details[:middle] + _TRUNCATED_SUFFIX) <= max_encoded_length:
+            low = middle
+        else:
+            high = middle - 1
+    if low == 0 and _encoded_message_length(_TRUNCATED_SUFFIX) > max_encoded_length:
+        return ""
+    return details[:low] + _TRUNCATED_SUFFIX
+
+
+class TrailerBudget:
+    """Keeps the size of error trailers under budget bytes, so clients that limit the header
+    list size receive the error instead of RST_STREAM or RESOURCE_EXHAUSTED. Thread-safe.
+    """
+
+    def __init__(self, budget: int = DEFAULT_BUDGET) -> None:
+        if budget < trailers_size(grpc.StatusCode.UNKNOWN, "", ()):
+            raise ValueError("budget is too small for any error: " + str(budget))
+        self.budget = budget
+        self._lock = threading.Lock()
+        # number of responses that were over budget
+        self.truncations = 0
+
+    def fit(
+        self, code: grpc.StatusCode, details: str, metadata: Metadata
+    ) -> typing.Tuple[str, Metadata]:
+        """Returns details and metadata that fit in the budget. Details are truncated first, to
+        _MIN_DETAILS_LENGTH, then the largest metadata are dropped, then details are truncated to
+        whatever remains.
+        """
+        size = trailers_size(code, details, metadata)
+        if size <= self.budget:
+            return details, metadata
+        with self._lock:
+            self.truncations += 1
+
+        fixed_size = trailers_size(code, "", metadata)
+        if details != "":
+            fixed_size += _header_size(_MESSAGE_HEADER, 0)
+        available = self.budget - fixed_size
+        if available < _MIN_DETAILS_LENGTH:
+            # drop the largest metadata until details can have _MIN_DETAILS_LENGTH
+            kept = sorted(metadata, key=lambda kv: _metadatum_size(kv[0], kv[1]))
+            while len(kept) > 0 and available < _MIN_DETAILS_LENGTH:
+                key, value = kept.pop()
+                available += _metadatum_size(key, value)
+            metadata = [kv for kv in metadata if kv in kept]
+        fitted = _truncate_details(details, max(0, available))
+        logging.warning(
+            "error trailers over budget=%d bytes: size=%d; truncated len(details)=%d to %d",
+            self.budget,
+            size,
+            len(details),
+            len(fitted),
+        )
+        return fitted, metadata
+
+
+class _GuardedContext:
+    """Wraps a ServicerContext to apply a TrailerBudget to the status and trailing metadata."""
+
+    def __init__(self, context: typing.Any, budget: TrailerBudget) -> None:
+        self._context = context
+        self._budget = budget
+        self._code = grpc.StatusCode.OK
+        self._details = ""
+        self._metadata: Metadata = ()
+        self.aborted = False
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self._context, name)
+
+    def set_code(self, code: grpc.StatusCode) -> None:
+        self._code = code
+        self._context.set_code(code)
+
+    def set_details(self, details: str) -> None:
+        self._details = details
+
+    def set_trailing_metadata(self, trailing_metadata: Metadata) -> None:
+        self._metadata = tuple(trailing_metadata)
+
+    def _fit(self, code: grpc.StatusCode, details: str) -> typing.Tuple[str, Metadata]:
+        """Returns the details and trailing metadata that fit the budget."""
+        if code == grpc.StatusCode.OK:
+            # the size of successful responses depends on the response: do not change them
+            return details, self._metadata
+        return self._budget.fit(code, details, self._metadata)
+
+    def apply(self) -> None:
+        """Sets the status and trailing metadata on the wrapped context."""
+        details, metadata = self._fit(self._code, self._details)
+        if len(metadata) > 0:
+            self._context.set_trailing_metadata(metadata)
+        if details != "":
+            self._context.set_details(details)
+
+    def abort(self, code: grpc.StatusCode, details: str) -> typing.NoReturn:
+        self.aborted = True
+        details, metadata = self._fit(code, details)
+        if len(metadata) > 0:
+            self._context.set_trailing_metadata(metadata)
+        self._context.abort(code, details)
+        raise AssertionError("BUG: abort must raise")
+
+    def abort_with_status(self, status: grpc.Status) -> typing.NoReturn:
+        # the trailing metadata of status replaces any that was set
+        self._metadata = tuple(status.trailing_metadata or ())
+        self.abort(status.code, status.details)
+
+    def fail_with_exception(self, exception: Exception, message: str) -> typing.NoReturn:
+        """Aborts with the error gRPC would use for an exception raised by the application."""
+        logging.exception(message)
+        self.abort(grpc.StatusCode.UNKNOWN, "{}: {}".format(message, exception))
+
+
+class _AsyncGuardedContext(_GuardedContext):
+    async def abort(  # type: ignore[override]
+        self, code: grpc.StatusCode, details: str = "", trailing_metadata: Metadata = ()
+    ) -> typing.NoReturn:
+        self.aborted = True
+        if len(trailing_metadata) > 0:
+            self._metadata = tuple(trailing_metadata)
+        details, metadata = self._fit(code, details)
+        await self._context.abort(code, details, tuple(metadata))
+        raise AssertionError("BUG: abort must raise")
+
+    async def abort_with_status(self, status: grpc.Status) -> typing.NoReturn:  # type: ignore[override]
+        self._metadata = tuple(status.trailing_metadata or ())
+        await self.abort(status.code, status.details)
+
+    async def fail_with_exception(  # type: ignore[override]
+        self, exception: Exception, message: str
+    ) -> typing.NoReturn:
+        logging.exception(message)
+        await self.abort(grpc.StatusCode.UNKNOWN, "{}: {}".format(message, exception))
+
+
+# the details of the errors gRPC returns for exceptions raised by the application
+_CALL_EXCEPTION = "Exception calling application"
+_ITERATE_EXCEPTION = "Exception iterating responses"
+
+
+def _behavior(handler: typing.Any) -> typing.Any:
+    """Returns the function that implements the method of handler."""
+    if handler.request_streaming and handler.response_streaming:
+        return handler.stream_stream
+    if handler.request_streaming:
+        return handler.stream_unary
+    if handler.response_streaming:
+        return handler.unary_stream
+    return handler.unary_unary
+
+
+def _replace_behavior(handler: typing.Any, behavior: typing.Any) -> typing.Any:
+    """Returns a handler like handler that calls behavior."""
+    if handler.request_streaming and handler.response_streaming:
+        new_handler: typing.Any = grpc.stream_stream_rpc_method_handler
+    elif handler.request_streaming:
+        new_handler = grpc.stream_unary_rpc_method_handler
+    elif handler.response_streaming:
+        new_handler = grpc.unary_stream_rpc_method_handler
+    else:
+        new_handler = grpc.unary_unary_rpc_method_handler
+    return new_handler(behavior, handler.request_deserializer, handler.response_serializer)
+
+
+class TrailerSizeInterceptor(grpc.ServerInterceptor):  # type: ignore[type-arg]
+    """Applies a TrailerBudget to the errors returned by all methods. The budget is applied to
+    the trailers of streaming responses as if they were Trailers-Only, which slightly
+    overestimates their size.
+    """
+
+    def __init__(self, budget: TrailerBudget) -> None:
+        self.budget = budget
+
+    def intercept_service(
+        self,
+        continuation: typing.Callable[[grpc.HandlerCallDetails], typing.Any],
+        handler_call_details: grpc.HandlerCallDetails,
+    ) -> typing.Any:
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return handler
+        behavior = _behavior(handler)
+
+        def guarded_behavior(request: typing.Any, context: grpc.ServicerContext) -> typing.Any:
+            guarded = _GuardedContext(context, self.budget)
+            try:
+                response = behavior(request, guarded)
+            except Exception as e:
+                if guarded.aborted:
+                    raise
+                guarded.fail_with_exception(e, _CALL_EXCEPTION)
+            guarded.apply()
+            return response
+
+        def guarded_stream(
+            request: typing.Any, context: grpc.ServicerContext
+        ) -> typing.Iterator[typing.Any]:
+            guarded = _GuardedContext(context, self.budget)
+            try:
+                yield from behavior(request, guarded)
+            except Exception as e:
+                if guarded.aborted:
+                    raise
+                guarded.fail_with_exception(e, _ITERATE_EXCEPTION)
+            guarded.apply()
+
+        if handler.response_streaming:
+            return _replace_behavior(handler, guarded_stream)
+        return _replace_behavior(handler, guarded_behavior)
+
+
+class AsyncTrailerSizeInterceptor(grpc.aio.ServerInterceptor):  # type: ignore[type-arg]
+    """TrailerSizeInterceptor for grpc.aio servers. Only methods implemented with async def are
+    guarded: gRPC runs other methods in an executor.
+    """
+
+    def __init__(self, budget: TrailerBudget) -> None:
+        self.budget = budget
+
+    async def intercept_service(
+        self,
+        continuation: typing.Callable[[grpc.HandlerCallDetails], typing.Awaitable[typing.Any]],
+        handler_call_details: grpc.HandlerCallDetails,
+    ) -> typing.Any:
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return handler
+        behavior = _behavior(handler)
+
+        async def guarded_behavior(request: typing.Any, context: typing.Any) -> typing.Any:
+            guarded = _AsyncGuardedContext(context, self.budget)
+            try:
+                response = await behavior(request, guarded)
+            except Exception as e:
+                if guarded.aborted:
+                    raise
+                await guarded.fail_with_exception(e, _CALL_EXCEPTION)
+            guarded.apply()
+            return response
+
+        async def guarded_stream(
+            request: typing.Any, context: typing.Any
+        ) -> typing.AsyncIterator[typing.Any]:
+            guarded = _AsyncGuardedContext(context, self.budget)
+            try:
+                async for response in behavior(request, guarded):
+                    yield response
+            except Exception as e:
+                if guarded.aborted:
+                    raise
+                await guarded.fail_with_exception(e, _ITERATE_EXCEPTION)
+            guarded.apply()
+
+        # gRPC calls methods differently depending on how they are defined: keep the same kind
+        if inspect.isasyncgenfunction(behavior):
+            return _replace_behavior(handler, guarded_stream)
+        if inspect.iscoroutinefunction(behavior):
+            # unary responses, or streaming responses sent with context.write()
+            return _replace_behavior(handler, guarded_behavior)
+        return handler